@@ -0,0 +1,275 @@
+import math
+import logging
+from statistics import NormalDist
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Per-turn log metrics summarized while a simulation runs
+LOG_METRICS = ["latency_ms", "ttft_ms", "inter_token_latency_ms", "input_tokens", "output_tokens",
+               "cached_input_tokens", "uncached_input_tokens"]
+
+_MISSING = "\0missing"
+
+# Histogram bin edges; values outside the range are clamped into the first/last bin.
+# Fixed edges keep histograms of different batches/experiments mergeable.
+RATIO_BINS = [i / 20 for i in range(21)]
+DEFAULT_BINS = [0.0] + [m * 10 ** e for e in range(0, 6) for m in (1, 2, 5)] + [1e6]
+HISTOGRAM_BINS: Dict[str, List[float]] = {}
+
+
+def bin_edges(metric: str) -> List[float]:
+    """
+    Histogram bin edges used for `metric` (ratios get 0.05-wide bins, the rest a 1-2-5 series).
+    """
+    if metric in HISTOGRAM_BINS:
+        return HISTOGRAM_BINS[metric]
+    if metric.endswith("_ratio"):
+        return RATIO_BINS
+    return DEFAULT_BINS
+
+
+def bin_index(edges: List[float], values: np.ndarray) -> np.ndarray:
+    return np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 2)
+
+
+class RunningStats:
+    """
+    Streaming summary of one metric: count, sum, sum of squares, min, max and a
+    fixed-bin histogram. Two summaries of disjoint data merge exactly, so batches
+    and experiments can be reduced in any order.
+    """
+    __slots__ = ("count", "total", "sumsq", "min", "max", "edges", "hist")
+
+    def __init__(self, edges: List[float] = DEFAULT_BINS):
+        self.count = 0
+        self.total = 0.0
+        self.sumsq = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.edges = list(edges)
+        self.hist = [0] * (len(self.edges) - 1)
+
+    def add(self, value: float):
+        hist = [0] * len(self.hist)
+        hist[int(bin_index(self.edges, np.array([value]))[0])] = 1
+        self.add_summary(1, value, value * value, value, value, hist)
+
+    def add_summary(self, count: int, total: float, sumsq: float, minimum: float, maximum: float,
+                    hist: Optional[List[int]] = None):
+        if not count:
+            return
+        self.count += int(count)
+        self.total += float(total)
+        self.sumsq += float(sumsq)
+        self.min = min(self.min, float(minimum))
+        self.max = max(self.max, float(maximum))
+        if hist is not None:
+            self.hist = [a + int(b) for a, b in zip(self.hist, hist)]
+
+    def merge(self, other: "RunningStats"):
+        if other.edges != self.edges:
+            raise ValueError("Cannot merge histograms with different bin edges.")
+        self.add_summary(other.count, other.total, other.sumsq, other.min, other.max, other.hist)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    @property
+    def std(self) -> float:
+        """
+        Sample standard deviation (NaN below two observations).
+        """
+        if self.count < 2:
+            return math.nan
+        variance = (self.sumsq - self.total * self.total / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def ci(self, confidence: float = 0.95) -> Tuple[float, float]:
+        """
+        Normal-approximation confidence interval of the mean (NaN below two observations).
+        """
+        if self.count < 2:
+            return (math.nan, math.nan)
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        half_width = z * self.std / math.sqrt(self.count)
+        return (self.mean - half_width, self.mean + half_width)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "sum": self.total, "sumsq": self.sumsq,
+                "min": self.min if self.count else None, "max": self.max if self.count else None,
+                "edges": self.edges, "hist": self.hist}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RunningStats":
+        stats = cls(data.get("edges", DEFAULT_BINS))
+        stats.add_summary(data["count"], data["sum"], data["sumsq"],
+                          data["min"] if data["min"] is not None else math.inf,
+                          data["max"] if data["max"] is not None else -math.inf,
+                          data.get("hist"))
+        return stats
+
+
+class AggregateTable:
+    """
+    Running per-group metric summaries, by default per (speaker_model, scenario).
+    Rows can be added one log entry at a time or a whole DataFrame batch at a time
+    (vectorized with groupby); memory grows with the number of groups, not rows,
+    so charts render from a handful of rows instead of rescanning every turn.
+    """
+    def __init__(self, group_by: Iterable[str] = ("speaker_model", "scenario")):
+        self.group_by: Tuple[str, ...] = tuple(group_by)
+        self._cells: Dict[Tuple[Any, ...], Dict[str, RunningStats]] = {}
+
+    def _cell(self, key: Tuple[Any, ...], metric: str) -> RunningStats:
+        metrics = self._cells.setdefault(key, {})
+        stats = metrics.get(metric)
+        if stats is None:
+            stats = metrics[metric] = RunningStats(bin_edges(metric))
+        return stats
+
+    def update(self, record: Dict[str, Any], metrics: List[str]):
+        """
+        Adds one row (e.g. a log entry). Missing or non-numeric metric values are skipped.
+        """
+        key = tuple(None if pd.isna(record.get(column)) else record.get(column) for column in self.group_by)
+        for metric in metrics:
+            value = record.get(metric)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or math.isnan(value):
+                continue
+            self._cell(key, metric).add(float(value))
+
+    def update_frame(self, df: pd.DataFrame, metrics: List[str]):
+        """
+        Adds every row of a batch with one groupby per summary statistic.
+        """
+        metrics = [metric for metric in metrics if metric in df.columns]
+        if df.empty or not metrics:
+            return
+        values = df[metrics].apply(pd.to_numeric, errors="coerce").astype(float)
+        # Missing group values become a sentinel so every group has a hashable, NaN-free label
+        keys = [df[column].astype(object).where(df[column].notna(), _MISSING) if column in df.columns
+                else pd.Series(_MISSING, index=df.index, dtype=object)
+                for column in self.group_by]
+        grouped = values.groupby(keys, sort=False)
+        summary = {
+            "count": grouped.count(),
+            "sum": grouped.sum(),
+            "sumsq": (values ** 2).groupby(keys, sort=False).sum(),
+            "min": grouped.min(),
+            "max": grouped.max(),
+        }
+        histograms = {}
+        for metric in metrics:
+            column = values[metric]
+            present = column.notna()
+            edges = bin_edges(metric)
+            bins = pd.Series(bin_index(edges, column[present].to_numpy()), index=column.index[present])
+            counts = bins.groupby([key[present] for key in keys] + [bins]).size()
+            histograms[metric] = counts.unstack(fill_value=0).reindex(columns=range(len(edges) - 1), fill_value=0)
+
+        for group in summary["count"].index:
+            key = group if isinstance(group, tuple) else (group,)
+            key = tuple(None if part == _MISSING else part for part in key)
+            for metric in metrics:
+                count = summary["count"].at[group, metric]
+                if not count:
+                    continue
+                hist = histograms[metric].loc[group].tolist() if group in histograms[metric].index else None
+                self._cell(key, metric).add_summary(
+                    count, summary["sum"].at[group, metric], summary["sumsq"].at[group, metric],
+                    summary["min"].at[group, metric], summary["max"].at[group, metric], hist
+                )
+
+    def merge(self, other: "AggregateTable"):
+        """
+        Folds another table with the same grouping into this one.
+        """
+        if other.group_by != self.group_by:
+            raise ValueError(f"Cannot merge aggregates grouped by {other.group_by} into {self.group_by}.")
+        for key, metrics in other._cells.items():
+            for metric, stats in metrics.items():
+                self._cell(key, metric).merge(stats)
+
+    def get(self, key: Tuple[Any, ...], metric: str) -> Optional[RunningStats]:
+        return self._cells.get(tuple(key), {}).get(metric)
+
+    def to_frame(self, confidence: float = 0.95) -> pd.DataFrame:
+        """
+        One row per (group, metric) with count, mean, std, confidence interval, min and max.
+        """
+        columns = list(self.group_by) + ["metric", "count", "mean", "std", "ci_low", "ci_high", "min", "max"]
+        rows = []
+        for key, metrics in self._cells.items():
+            for metric, stats in metrics.items():
+                ci_low, ci_high = stats.ci(confidence)
+                row = dict(zip(self.group_by, key))
+                row.update({"metric": metric, "count": stats.count, "mean": stats.mean, "std": stats.std,
+                            "ci_low": ci_low, "ci_high": ci_high,
+                            "min": stats.min if stats.count else None, "max": stats.max if stats.count else None})
+                rows.append(row)
+        return pd.DataFrame(rows, columns=columns)
+
+    def histogram(self, metric: str) -> pd.DataFrame:
+        """
+        Histogram of `metric` per group: one row per (group, bin) with bin bounds and count.
+        """
+        rows = []
+        for key, metrics in self._cells.items():
+            stats = metrics.get(metric)
+            if stats is None:
+                continue
+            for i, count in enumerate(stats.hist):
+                row = dict(zip(self.group_by, key))
+                row.update({"bin_low": stats.edges[i], "bin_high": stats.edges[i + 1], "count": count})
+                rows.append(row)
+        return pd.DataFrame(rows, columns=list(self.group_by) + ["bin_low", "bin_high", "count"])
+
+    def rollup(self, group_by: Iterable[str]) -> "AggregateTable":
+        """
+        Coarser table grouped by a subset of the columns, e.g. rollup(["speaker_model"])
+        merges every scenario of a model.
+        """
+        table = AggregateTable(group_by)
+        positions = [self.group_by.index(column) for column in table.group_by]
+        for key, metrics in self._cells.items():
+            for metric, stats in metrics.items():
+                table._cell(tuple(key[pos] for pos in positions), metric).merge(stats)
+        return table
+
+    def metrics(self) -> List[str]:
+        return sorted({metric for metrics in self._cells.values() for metric in metrics})
+
+    def filter(self, **allowed) -> "AggregateTable":
+        """
+        Copy restricted to groups whose columns take one of the allowed values,
+        e.g. filter(speaker_model=["a", "b"]). None or empty means no restriction.
+        """
+        table = AggregateTable(self.group_by)
+        positions = {column: self.group_by.index(column) for column in allowed if allowed[column]}
+        for key, metrics in self._cells.items():
+            if all(key[pos] in allowed[column] for column, pos in positions.items()):
+                for metric, stats in metrics.items():
+                    table._cell(key, metric).merge(stats)
+        return table
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "group_by": list(self.group_by),
+            "cells": [
+                {"key": list(key), "metric": metric, **stats.to_dict()}
+                for key, metrics in self._cells.items()
+                for metric, stats in metrics.items()
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AggregateTable":
+        table = cls(data["group_by"])
+        for cell in data["cells"]:
+            table._cell(tuple(cell["key"]), cell["metric"]).merge(RunningStats.from_dict(cell))
+        return table
@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Iterable
+
+from simulation_config import ANALYSIS_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+_QUERY_CHUNK = 900
+
+
+def content_hash(text: Any) -> str:
+    """
+    Content address of a message: SHA-256 of its UTF-8 text (missing content hashes as "").
+    """
+    if not isinstance(text, str):
+        text = ""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Persistent per-message store of analysis results in SQLite.
+    Rows are keyed by (content hash, analyzer version), so a changed analyzer config
+    simply misses instead of serving stale metrics.
+    """
+    def __init__(self, path: str = ANALYSIS_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            " key TEXT NOT NULL,"
+            " version TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " PRIMARY KEY (key, version))"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: Iterable[str], version: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns {key: metrics} for every key cached under `version`; missing keys are absent.
+        """
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for i in range(0, len(keys), _QUERY_CHUNK):
+                chunk = keys[i:i + _QUERY_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, payload FROM analyses WHERE version = ? AND key IN ({placeholders})",
+                    [version] + chunk
+                ).fetchall()
+                for key, payload in rows:
+                    found[key] = json.loads(payload)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, results: Dict[str, Dict[str, Any]], version: str):
+        """
+        Stores {key: metrics} under `version`, replacing existing rows.
+        """
+        now = time.time()
+        rows = [(key, version, json.dumps(metrics), now) for key, metrics in results.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO analyses (key, version, payload, created) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def prune(self, version: str) -> int:
+        """
+        Deletes results produced by any analyzer version other than `version`.
+        Returns the number of rows removed.
+        """
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM analyses WHERE version != ?", (version,)).rowcount
+            self._conn.commit()
+        if removed:
+            logger.info(f"Pruned {removed} stale analysis results from {self.path}")
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM analyses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,106 +1,247 @@
-import nltk
+import os
+import json
+import hashlib
+import logging
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
-from collections import Counter
-
-# Ensure necessary NLTK data is downloaded
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('tokenizers/punkt_tab')
-    nltk.data.find('taggers/averaged_perceptron_tagger')
-    nltk.data.find('taggers/averaged_perceptron_tagger_eng')
-    nltk.data.find('taggers/universal_tagset')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('punkt_tab')
-    nltk.download('averaged_perceptron_tagger')
-    nltk.download('averaged_perceptron_tagger_eng')
-    nltk.download('universal_tagset')
-
-def analyze_text(text):
-    """
-    Analyzes a single text string and returns stylometric metrics using NLTK.
-    """
-    if not text:
-        return {
-            "token_count": 0,
-            "sentence_count": 0,
-            "avg_sentence_length": 0,
-            "noun_ratio": 0,
-            "verb_ratio": 0,
-            "adj_ratio": 0,
-            "adv_ratio": 0,
-            "pron_ratio": 0,
-        }
 
-    # Tokenize
-    tokens = nltk.word_tokenize(text)
-    sentences = nltk.sent_tokenize(text)
+from simulation_config import ANALYSIS_WORKERS, ANALYSIS_CHUNK_SIZE
+from analysis_cache import content_hash
+from lexicon import Lexicon
+# NLTK setup helpers are re-exported for existing callers
+from text_backends import get_backend, UNIVERSAL_TAGS, TAG_IDS, configure_nltk, build_nltk_bundle, NLTK_RESOURCES
+
+logger = logging.getLogger(__name__)
+
+# Universal POS tags reported as ratios, by metric column
+POS_METRICS = {
+    "noun_ratio": "NOUN",
+    "verb_ratio": "VERB",
+    "adj_ratio": "ADJ",
+    "adv_ratio": "ADV",
+    "pron_ratio": "PRON",
+}
+METRIC_COLUMNS = ["token_count", "sentence_count", "avg_sentence_length"] + list(POS_METRICS)
+
+# Bump whenever tokenization, tagging or metric definitions change (invalidates cached results)
+ANALYZER_VERSION = 1
+
+def analyzer_fingerprint(backend=None):
+    """
+    Version string of the stylometry analyzer config (including the text backend),
+    used to key cached results.
+    """
+    config = {
+        "version": ANALYZER_VERSION,
+        "backend": get_backend(backend).fingerprint(),
+        "tagset": "universal",
+        "metrics": METRIC_COLUMNS,
+        "pos": POS_METRICS,
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def analyze_documents(docs):
+    """
+    Stylometric metrics from already parsed documents (see text_backends.ParsedDocument).
+    Returns a dict of metric name -> NumPy array (one value per document, in input order);
+    counts are built with vectorized bincounts over the documents' tag arrays.
+    """
+    n = len(docs)
+    token_counts = np.fromiter((doc.n_tokens for doc in docs), dtype=np.int64, count=n)
+    sentence_counts = np.fromiter((doc.n_sentences for doc in docs), dtype=np.int64, count=n)
     
-    # POS Tagging (Universal Tagset for simpler tags: NOUN, VERB, ADJ, ADV, etc.)
-    tagged_tokens = nltk.pos_tag(tokens, tagset='universal')
+    # Count every tag id per message in one pass
+    n_tags = len(UNIVERSAL_TAGS)
+    flat_tags = np.concatenate([doc.pos for doc in docs]).astype(np.int64) if n else np.zeros(0, dtype=np.int64)
+    owners = np.repeat(np.arange(n), token_counts)
+    pos_counts = np.bincount(owners * n_tags + flat_tags, minlength=n * n_tags).reshape(n, n_tags)
     
-    # POS Counts
-    pos_counts = Counter([tag for word, tag in tagged_tokens])
-    total_tokens = len(tokens)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_sentence_length = np.where(sentence_counts > 0, token_counts / np.maximum(sentence_counts, 1), 0.0)
+        ratios = np.where(token_counts[:, None] > 0, pos_counts / np.maximum(token_counts, 1)[:, None], 0.0)
     
-    # Calculate ratios
     metrics = {
-        "token_count": total_tokens,
-        "sentence_count": len(sentences),
-        "avg_sentence_length": total_tokens / len(sentences) if len(sentences) > 0 else 0,
-        "noun_ratio": pos_counts.get("NOUN", 0) / total_tokens if total_tokens > 0 else 0,
-        "verb_ratio": pos_counts.get("VERB", 0) / total_tokens if total_tokens > 0 else 0,
-        "adj_ratio": pos_counts.get("ADJ", 0) / total_tokens if total_tokens > 0 else 0,
-        "adv_ratio": pos_counts.get("ADV", 0) / total_tokens if total_tokens > 0 else 0,
-        "pron_ratio": pos_counts.get("PRON", 0) / total_tokens if total_tokens > 0 else 0,
+        "token_count": token_counts,
+        "sentence_count": sentence_counts,
+        "avg_sentence_length": avg_sentence_length,
     }
-    
+    for column, tag in POS_METRICS.items():
+        metrics[column] = ratios[:, TAG_IDS[tag]]
     return metrics
 
-def process_logs(df):
+def analyze_texts(texts, backend=None):
+    """
+    Batch stylometric analysis of many texts at once.
+    `backend` is a text_backends name ("nltk", "spacy", "regex") or instance; None uses
+    the configured default. Each text is parsed once and every metric reads the result.
+    """
+    return analyze_documents(get_backend(backend).parse(list(texts)))
+
+def analyze_text(text, backend=None):
+    """
+    Analyzes a single text string and returns stylometric metrics.
+    """
+    metrics = analyze_texts([text], backend)
+    return {column: values[0].item() for column, values in metrics.items()}
+
+# Backend of a pool worker process, set once by the initializer
+_worker_backend = None
+
+def _init_worker(backend=None):
+    """
+    Process pool initializer: loads the text backend (tagger/model) once per worker instead of per chunk.
+    """
+    global _worker_backend
+    _worker_backend = get_backend(backend)
+    _worker_backend.warm_up()
+
+def _analyze_chunk(texts, backend=None, lexicon=None):
+    """
+    Parses a chunk once; returns its metrics and, with a lexicon, category counts from the same tokens.
+    In a pool worker the backend loaded by _init_worker is used (it was built from the same `backend`).
+    """
+    docs = (_worker_backend or get_backend(backend)).parse(texts)
+    counts = lexicon.count_documents(docs) if lexicon is not None else None
+    return analyze_documents(docs), counts
+
+def _count_chunk(texts, lexicon):
+    return lexicon.count_many(texts)
+
+def analysis_pool(n_workers=ANALYSIS_WORKERS, backend=None):
+    """
+    Process pool whose workers load `backend` once (see _init_worker), for callers that analyze
+    many batches (pass it as process_logs(pool=...)). Returns None when n_workers resolves to 1.
+    The caller owns the pool and shuts it down.
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1:
+        return None
+    return ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(backend,))
+
+def _map_chunks(func, items, n_workers=ANALYSIS_WORKERS, chunk_size=ANALYSIS_CHUNK_SIZE,
+                initializer=None, initargs=(), pool=None):
+    """
+    Applies `func` to consecutive chunks of `items`, in a process pool when n_workers != 1.
+    An existing `pool` is used as is (and left running); otherwise one is started for this call.
+    Returns the per-chunk results in the original order.
+    """
+    chunk_size = max(1, chunk_size)
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    if pool is not None:
+        # map() yields results in submission order, so rows come back in order
+        return list(pool.map(func, chunks))
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1 or len(chunks) <= 1:
+        return [func(chunk) for chunk in chunks]
+    
+    with ProcessPoolExecutor(max_workers=min(n_workers, len(chunks)), initializer=initializer, initargs=initargs) as pool:
+        return list(pool.map(func, chunks))
+
+def _analyze_column(texts, n_workers, chunk_size, backend=None, lexicon=None, pool=None):
+    # `backend` is always passed: small inputs run in-process, where no initializer has set _worker_backend
+    parts = _map_chunks(functools.partial(_analyze_chunk, backend=backend, lexicon=lexicon), texts, n_workers,
+                        chunk_size, initializer=_init_worker, initargs=(backend,), pool=pool)
+    metrics = {column: np.concatenate([part[column] for part, _ in parts]) for column in METRIC_COLUMNS}
+    counts = np.concatenate([part for _, part in parts]) if lexicon is not None else None
+    return metrics, counts
+
+def _count_column(texts, lexicon, n_workers, chunk_size, pool=None):
+    parts = _map_chunks(functools.partial(_count_chunk, lexicon=lexicon), texts, n_workers, chunk_size, pool=pool)
+    return np.concatenate(parts)
+
+def _analyze_cached(texts, cache, n_workers, chunk_size, backend=None, pool=None):
+    """
+    Serves known messages from the analysis cache and only analyzes new ones (each distinct text once).
+    """
+    version = analyzer_fingerprint(backend)
+    keys = [content_hash(text) for text in texts]
+    results = cache.get_many(keys, version)
+    
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in results and key not in missing:
+            missing[key] = text
+    
+    if missing:
+        fresh, _ = _analyze_column(list(missing.values()), n_workers, chunk_size, backend, pool=pool)
+        new_results = {
+            key: {column: fresh[column][i].item() for column in METRIC_COLUMNS}
+            for i, key in enumerate(missing)
+        }
+        cache.put_many(new_results, version)
+        results.update(new_results)
+    logger.info(f"Stylometry: {len(texts) - len(missing)} messages from cache, {len(missing)} analyzed")
+    
+    return {column: np.array([results[key][column] for key in keys]) for column in METRIC_COLUMNS}
+
+def _compile_lexicon(category_dict, backend=None):
+    """
+    Lexicon compiled for the text backend, so its entries split like the parsed messages.
+    """
+    if not category_dict:
+        return None
+    if isinstance(category_dict, Lexicon):
+        return category_dict.for_backend(get_backend(backend))
+    return Lexicon(category_dict, get_backend(backend))
+
+def process_logs(df, n_workers=ANALYSIS_WORKERS, chunk_size=ANALYSIS_CHUNK_SIZE, cache=None, backend=None,
+                 category_dict=None, pool=None):
     """
     Applies text analysis to a DataFrame of conversation logs.
     Expects a 'content' column.
     Returns the DataFrame with added metric columns.
+    n_workers > 1 (or None for all cores) shards the messages across a process pool.
+    With an AnalysisCache, only messages not analyzed before (by content hash) are processed.
+    `backend` selects the tokenizer/tagger for this run (see text_backends).
+    With a `category_dict` (or Lexicon), category count columns are added as well, counted
+    on the words of the same parse (entries are split by the same backend).
+    `pool` (see analysis_pool) reuses running workers across calls instead of starting a pool per call.
     """
     if df.empty or "content" not in df.columns:
         return df
         
-    # Apply analysis to each message
-    # We use apply with a lambda to expand the dictionary into columns
-    metrics_df = df["content"].apply(lambda x: pd.Series(analyze_text(x)))
+    # Analyze the column in batches and build metric columns from the arrays
+    texts = df["content"].tolist()
+    lexicon = _compile_lexicon(category_dict, backend)
+    if cache is None:
+        metrics, counts = _analyze_column(texts, n_workers, chunk_size, backend, lexicon, pool)
+    else:
+        metrics = _analyze_cached(texts, cache, n_workers, chunk_size, backend, pool)
+        # Cached messages are not re-parsed; the lexicon only needs the backend's tokenizer
+        counts = _count_column(texts, lexicon, n_workers, chunk_size, pool) if lexicon is not None else None
+    frames = [df, pd.DataFrame(metrics, index=df.index)]
+    if counts is not None:
+        frames.append(pd.DataFrame(counts, index=df.index, columns=lexicon.categories))
     
     # Concatenate with original dataframe
-    result_df = pd.concat([df, metrics_df], axis=1)
+    result_df = pd.concat(frames, axis=1)
     
     return result_df
 
 def count_custom_words(text, category_dict):
     """
     Counts occurrences of words from user-defined categories.
-    category_dict: { "CategoryName": ["word1", "word2"], ... }
+    category_dict: { "CategoryName": ["word1", "prefix*", "multi word"], ... } or a compiled
+    Lexicon (compile once with Lexicon(category_dict) when counting many texts).
     Returns a dictionary with counts for each category.
     """
-    text_lower = text.lower()
-    tokens = text_lower.split() # Simple tokenization for word matching
-    
-    counts = {cat: 0 for cat in category_dict}
-    
-    for cat, words in category_dict.items():
-        for word in words:
-            # Simple matching: count occurrences of the word in the token list
-            # Note: This is a basic implementation. For more robust matching (regex, stems), 
-            # more complex logic would be needed.
-            counts[cat] += tokens.count(word.lower())
-            
-    return counts
+    lexicon = category_dict if isinstance(category_dict, Lexicon) else Lexicon(category_dict)
+    return lexicon.count(text)
 
-def process_custom_lexicon(df, category_dict):
+def process_custom_lexicon(df, category_dict, n_workers=ANALYSIS_WORKERS, chunk_size=ANALYSIS_CHUNK_SIZE):
     """
     Applies custom lexicon counting to the dataframe.
+    category_dict may be a plain dict or a compiled Lexicon; messages are split by the
+    lexicon's tokenizer (its backend's, if it was compiled for one).
+    n_workers > 1 (or None for all cores) shards the messages across a process pool.
     """
     if df.empty or "content" not in df.columns or not category_dict:
         return df
         
-    lexicon_df = df["content"].apply(lambda x: pd.Series(count_custom_words(x, category_dict)))
+    lexicon = category_dict if isinstance(category_dict, Lexicon) else Lexicon(category_dict)
+    counts = _count_column(df["content"].tolist(), lexicon, n_workers, chunk_size)
+    lexicon_df = pd.DataFrame(counts, index=df.index, columns=lexicon.categories)
     return pd.concat([df, lexicon_df], axis=1)
@@ -0,0 +1,222 @@
+import time
+import uuid
+import asyncio
+import logging
+import itertools
+from typing import List, Dict, Any, Optional, Callable
+
+from orchestrator import AsyncOrchestrator, iterate_in_loop
+from prompt_utils import render_system_prompt, scenario_label, DEFAULT_SCENARIO
+from scheduler import RateLimitScheduler
+from response_cache import ResponseCache
+from simulation_config import NUM_TURNS, ITERATIONS, BATCH_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+
+def build_experiment_grid(models_a: List[str],
+                          models_b: List[str],
+                          personas_a: List[str],
+                          personas_b: List[str],
+                          starters: List[str],
+                          temperatures: List[float],
+                          repetitions: int = ITERATIONS,
+                          scenarios: Optional[List[str]] = None,
+                          custom_instructions: str = "") -> List[Dict[str, Any]]:
+    """
+    Expands the experiment grid into one job dict per conversation.
+    Every combination of the inputs is repeated `repetitions` times.
+    Personas may be PERSONA_LIBRARY names; scenarios are SCENARIO_RULES keys.
+    """
+    jobs = []
+    for model_a, model_b, persona_a, persona_b, starter, temperature, scenario in itertools.product(
+            models_a, models_b, personas_a, personas_b, starters, temperatures, scenarios or [DEFAULT_SCENARIO]):
+        for repetition in range(repetitions):
+            jobs.append({
+                "model_a": model_a,
+                "model_b": model_b,
+                "persona_a": persona_a,
+                "persona_b": persona_b,
+                "starter": starter,
+                "temperature": temperature,
+                "scenario": scenario,
+                "custom_instructions": custom_instructions,
+                "repetition": repetition,
+            })
+    return jobs
+
+
+class ThroughputMeter:
+    """
+    Live throughput counter for a batch run (conversations/min, tokens/sec).
+    """
+    def __init__(self, total: int = 0):
+        self.total = total
+        self.start_time = time.monotonic()
+        self.completed = 0
+        self.failed = 0
+        self.messages = 0
+        self.tokens = 0
+
+    def record_entry(self, log_entry: Dict[str, Any]):
+        self.messages += 1
+        self.tokens += log_entry.get("output_tokens") or 0
+
+    def record_conversation(self, failed: bool = False):
+        if failed:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = max(time.monotonic() - self.start_time, 1e-9)
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "total": self.total,
+            "messages": self.messages,
+            "output_tokens": self.tokens,
+            "elapsed_s": elapsed,
+            "conversations_per_min": self.completed / elapsed * 60,
+            "tokens_per_sec": self.tokens / elapsed,
+        }
+
+
+class BatchRunner:
+    """
+    Runs a grid of conversations concurrently on one event loop.
+    Concurrency is bounded by `concurrency`; per-model limits by `model_rate_limits`
+    ({model_slug: {"rpm": ..., "tpm": ...}}), falling back to `default_rate_limit` if given.
+    All agents in the batch share one RateLimitScheduler (or the one passed in) and
+    `response_cache` (default: the process-wide cache from simulation_config).
+    """
+    def __init__(self,
+                 jobs: List[Dict[str, Any]],
+                 num_turns: int = NUM_TURNS,
+                 concurrency: int = BATCH_CONCURRENCY,
+                 model_rate_limits: Optional[Dict[str, Dict[str, float]]] = None,
+                 default_rate_limit: Optional[Dict[str, float]] = None,
+                 scheduler: Optional[RateLimitScheduler] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 max_tokens: int = 1000,
+                 max_history_turns: int = 20,
+                 on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 batch_id: str = None):
+
+        self.batch_id = batch_id or str(uuid.uuid4())
+        self.jobs = jobs
+        self.num_turns = num_turns
+        self.concurrency = concurrency
+        self.scheduler = scheduler or RateLimitScheduler(
+            model_limits=model_rate_limits,
+            default_limits=default_rate_limit
+        )
+        self.response_cache = response_cache
+        self.max_tokens = max_tokens
+        self.max_history_turns = max_history_turns
+        self.on_progress = on_progress
+
+        self.meter = ThroughputMeter(total=len(jobs))
+        self.logs: List[Dict[str, Any]] = []
+
+    def _build_orchestrator(self, job: Dict[str, Any]) -> AsyncOrchestrator:
+        scenario = job.get("scenario", DEFAULT_SCENARIO)
+        custom_instructions = job.get("custom_instructions", "")
+        agent_configs = []
+        for side in ("a", "b"):
+            # Memoized: repeated personas across the grid are rendered once
+            prompt = render_system_prompt(job[f"persona_{side}"], scenario, custom_instructions)
+            model = job[f"model_{side}"]
+            agent_configs.append({
+                "model": model,
+                "system_prompt": prompt["text"],
+                "user_persona_snapshot": prompt["persona"],
+                "prompt_scenario": scenario,
+                "custom_instructions": custom_instructions,
+                "max_history_turns": self.max_history_turns,
+                "params": {"temperature": job["temperature"], "max_tokens": self.max_tokens},
+                "scheduler": self.scheduler,
+                # Each repetition samples its own replies instead of replaying a cached one
+                "cache_replicate": job["repetition"],
+            })
+        return AsyncOrchestrator(
+            agent_a_config=agent_configs[0],
+            agent_b_config=agent_configs[1],
+            scenario_name=scenario_label(job["persona_a"], job["persona_b"], scenario, custom_instructions),
+            response_cache=self.response_cache
+        )
+
+    async def _worker(self, job_queue: asyncio.Queue, out_queue: asyncio.Queue):
+        while True:
+            try:
+                job = job_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            failed = False
+            try:
+                orchestrator = self._build_orchestrator(job)
+                async for log_entry in orchestrator.run_simulation(self.num_turns, initial_message=job["starter"]):
+                    # Tag entries with their grid cell so sweeps can be grouped later
+                    log_entry["batch_id"] = self.batch_id
+                    log_entry["temperature"] = job["temperature"]
+                    log_entry["repetition"] = job["repetition"]
+                    self.meter.record_entry(log_entry)
+                    await out_queue.put(log_entry)
+                # run_simulation logs API errors and stops instead of raising
+                if not orchestrator.completed:
+                    logger.error(f"Batch {self.batch_id}: conversation {orchestrator.experiment_id} stopped "
+                                 f"at turn {orchestrator.next_turn_id} ({orchestrator.next_speaker}) for job {job}")
+                    failed = True
+            except Exception as e:
+                logger.error(f"Batch {self.batch_id}: conversation failed for job {job}: {e}")
+                failed = True
+            self.meter.record_conversation(failed=failed)
+            if self.on_progress:
+                self.on_progress(self.meter.snapshot())
+
+    async def run(self):
+        """
+        Runs every job and yields log entries from all conversations as they arrive.
+        """
+        logger.info(f"Starting batch {self.batch_id}: {len(self.jobs)} conversations, concurrency {self.concurrency}")
+        self.meter = ThroughputMeter(total=len(self.jobs))
+
+        job_queue: asyncio.Queue = asyncio.Queue()
+        for job in self.jobs:
+            job_queue.put_nowait(job)
+        out_queue: asyncio.Queue = asyncio.Queue()
+
+        workers = [
+            asyncio.create_task(self._worker(job_queue, out_queue))
+            for _ in range(min(self.concurrency, len(self.jobs)))
+        ]
+
+        async def _close_when_done():
+            await asyncio.gather(*workers)
+            await out_queue.put(None)
+
+        closer = asyncio.create_task(_close_when_done())
+
+        try:
+            while True:
+                log_entry = await out_queue.get()
+                if log_entry is None:
+                    break
+                self.logs.append(log_entry)
+                yield log_entry
+        finally:
+            closer.cancel()
+            for worker in workers:
+                worker.cancel()
+
+        stats = self.meter.snapshot()
+        logger.info(
+            f"Batch {self.batch_id} completed: {stats['completed']}/{stats['total']} conversations "
+            f"({stats['conversations_per_min']:.1f} conv/min, {stats['tokens_per_sec']:.1f} tok/s)"
+        )
+
+    def run_sync(self):
+        """
+        Blocking counterpart of run() for callers without an event loop.
+        """
+        yield from iterate_in_loop(self.run())
@@ -0,0 +1,113 @@
+"""
+Benchmark: text backends (text_backends) for the stylometry engine on a fixed corpus.
+Reports messages/sec per backend and agreement with a reference backend:
+  - token / sentence count agreement (messages with identical counts)
+  - tag agreement on the messages both backends tokenize identically
+  - mean absolute difference of each stylometric metric
+
+Backends that cannot be loaded here (missing package, model or NLTK data) are skipped.
+
+Usage:
+    python benchmarks/bench_backends.py --repeat 200 --backends nltk spacy regex --reference nltk
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis_utils import analyze_texts, METRIC_COLUMNS  # noqa: E402
+from text_backends import BACKENDS, get_backend  # noqa: E402
+
+# Fixed corpus in the register of simulated conversations (repeated to reach a measurable size)
+CORPUS = [
+    "I think you're right about that. But have you considered what happens when the budget runs out?",
+    "Honestly, I don't know. Maybe we should ask someone who actually worked on the project.",
+    "That's a beautiful idea! Let's write it down before we forget it.",
+    "The committee met on Tuesday and approved 3 of the 5 proposals.",
+    "Why would anyone want to leave such a quiet little town?",
+    "She quickly realized that the old map was completely useless.",
+    "We can't keep going like this. Something has to change, and it has to change now.",
+    "Thank you so much for your help yesterday, I really appreciated it.",
+    "Could you explain the second point again? I'm not sure I followed the argument.",
+    "Prices rose by 12.5% last year, which hurt families with lower incomes the most.",
+    "He said he'd be here at noon, but nobody has seen him since the morning.",
+    "Well... I suppose that's one way of looking at it.",
+    "Running every experiment twice doubles the cost but makes the results far more reliable.",
+    "Our neighbours are friendly, helpful and always ready to lend a hand.",
+    "If the data is wrong, then every conclusion we draw from it is wrong too.",
+    "Let me be clear: this is not about winning an argument.",
+    "The children played outside until it got dark, then came home hungry and tired.",
+    "I'd rather stay home tonight and read a good book.",
+    "Nobody expected the small team to finish the prototype in just two weeks.",
+    "Is it possible that we misunderstood each other from the very beginning?",
+]
+
+
+def benchmark(name, texts):
+    backend = get_backend(name)
+    backend.warm_up()
+    start = time.perf_counter()
+    parsed = backend.parse(texts)
+    elapsed = time.perf_counter() - start
+    return parsed, elapsed
+
+
+def agreement(parsed, reference):
+    token_match = sentence_match = 0
+    tags_equal = tags_total = 0
+    for doc, ref_doc in zip(parsed, reference):
+        tokens = list(zip(doc.tokens(), doc.tags()))
+        ref_tokens = list(zip(ref_doc.tokens(), ref_doc.tags()))
+        token_match += doc.n_tokens == ref_doc.n_tokens
+        sentence_match += doc.n_sentences == ref_doc.n_sentences
+        if [token for token, _ in tokens] == [token for token, _ in ref_tokens]:
+            tags_equal += sum(tag == ref_tag for (_, tag), (_, ref_tag) in zip(tokens, ref_tokens))
+            tags_total += len(tokens)
+    n = len(reference) or 1
+    return token_match / n, sentence_match / n, (tags_equal / tags_total if tags_total else float("nan"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="Copies of the fixed corpus to time")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    parser.add_argument("--reference", default="nltk")
+    args = parser.parse_args()
+
+    texts = CORPUS * args.repeat
+    results = {}
+    for name in args.backends:
+        try:
+            parsed, elapsed = benchmark(name, texts)
+        except Exception as e:  # missing package / model / data
+            print(f"{name:>8}: skipped ({type(e).__name__}: {e})")
+            continue
+        results[name] = parsed
+        print(f"{name:>8}: {len(texts)} messages in {elapsed:.2f}s ({len(texts) / elapsed:,.0f} msgs/sec)")
+
+    if args.reference not in results:
+        print(f"Reference backend '{args.reference}' unavailable; no agreement report.")
+        return
+
+    # Agreement on one copy of the corpus
+    reference = results[args.reference][:len(CORPUS)]
+    reference_metrics = analyze_texts(CORPUS, args.reference)
+    print(f"\nAgreement with {args.reference} on {len(CORPUS)} messages:")
+    for name, parsed in results.items():
+        if name == args.reference:
+            continue
+        tokens, sentences, tags = agreement(parsed[:len(CORPUS)], reference)
+        metrics = analyze_texts(CORPUS, name)
+        deltas = ", ".join(f"{column} {np.abs(metrics[column] - reference_metrics[column]).mean():.3f}"
+                           for column in METRIC_COLUMNS)
+        print(f"{name:>8}: token counts {tokens:.0%}, sentence counts {sentences:.0%}, "
+              f"tags on identical tokens {tags:.1%}")
+        print(f"{'':>8}  mean |diff|: {deltas}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: compiled Lexicon counting (analysis_utils.process_custom_lexicon) vs the legacy
+per-category, per-word `tokens.count` loop, on a LIWC-scale synthetic dictionary.
+
+Usage:
+    python benchmarks/bench_lexicon.py --messages 50000 --categories 70 --entries 6000 --legacy-sample 500
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis_utils import process_custom_lexicon  # noqa: E402
+
+
+def legacy_count_custom_words(text, category_dict):
+    """
+    The original implementation, kept here as the baseline.
+    """
+    text_lower = text.lower()
+    tokens = text_lower.split()
+
+    counts = {cat: 0 for cat in category_dict}
+
+    for cat, words in category_dict.items():
+        for word in words:
+            counts[cat] += tokens.count(word.lower())
+
+    return counts
+
+
+def make_vocabulary(size, rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choices(letters, k=rng.randint(3, 9))) for _ in range(size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--categories", type=int, default=70)
+    parser.add_argument("--entries", type=int, default=6000)
+    parser.add_argument("--legacy-sample", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocabulary = make_vocabulary(args.entries * 3, rng)
+    category_dict = {
+        f"cat_{i}": rng.sample(vocabulary, k=max(1, args.entries // args.categories))
+        for i in range(args.categories)
+    }
+    texts = [" ".join(rng.choices(vocabulary, k=rng.randint(10, 60))).capitalize() for _ in range(args.messages)]
+    df = pd.DataFrame({"content": texts})
+
+    sample = texts[:args.legacy_sample]
+    start = time.perf_counter()
+    legacy = pd.DataFrame([legacy_count_custom_words(text, category_dict) for text in sample])
+    legacy_s = (time.perf_counter() - start) * len(texts) / len(sample)
+
+    start = time.perf_counter()
+    compiled = process_custom_lexicon(df, category_dict)
+    compiled_s = time.perf_counter() - start
+
+    columns = list(category_dict)
+    mismatches = int((legacy[columns].to_numpy() != compiled.head(len(sample))[columns].to_numpy()).sum())
+
+    print(f"messages:            {len(texts)}")
+    print(f"lexicon:             {args.categories} categories, {sum(map(len, category_dict.values()))} entries")
+    print(f"legacy (projected):  {legacy_s:8.2f}s")
+    print(f"compiled:            {compiled_s:8.2f}s")
+    print(f"speedup:             {legacy_s / compiled_s:8.1f}x")
+    print(f"mismatched counts:   {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark: batched stylometry (analysis_utils.process_logs) vs the legacy per-row path.
+
+Usage:
+    python benchmarks/bench_stylometry.py --messages 50000 --legacy-sample 2000 [--workers 8]
+
+The legacy path is timed on `--legacy-sample` messages and extrapolated to the full
+corpus (running it on 50k messages takes a very long time). Results from both paths
+are compared on the sample.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from collections import Counter
+
+import nltk
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis_utils import process_logs, METRIC_COLUMNS  # noqa: E402
+
+WORDS = ("i you we they she he it love think really would could never always maybe "
+         "beautiful quick strange happy sad dinner tonight together slowly gently "
+         "talk walk dance smile laugh wonder feel know want need the a an and but so "
+         "very quite rather definitely absolutely honestly").split()
+
+
+def legacy_analyze_text(text):
+    """
+    The original per-message implementation, kept here as the baseline.
+    """
+    if not text:
+        return {
+            "token_count": 0,
+            "sentence_count": 0,
+            "avg_sentence_length": 0,
+            "noun_ratio": 0,
+            "verb_ratio": 0,
+            "adj_ratio": 0,
+            "adv_ratio": 0,
+            "pron_ratio": 0,
+        }
+
+    # Tokenize
+    tokens = nltk.word_tokenize(text)
+    sentences = nltk.sent_tokenize(text)
+    
+    # POS Tagging (Universal Tagset for simpler tags: NOUN, VERB, ADJ, ADV, etc.)
+    tagged_tokens = nltk.pos_tag(tokens, tagset='universal')
+    
+    # POS Counts
+    pos_counts = Counter([tag for word, tag in tagged_tokens])
+    total_tokens = len(tokens)
+    
+    # Calculate ratios
+    metrics = {
+        "token_count": total_tokens,
+        "sentence_count": len(sentences),
+        "avg_sentence_length": total_tokens / len(sentences) if len(sentences) > 0 else 0,
+        "noun_ratio": pos_counts.get("NOUN", 0) / total_tokens if total_tokens > 0 else 0,
+        "verb_ratio": pos_counts.get("VERB", 0) / total_tokens if total_tokens > 0 else 0,
+        "adj_ratio": pos_counts.get("ADJ", 0) / total_tokens if total_tokens > 0 else 0,
+        "adv_ratio": pos_counts.get("ADV", 0) / total_tokens if total_tokens > 0 else 0,
+        "pron_ratio": pos_counts.get("PRON", 0) / total_tokens if total_tokens > 0 else 0,
+    }
+    
+    return metrics
+
+
+def legacy_process_logs(df):
+    metrics_df = df["content"].apply(lambda x: pd.Series(legacy_analyze_text(x)))
+    return pd.concat([df, metrics_df], axis=1)
+
+
+def make_corpus(n, seed=0):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(n):
+        sentences = []
+        for _ in range(rng.randint(1, 4)):
+            words = rng.choices(WORDS, k=rng.randint(4, 18))
+            sentences.append(" ".join(words).capitalize() + rng.choice([".", "!", "?", "..."]))
+        messages.append(" ".join(sentences))
+    return pd.DataFrame({"content": messages})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--legacy-sample", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for the batched path (0 = all cores)")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    df = make_corpus(args.messages)
+    sample = df.head(args.legacy_sample)
+
+    start = time.perf_counter()
+    legacy = legacy_process_logs(sample)
+    legacy_s = (time.perf_counter() - start) * len(df) / len(sample)
+
+    start = time.perf_counter()
+    batched = process_logs(df, n_workers=args.workers or None, chunk_size=args.chunk_size)
+    batched_s = time.perf_counter() - start
+
+    max_diff = np.abs(
+        legacy[METRIC_COLUMNS].to_numpy(dtype=float) - batched.head(len(sample))[METRIC_COLUMNS].to_numpy(dtype=float)
+    ).max()
+
+    print(f"messages:            {len(df)}")
+    print(f"legacy (projected):  {legacy_s:8.2f}s  ({len(df) / legacy_s:9.0f} msgs/s)")
+    print(f"workers:             {args.workers or os.cpu_count()}")
+    print(f"batched:             {batched_s:8.2f}s  ({len(df) / batched_s:9.0f} msgs/s)")
+    print(f"speedup:             {legacy_s / batched_s:8.1f}x")
+    print(f"max metric diff:     {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import logging
+from collections import deque
+from typing import List, Dict, Optional, Callable, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, str]
+
+
+class ConversationWindow:
+    """
+    Bounded window over the most recent chat messages, backed by a deque ring buffer.
+    Appending is O(1); once the window is full the oldest message is handed to the
+    optional `archive` callable (e.g. list.append or a function writing to disk) and
+    dropped, so memory and per-turn cost stay constant however long the conversation
+    runs. max_messages=None keeps every message.
+    """
+    def __init__(self, max_messages: Optional[int] = None,
+                 archive: Optional[Callable[[Message], None]] = None):
+        self.max_messages = max_messages or None
+        self.archive = archive
+        # Messages evicted from the window so far
+        self.archived = 0
+        self._messages: deque = deque(maxlen=self.max_messages)
+
+    def append(self, message: Message):
+        if self.max_messages and len(self._messages) == self.max_messages:
+            # deque(maxlen) would drop it silently; pass it to the archive first
+            self.evict_oldest()
+        self._messages.append(message)
+
+    def evict_oldest(self) -> Message:
+        """
+        Removes the oldest message early (e.g. to fit a token budget) and archives it.
+        """
+        evicted = self._messages.popleft()
+        self.archived += 1
+        if self.archive is not None:
+            self.archive(evicted)
+        return evicted
+
+    def extend(self, messages: Iterable[Message]):
+        for message in messages:
+            self.append(message)
+
+    def clear(self):
+        self._messages.clear()
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(self._messages)
+
+    def to_list(self) -> List[Message]:
+        return list(self._messages)
+
+    def build(self, *head: Message) -> List[Message]:
+        """
+        Outgoing message list: the head messages (system prompt, summary) followed by the
+        window (copies at most max_messages references, never the whole transcript).
+        """
+        messages = list(head)
+        messages.extend(self._messages)
+        return messages
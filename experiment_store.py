@@ -0,0 +1,268 @@
+import os
+import json
+import uuid
+import shutil
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from simulation_config import EXPERIMENT_STORE_DIR
+from aggregates import AggregateTable, LOG_METRICS
+
+logger = logging.getLogger(__name__)
+
+# Columns stored in each Parquet file. experiment_id and date live in the partition path.
+LOG_SCHEMA = pa.schema([
+    ("turn_id", pa.int64()),
+    ("scenario", pa.string()),
+    ("speaker", pa.string()),
+    ("speaker_model", pa.string()),
+    ("responder_model", pa.string()),
+    ("timestamp", pa.string()),
+    ("latency_ms", pa.float64()),
+    ("ttft_ms", pa.float64()),
+    ("inter_token_latency_ms", pa.float64()),
+    ("input_tokens", pa.int64()),
+    ("output_tokens", pa.int64()),
+    ("cached_input_tokens", pa.int64()),
+    ("uncached_input_tokens", pa.int64()),
+    ("content", pa.string()),
+    ("finish_reason", pa.string()),
+    ("is_refusal", pa.bool_()),
+    ("cache_hit", pa.bool_()),
+    ("system_prompt_hash", pa.string()),
+    ("prompt_scenario", pa.string()),
+    ("has_custom_instructions", pa.bool_()),
+    ("system_prompt_snapshot", pa.string()),
+    ("batch_id", pa.string()),
+    ("temperature", pa.float64()),
+    ("repetition", pa.int64()),
+])
+
+# Per-experiment aggregate sidecars; the leading underscore keeps them out of dataset discovery
+AGGREGATES_DIR = "_aggregates"
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("date", pa.string()), ("experiment_id", pa.string())]),
+    flavor="hive"
+)
+
+
+def summarize_experiment(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Compact index entry for one experiment (used instead of the full transcript in browser storage).
+    """
+    first = entries[0]
+    return {
+        "experiment_id": first["experiment_id"],
+        "scenario": first.get("scenario"),
+        "started_at": first.get("timestamp"),
+        "models": sorted({entry["speaker_model"] for entry in entries if entry.get("speaker_model")}),
+        "messages": len(entries),
+    }
+
+
+class ExperimentStore:
+    """
+    On-disk columnar archive of log entries.
+    Parquet files are partitioned as <root>/date=YYYY-MM-DD/experiment_id=<id>/part-<id>.parquet,
+    so reads filtered by date or experiment only touch the matching directories, and
+    model/scenario filters are pushed down to Parquet row-group statistics.
+    """
+    def __init__(self, root: str = EXPERIMENT_STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def append(self, entries: List[Dict[str, Any]], part_id: Optional[str] = None) -> int:
+        """
+        Writes log entries as new Parquet files (one per date/experiment partition).
+        With `part_id` the files are named part-<part_id>.parquet and replaced atomically,
+        so appending the same batch again overwrites it instead of duplicating rows.
+        Returns the number of rows written.
+        """
+        if not entries:
+            return 0
+
+        partitions: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+        for entry in entries:
+            date = (entry.get("timestamp") or datetime.utcnow().isoformat())[:10]
+            partitions[(date, entry["experiment_id"])].append(entry)
+
+        for (date, experiment_id), rows in partitions.items():
+            directory = os.path.join(self.root, f"date={date}", f"experiment_id={experiment_id}")
+            os.makedirs(directory, exist_ok=True)
+            table = pa.Table.from_pylist(rows, schema=LOG_SCHEMA)
+            name = f"part-{part_id or uuid.uuid4().hex}.parquet"
+            # Dot-prefixed temp files are ignored by dataset discovery
+            tmp_path = os.path.join(directory, f".{name}.tmp")
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, os.path.join(directory, name))
+
+        logger.info(f"Appended {len(entries)} log entries to {self.root}")
+        return len(entries)
+
+    def _dataset(self) -> ds.Dataset:
+        return ds.dataset(
+            self.root,
+            format="parquet",
+            schema=pa.unify_schemas([LOG_SCHEMA, PARTITIONING.schema]),
+            partitioning=PARTITIONING
+        )
+
+    def _filter(self,
+                experiment_ids: Optional[List[str]] = None,
+                models: Optional[List[str]] = None,
+                scenarios: Optional[List[str]] = None,
+                start_date: Optional[str] = None,
+                end_date: Optional[str] = None) -> Optional[ds.Expression]:
+        filters = []
+        if experiment_ids is not None:
+            filters.append(ds.field("experiment_id").isin(list(experiment_ids)))
+        if models is not None:
+            filters.append(ds.field("speaker_model").isin(list(models)))
+        if scenarios is not None:
+            filters.append(ds.field("scenario").isin(list(scenarios)))
+        if start_date:
+            filters.append(ds.field("date") >= str(start_date))
+        if end_date:
+            filters.append(ds.field("date") <= str(end_date))
+
+        expression = None
+        for condition in filters:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def read(self,
+             experiment_ids: Optional[List[str]] = None,
+             models: Optional[List[str]] = None,
+             scenarios: Optional[List[str]] = None,
+             start_date: Optional[str] = None,
+             end_date: Optional[str] = None,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Reads log entries matching all given predicates (None means no filter).
+        Dates are inclusive "YYYY-MM-DD" strings; `columns` limits the columns read.
+        """
+        expression = self._filter(experiment_ids, models, scenarios, start_date, end_date)
+
+        if not self.experiment_ids():
+            return pd.DataFrame(columns=columns or [])
+
+        table = self._dataset().to_table(columns=columns, filter=expression)
+        df = table.to_pandas()
+        if "turn_id" in df.columns and "timestamp" in df.columns:
+            df = df.sort_values(["timestamp", "turn_id"], kind="stable").reset_index(drop=True)
+        return df
+
+    def scan(self,
+             batch_size: int = 10000,
+             columns: Optional[List[str]] = None,
+             **filters) -> Iterator[pd.DataFrame]:
+        """
+        Streams matching log entries as DataFrames of at most `batch_size` rows, so archives
+        larger than memory can be processed. Accepts the same filters as read(); rows are
+        yielded in storage order (not sorted).
+        """
+        if not self.experiment_ids():
+            return
+        expression = self._filter(**filters)
+        for batch in self._dataset().to_batches(columns=columns, filter=expression, batch_size=batch_size):
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def experiment_ids(self) -> List[str]:
+        """
+        Lists stored experiments from the partition directories (no data is read).
+        """
+        ids = set()
+        for date_dir in os.listdir(self.root):
+            date_path = os.path.join(self.root, date_dir)
+            if not date_dir.startswith("date=") or not os.path.isdir(date_path):
+                continue
+            for exp_dir in os.listdir(date_path):
+                if exp_dir.startswith("experiment_id="):
+                    ids.add(exp_dir[len("experiment_id="):])
+        return sorted(ids)
+
+    def delete_experiments(self, experiment_ids: List[str]):
+        """
+        Removes every partition (and aggregate sidecar) belonging to the given experiments.
+        """
+        wanted = set(experiment_ids)
+        for date_dir in os.listdir(self.root):
+            date_path = os.path.join(self.root, date_dir)
+            if not date_dir.startswith("date=") or not os.path.isdir(date_path):
+                continue
+            for exp_dir in os.listdir(date_path):
+                if exp_dir[len("experiment_id="):] in wanted:
+                    shutil.rmtree(os.path.join(date_path, exp_dir))
+
+        aggregates_dir = os.path.join(self.root, AGGREGATES_DIR)
+        if os.path.isdir(aggregates_dir):
+            for filename in os.listdir(aggregates_dir):
+                # <experiment_id>.<kind>.json
+                if filename.rsplit(".", 2)[0] in wanted:
+                    os.remove(os.path.join(aggregates_dir, filename))
+
+    def write_aggregates(self, experiment_id: str, table: AggregateTable, kind: str = "run"):
+        """
+        Atomically replaces the `kind` aggregates of one experiment ("run" for per-turn log
+        metrics, "analysis" for stylometry results). Rewriting is idempotent.
+        """
+        directory = os.path.join(self.root, AGGREGATES_DIR)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{experiment_id}.{kind}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(table.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def aggregated_experiment_ids(self, kind: str = "run") -> List[str]:
+        directory = os.path.join(self.root, AGGREGATES_DIR)
+        if not os.path.isdir(directory):
+            return []
+        suffix = f".{kind}.json"
+        return sorted(name[:-len(suffix)] for name in os.listdir(directory) if name.endswith(suffix))
+
+    def backfill_aggregates(self, experiment_ids: List[str]) -> int:
+        """
+        Builds "run" aggregates for experiments stored before aggregates were maintained.
+        Reads only the grouping and metric columns. Returns the number of experiments built.
+        """
+        missing = sorted((set(experiment_ids) - set(self.aggregated_experiment_ids("run"))) & set(self.experiment_ids()))
+        if not missing:
+            return 0
+        df = self.read(experiment_ids=missing, columns=["experiment_id", "speaker_model", "scenario"] + LOG_METRICS)
+        for experiment_id, group in df.groupby("experiment_id", sort=False):
+            table = AggregateTable()
+            table.update_frame(group, LOG_METRICS)
+            self.write_aggregates(experiment_id, table, kind="run")
+        logger.info(f"Backfilled aggregates for {len(missing)} experiments")
+        return len(missing)
+
+    def read_aggregates(self, experiment_ids: Optional[List[str]] = None,
+                        kinds: Optional[List[str]] = None) -> AggregateTable:
+        """
+        Merges the stored aggregates of the given experiments (None means all) into one table.
+        Only the small sidecar files are read, never the log data.
+        """
+        merged = AggregateTable()
+        directory = os.path.join(self.root, AGGREGATES_DIR)
+        if not os.path.isdir(directory):
+            return merged
+        wanted = set(experiment_ids) if experiment_ids is not None else None
+        for filename in os.listdir(directory):
+            if not filename.endswith(".json"):
+                continue
+            experiment_id, kind = filename.rsplit(".", 2)[:2]
+            if (wanted is not None and experiment_id not in wanted) or (kinds and kind not in kinds):
+                continue
+            with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+                merged.merge(AggregateTable.from_dict(json.load(f)))
+        return merged
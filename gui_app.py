@@ -2,15 +2,55 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import os
-import time
 from streamlit_local_storage import LocalStorage
-from simulation_config import NUM_TURNS
-from analysis_utils import process_logs, process_custom_lexicon
-from prompt_utils import construct_system_prompt
+from simulation_config import NUM_TURNS, RESPONSE_CACHE_MODE, LOG_PATH, CHECKPOINT_DIR, EXPERIMENT_STORE_DIR, ANALYSIS_WORKERS, ANALYSIS_BACKEND, MEMORY_MODE, SUMMARY_MODEL
+from analysis_utils import process_logs, METRIC_COLUMNS
+from aggregates import AggregateTable
+from lexicon import parse_dic
+from text_backends import BACKENDS
+from prompt_utils import render_system_prompt, scenario_label, get_registry, PERSONA_LIBRARY, DEFAULT_SCENARIO
 
 # --- Local Storage Setup ---
 local_storage = LocalStorage()
 
+@st.cache_resource
+def get_log_sink():
+    # One append-only JSONL sink shared by all sessions of this server process
+    from log_sink import JsonlLogSink
+    return JsonlLogSink(LOG_PATH)
+
+@st.cache_resource
+def get_experiment_store():
+    # Server-side columnar archive; sessions only keep the ids of their own experiments
+    from experiment_store import ExperimentStore
+    return ExperimentStore(EXPERIMENT_STORE_DIR)
+
+@st.cache_resource
+def get_response_cache(mode):
+    # One completion cache per mode, shared by the sessions that selected it; "off" disables lookups
+    from response_cache import ResponseCache
+    return ResponseCache(mode=mode)
+
+@st.cache_resource
+def get_analysis_cache():
+    # Per-message stylometry results, so re-running the analysis only processes new messages
+    from analysis_cache import AnalysisCache
+    return AnalysisCache()
+
+def to_records(df):
+    # JSON-safe records (NaN -> None)
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+def session_experiment_ids():
+    return [item["experiment_id"] for item in st.session_state["experiment_index"]]
+
+experiment_store = get_experiment_store()
+
+# Browser storage keeps only a compact index of this user's experiments;
+# transcripts live in the server-side experiment store and are loaded on demand.
+INDEX_KEY = "parrot_lm_index"
+LEGACY_LOGS_KEY = "parrot_lm_logs"
+
 st.set_page_config(page_title="🦜ParrotLM", layout="wide")
 
 st.title("🦜ParrotLM")
@@ -21,17 +61,27 @@ st.markdown("A customizable Python framework for simulating conversations " \
 if "last_generated_config" not in st.session_state:
     st.session_state["last_generated_config"] = {}
 
-# Initialize logs in session state
-if "all_logs" not in st.session_state:
-    # Try to load from local storage
-    saved_logs = local_storage.getItem("parrot_lm_logs")
+# Initialize this browser's experiment index
+if "experiment_index" not in st.session_state:
+    st.session_state["experiment_index"] = local_storage.getItem(INDEX_KEY) or []
+    
+    # One-time migration of full transcripts saved by older versions
+    saved_logs = local_storage.getItem(LEGACY_LOGS_KEY)
     if saved_logs:
         try:
-            st.session_state["all_logs"] = pd.DataFrame(saved_logs)
+            from experiment_store import summarize_experiment
+            saved_df = pd.DataFrame(saved_logs)
+            missing_df = saved_df[~saved_df["experiment_id"].isin(experiment_store.experiment_ids())]
+            experiment_store.append(to_records(missing_df))
+            
+            indexed = set(session_experiment_ids())
+            for experiment_id, group in saved_df.groupby("experiment_id", sort=False):
+                if experiment_id not in indexed:
+                    st.session_state["experiment_index"].append(summarize_experiment(to_records(group)))
+            local_storage.setItem(INDEX_KEY, st.session_state["experiment_index"], key="migrate_index")
+            local_storage.deleteItem(LEGACY_LOGS_KEY, key="migrate_delete_logs")
         except:
-            st.session_state["all_logs"] = pd.DataFrame()
-    else:
-        st.session_state["all_logs"] = pd.DataFrame()
+            pass
 
 # --- Sidebar: Technical Configuration ---
 st.sidebar.header("⚙️ Technical Settings")
@@ -43,10 +93,14 @@ if api_key:
 
 if st.sidebar.button("🗑️ Clear My Local Data", help="Wipes all conversation history from your browser storage."):
     local_storage.deleteAllItems()
-    st.session_state["all_logs"] = pd.DataFrame()
+    experiment_store.delete_experiments(session_experiment_ids())
+    st.session_state["experiment_index"] = []
     st.success("Local data cleared!")
     st.rerun()
 
+cache_modes = ["off", "read-through", "replay-only"]
+cache_mode = st.sidebar.selectbox("Response Cache", cache_modes, index=cache_modes.index(RESPONSE_CACHE_MODE), help="**read-through** reuses stored replies for identical requests (same models, personas, history and parameters) and stores new ones. **replay-only** never calls the API and stops at the first uncached reply.")
+
 num_turns = st.sidebar.slider("Turns per Chatbot", 1, 100, NUM_TURNS, help="The number of times each chatbot will speak. Total messages = Turns * 2.")
 # iterations = st.sidebar.slider("Iterations", 1, 10, ITERATIONS) # Hidden for single run focus
 
@@ -55,6 +109,57 @@ temp_a = st.sidebar.slider("Chatbot A Temperature", 0.0, 2.0, 1.0, 0.1, help="Co
 temp_b = st.sidebar.slider("Chatbot B Temperature", 0.0, 2.0, 1.0, 0.1)
 max_tokens = st.sidebar.slider("Max Tokens", 100, 4000, 1000, help="The maximum length of a single response. Increase this if responses feel cut off.")
 context_window = st.sidebar.slider("Context Window (Turns)", 1, 50, 20, help="🧠 **Short-Term Memory**: This controls how many previous messages the chatbot 'remembers' at once. \n\nIf the conversation is very long, the models will 'forget' the beginning to make room for new messages. Keeping this around 20-30 prevents technical errors in long simulations.")
+memory_modes = ["window", "summary"]
+memory_mode = st.sidebar.selectbox("Long-Term Memory", memory_modes, index=memory_modes.index(MEMORY_MODE), help="**window** forgets messages that leave the context window. **summary** folds them into a running summary the chatbots keep seeing, so long conversations stay consistent without growing the prompt.")
+summary_model = st.sidebar.text_input("Summarizer Model Slug", SUMMARY_MODEL or "", disabled=memory_mode != "summary", help="Leave empty for the built-in extractive summarizer (no extra API calls).")
+
+# --- Sidebar: Data Filters (pushed down to the experiment store) ---
+st.sidebar.markdown("### Data Filters")
+# Options come from the index, so no transcript is read to build them
+experiment_index = st.session_state["experiment_index"]
+filter_models = st.sidebar.multiselect("Models", sorted({m for item in experiment_index for m in item["models"]}))
+filter_scenarios = st.sidebar.multiselect("Scenarios", sorted({item["scenario"] for item in experiment_index}))
+filter_dates = st.sidebar.date_input("Date Range", value=[], help="Leave empty to include all dates.")
+
+def load_logs(columns=None):
+    """
+    Reads this session's experiments from the store, applying the sidebar filters.
+    """
+    if not st.session_state["experiment_index"]:
+        return pd.DataFrame()
+    return experiment_store.read(
+        experiment_ids=session_experiment_ids(),
+        models=filter_models or None,
+        scenarios=filter_scenarios or None,
+        start_date=filter_dates[0].isoformat() if len(filter_dates) > 0 else None,
+        end_date=filter_dates[-1].isoformat() if len(filter_dates) > 0 else None,
+        columns=columns
+    )
+
+def filtered_experiment_ids():
+    """
+    This session's experiments matching the scenario and date filters, resolved from the index.
+    """
+    start = filter_dates[0].isoformat() if len(filter_dates) > 0 else None
+    end = filter_dates[-1].isoformat() if len(filter_dates) > 0 else None
+    ids = []
+    for item in st.session_state["experiment_index"]:
+        date = (item.get("started_at") or "")[:10]
+        if filter_scenarios and item["scenario"] not in filter_scenarios:
+            continue
+        if (start and date < start) or (end and date > end):
+            continue
+        ids.append(item["experiment_id"])
+    return ids
+
+def aggregate_frame(table, metrics):
+    """
+    Per-model summary rows (mean and 95% CI half-width) of the given metrics, for charting.
+    """
+    frame = table.filter(speaker_model=filter_models).rollup(["speaker_model"]).to_frame()
+    frame = frame[frame["metric"].isin(metrics)].copy()
+    frame["ci_error"] = frame["ci_high"] - frame["mean"]
+    return frame
 
 # --- Tabs: Main Structure ---
 # New tab structure:
@@ -67,17 +172,22 @@ tab1, tab2, tab3 = st.tabs(["🎭 Chatbot Setup", "📊 Basic Analysis", "🧠 S
 # --- Tab 1: Agent & Simulation Setup ---
 with tab1:
     st.markdown("### 🎭 Configure the Encounter")
+    persona_help = "Free text, or a persona library name: " + ", ".join(PERSONA_LIBRARY)
     
     col1, col2 = st.columns(2)
     with col1:
         st.markdown("#### Chatbot A")
         model_a_slug = st.text_input("Model A Slug", "cognitivecomputations/dolphin-mistral-24b-venice-edition:free", key="model_a")
-        persona_a = st.text_area("Persona", "A mysterious stranger at a jazz club", height=100)
+        persona_a = st.text_area("Persona", "A mysterious stranger at a jazz club", height=100, help=persona_help)
 
     with col2:
         st.markdown("#### Chatbot B")
         model_b_slug = st.text_input("Model B Slug", "cognitivecomputations/dolphin-mistral-24b-venice-edition:free", key="model_b")
-        persona_b = st.text_area("Persona", "A sharp-witted bartender", height=100)
+        persona_b = st.text_area("Persona", "A sharp-witted bartender", height=100, help=persona_help)
+
+    scenarios = get_registry().scenarios
+    scenario = st.selectbox("Scenario", scenarios, index=scenarios.index(DEFAULT_SCENARIO), help="Rule block shared by both system prompts.")
+    custom_instructions = st.text_area("Custom instructions (optional)", "", height=68, help="Appended to both system prompts.")
 
     st.markdown("---")
     initial_message = st.text_input("The conversation starts with:", "Is this seat taken?")
@@ -86,8 +196,10 @@ with tab1:
         st.write("### 🟢 Live Conversation")
         
         # Hidden System Prompt Generation
-        system_prompt_a = construct_system_prompt(persona_a)
-        system_prompt_b = construct_system_prompt(persona_b)
+        prompt_a = render_system_prompt(persona_a, scenario, custom_instructions)
+        prompt_b = render_system_prompt(persona_b, scenario, custom_instructions)
+        system_prompt_a = prompt_a["text"]
+        system_prompt_b = prompt_b["text"]
 
         # Containers for layout
         chat_container = st.container()
@@ -98,56 +210,85 @@ with tab1:
         chatbot_a_config = {
             "model": model_a_slug,
             "system_prompt": system_prompt_a,
-            "user_persona_snapshot": persona_a,
+            "user_persona_snapshot": prompt_a["persona"],
+            "prompt_scenario": scenario,
+            "custom_instructions": custom_instructions,
             "max_history_turns": context_window,
+            "memory": memory_mode,
+            "summary_model": summary_model or None,
             "params": {"temperature": temp_a, "max_tokens": max_tokens}
         }
         chatbot_b_config = {
             "model": model_b_slug,
             "system_prompt": system_prompt_b,
-            "user_persona_snapshot": persona_b,
+            "user_persona_snapshot": prompt_b["persona"],
+            "prompt_scenario": scenario,
+            "custom_instructions": custom_instructions,
             "max_history_turns": context_window,
+            "memory": memory_mode,
+            "summary_model": summary_model or None,
             "params": {"temperature": temp_b, "max_tokens": max_tokens}
         }
         
         orchestrator = Orchestrator(
             agent_a_config=chatbot_a_config,
             agent_b_config=chatbot_b_config,
-            scenario_name=f"{persona_a[:15]} vs {persona_b[:15]}" 
+            scenario_name=scenario_label(persona_a, persona_b, scenario, custom_instructions),
+            response_cache=get_response_cache(cache_mode),
+            log_sink=get_log_sink(),
+            checkpoint_dir=CHECKPOINT_DIR,
+            experiment_store=experiment_store
         )
         
         # Run and Stream
         total_tokens = 0
+        # Placeholder of the chat bubble currently receiving tokens, keyed by (turn_id, speaker)
+        live_bubble = {"key": None, "placeholder": None}
+        
+        def open_bubble(is_agent_a):
+            speaker_label = persona_a if is_agent_a else persona_b
+            avatar = "🎭" if is_agent_a else "🍸"
+            
+            if len(speaker_label) > 50: speaker_label = speaker_label[:47] + "..."
+            
+            with chat_container:
+                # Use the speaker persona as the name for the chat message
+                with st.chat_message(name=speaker_label, avatar=avatar):
+                    return st.empty()
         
         try:
             with st.spinner("Agents are conversing..."):
-                for log_entry in orchestrator.run_simulation(num_turns, initial_message=initial_message): 
+                for log_entry in orchestrator.run_simulation(num_turns, initial_message=initial_message, stream=True): 
+                    if log_entry.get("event") == "partial":
+                        # Update the live bubble in place as tokens arrive
+                        bubble_key = (log_entry["turn_id"], log_entry["speaker"])
+                        if live_bubble["key"] != bubble_key:
+                            live_bubble["key"] = bubble_key
+                            live_bubble["placeholder"] = open_bubble(log_entry["speaker"] == "Agent A")
+                        live_bubble["placeholder"].markdown(log_entry["content"] + "▌")
+                        continue
+                    
                     # Accumulate tokens
                     total_tokens += log_entry["output_tokens"]
                     
-                    # Determine label and avatar
-                    is_agent_a = log_entry["speaker_model"] == model_a_slug
-                    speaker_label = persona_a if is_agent_a else persona_b
-                    avatar = "🎭" if is_agent_a else "🍸"
+                    # Determine which bubble to finalize
+                    is_agent_a = log_entry["speaker"] == "Agent A"
+                    if live_bubble["placeholder"] is None:
+                        live_bubble["placeholder"] = open_bubble(is_agent_a)
+                    live_bubble["placeholder"].write(log_entry["content"])
+                    live_bubble["key"], live_bubble["placeholder"] = None, None
                     
-                    if len(speaker_label) > 50: speaker_label = speaker_label[:47] + "..."
+                    ttft = f"⚡ {log_entry['ttft_ms']:.0f}ms first token | " if log_entry.get("ttft_ms") is not None else ""
                     
-                    # Display Message
+                    # Metadata OUTSIDE and BELOW the bubble for a cleaner look
                     with chat_container:
-                        # Use the speaker persona as the name for the chat message
-                        with st.chat_message(name=speaker_label, avatar=avatar):
-                            st.write(log_entry["content"])
-                        
-                        # Metadata OUTSIDE and BELOW the bubble for a cleaner look
                         st.markdown(
                             f"<div style='text-align: right; margin-top: -15px; margin-bottom: 10px;'>"
                             f"<span style='color: gray; font-size: 0.8rem;'>"
-                            f"⏱️ {log_entry['latency_ms']:.0f}ms | 🔢 {log_entry['output_tokens']} tokens | 🤖 {log_entry['speaker_model']}"
+                            f"{ttft}⏱️ {log_entry['latency_ms']:.0f}ms | 🔢 {log_entry['output_tokens']} tokens | 🤖 {log_entry['speaker_model']}"
                             f"</span></div>", 
                             unsafe_allow_html=True
                         )
-                    
-                    time.sleep(0.1)
             
             st.success(f"Simulation Complete. Total Tokens: {total_tokens}")
             
@@ -155,15 +296,14 @@ with tab1:
             st.error(f"❌ Simulation Error: {str(e)}")
             st.info("💡 Tip: Try increasing 'Max Tokens' if the API is failing with low values.")
                 
-        # Save logs to session state and LocalStorage
-        new_logs_df = pd.DataFrame(orchestrator.logs)
-        if st.session_state["all_logs"].empty:
-            st.session_state["all_logs"] = new_logs_df
-        else:
-            st.session_state["all_logs"] = pd.concat([st.session_state["all_logs"], new_logs_df], ignore_index=True)
+        # The orchestrator has already appended this run to the experiment store;
+        # the browser only receives this experiment's index entry
+        if orchestrator.logs:
+            from experiment_store import summarize_experiment
+            st.session_state["experiment_index"].append(summarize_experiment(orchestrator.logs))
         
-        # Sync with LocalStorage
-        local_storage.setItem("parrot_lm_logs", st.session_state["all_logs"].to_dict('records'))
+        # Sync index with LocalStorage
+        local_storage.setItem(INDEX_KEY, st.session_state["experiment_index"], key="save_index")
         st.success("Simulation Finished & Persisted Locally!")
 
 # --- Tab 2: Basic Analysis ---
@@ -172,19 +312,31 @@ with tab2:
     if st.button("Refresh Data", key="refresh_basic"):
         st.rerun()
         
-    if not st.session_state["all_logs"].empty:
-        df = st.session_state["all_logs"]
-        st.dataframe(df)
+    if st.session_state["experiment_index"]:
+        st.subheader("Experiments")
+        st.dataframe(pd.DataFrame(st.session_state["experiment_index"]))
         
+        # Transcripts are loaded lazily, one experiment at a time
+        selected_experiment = st.selectbox("View Transcript", [None] + session_experiment_ids(), format_func=lambda x: "—" if x is None else x)
+        if selected_experiment:
+            st.dataframe(experiment_store.read(experiment_ids=[selected_experiment]))
+    
+    # Charts render from per-experiment aggregates (one row per model), not from the transcripts
+    chart_ids = filtered_experiment_ids()
+    experiment_store.backfill_aggregates(chart_ids)
+    run_aggregates = aggregate_frame(experiment_store.read_aggregates(chart_ids, kinds=["run"]), ["latency_ms", "output_tokens"])
+    if not run_aggregates.empty:
         st.subheader("Metrics Overview")
         col1, col2 = st.columns(2)
         with col1:
-            avg_latency = df.groupby("speaker_model")["latency_ms"].mean().reset_index()
-            fig_latency = px.bar(avg_latency, x="speaker_model", y="latency_ms", title="Average Latency (ms)")
+            avg_latency = run_aggregates[run_aggregates["metric"] == "latency_ms"]
+            fig_latency = px.bar(avg_latency, x="speaker_model", y="mean", error_y="ci_error",
+                                 labels={"mean": "latency_ms"}, title="Average Latency (ms, 95% CI)")
             st.plotly_chart(fig_latency, use_container_width=True)
         with col2:
-            avg_tokens = df.groupby("speaker_model")["output_tokens"].mean().reset_index()
-            fig_tokens = px.bar(avg_tokens, x="speaker_model", y="output_tokens", title="Average Output Tokens")
+            avg_tokens = run_aggregates[run_aggregates["metric"] == "output_tokens"]
+            fig_tokens = px.bar(avg_tokens, x="speaker_model", y="mean", error_y="ci_error",
+                                labels={"mean": "output_tokens"}, title="Average Output Tokens (95% CI)")
             st.plotly_chart(fig_tokens, use_container_width=True)
     else:
         st.info("No data found.")
@@ -195,7 +347,7 @@ with tab3:
     
     # --- Custom Lexicon Input ---
     st.subheader("🏷️ Custom Lexicon Configuration")
-    st.markdown("Define specific word categories to track during the conversation.")
+    st.markdown("Define specific word categories to track during the conversation. End an entry with `*` to match every word starting with it (e.g. `happ*`).")
     
     # Initialize session state for lexicon if not exists
     if "custom_lexicon" not in st.session_state:
@@ -211,7 +363,7 @@ with tab3:
         with lex_col1:
             item["category"] = st.text_input(f"Category Name {i}", item["category"], key=f"lex_cat_{i}", placeholder="Category", label_visibility="collapsed")
         with lex_col2:
-            item["words"] = st.text_input(f"Words {i}", item["words"], key=f"lex_words_{i}", placeholder="words, separated, by, commas", label_visibility="collapsed")
+            item["words"] = st.text_input(f"Words {i}", item["words"], key=f"lex_words_{i}", placeholder="words, prefix*, multi-word phrases, separated by commas", label_visibility="collapsed")
         with lex_col3:
             if st.button("🗑️", key=f"lex_del_{i}", help="Remove category"):
                 st.session_state["custom_lexicon"].pop(i)
@@ -227,15 +379,32 @@ with tab3:
         for item in st.session_state["custom_lexicon"]
         if item["category"].strip()
     }
+
+    # Optional LIWC-style dictionary; its categories are added to (and override) the ones above
+    dic_file = st.file_uploader("Import LIWC dictionary (.dic)", type=["dic"])
+    if dic_file is not None:
+        try:
+            dic_categories = parse_dic(dic_file.getvalue().decode("utf-8-sig"))
+            category_dict.update(dic_categories)
+            st.caption(f"Loaded {len(dic_categories)} categories, "
+                       f"{sum(len(words) for words in dic_categories.values())} entries from {dic_file.name}")
+        except (ValueError, UnicodeDecodeError) as e:
+            st.error(f"Could not read {dic_file.name}: {e}")
     
     st.markdown("---")
+    n_workers = st.number_input("Worker processes", min_value=1, max_value=os.cpu_count() or 1,
+                                value=min(ANALYSIS_WORKERS or os.cpu_count() or 1, os.cpu_count() or 1),
+                                help="Shards the analysis across CPU cores (1 = single process)")
+    backend_names = list(BACKENDS)
+    backend = st.selectbox("Text backend", backend_names,
+                           index=backend_names.index(ANALYSIS_BACKEND) if ANALYSIS_BACKEND in backend_names else 0,
+                           help="Tokenizer/POS tagger: nltk (reference), spacy (needs a model), regex (fast, approximate)")
     if st.button("🚀 Run Analysis", type="primary", use_container_width=True):
-        if not st.session_state["all_logs"].empty:
+        df = load_logs()
+        if not df.empty:
             with st.spinner("Processing text..."):
-                df = st.session_state["all_logs"]
-                analyzed_df = process_logs(df)
-                if category_dict:
-                    analyzed_df = process_custom_lexicon(analyzed_df, category_dict)
+                analyzed_df = process_logs(df, n_workers=int(n_workers), cache=get_analysis_cache(), backend=backend,
+                                           category_dict=category_dict)
                 
                 st.success("Analysis Complete!")
                 st.dataframe(analyzed_df)
@@ -249,25 +418,34 @@ with tab3:
                     mime='text/csv',
                 )
                 
+                # Summarize once into aggregates; charts render from those O(models) rows
+                metric_cols = METRIC_COLUMNS + list(category_dict)
+                analysis_aggregates = AggregateTable()
+                analysis_aggregates.update_frame(analyzed_df, metric_cols)
+                if not filter_models and len(filter_dates) == 0:
+                    # Whole experiments were analyzed, so their stored analysis aggregates can be replaced
+                    for experiment_id, group in analyzed_df.groupby("experiment_id", sort=False):
+                        table = AggregateTable()
+                        table.update_frame(group, metric_cols)
+                        experiment_store.write_aggregates(experiment_id, table, kind="analysis")
+                
                 st.subheader("Linguistic Patterns")
                 pos_cols = ["noun_ratio", "verb_ratio", "adj_ratio", "adv_ratio"]
-                avg_pos = analyzed_df.groupby("speaker_model")[pos_cols].mean().reset_index()
-                melted_pos = avg_pos.melt(id_vars="speaker_model", var_name="POS Type", value_name="Ratio")
+                avg_pos = aggregate_frame(analysis_aggregates, pos_cols).rename(columns={"metric": "POS Type", "mean": "Ratio"})
                 
                 # Inverted: Group by POS Type, Color by Model
-                fig_pos = px.bar(melted_pos, x="POS Type", y="Ratio", color="speaker_model", barmode="group", 
-                                 title="POS Distribution (Grouped by Category)")
+                fig_pos = px.bar(avg_pos, x="POS Type", y="Ratio", color="speaker_model", barmode="group", error_y="ci_error",
+                                 title="POS Distribution (Grouped by Category, 95% CI)")
                 st.plotly_chart(fig_pos, use_container_width=True)
                 
                 if category_dict:
                     st.subheader("Custom Category Frequencies")
                     lex_cols = list(category_dict.keys())
-                    avg_lex = analyzed_df.groupby("speaker_model")[lex_cols].mean().reset_index()
-                    melted_lex = avg_lex.melt(id_vars="speaker_model", var_name="Category", value_name="Avg Count")
+                    avg_lex = aggregate_frame(analysis_aggregates, lex_cols).rename(columns={"metric": "Category", "mean": "Avg Count"})
                     
                     # Inverted: Group by Category, Color by Model
-                    fig_lex = px.bar(melted_lex, x="Category", y="Avg Count", color="speaker_model", barmode="group", 
-                                     title="Custom Word Usage (Grouped by Category)")
+                    fig_lex = px.bar(avg_lex, x="Category", y="Avg Count", color="speaker_model", barmode="group", error_y="ci_error",
+                                     title="Custom Word Usage (Grouped by Category, 95% CI)")
                     st.plotly_chart(fig_lex, use_container_width=True)
         else:
             st.warning("No data found.")
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Dict, Any, Tuple, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+# Connection pool settings shared by every client in the registry.
+# Change them with configure_pool() before the first request.
+POOL_SETTINGS: Dict[str, Any] = {
+    "max_connections": 200,
+    "max_keepalive_connections": 50,
+    "keepalive_expiry": 60.0,
+    # HTTP/2 multiplexes many requests over one connection (`h2` comes with httpx[http2])
+    "http2": True,
+    "timeout": 120.0,
+}
+
+# Retries are owned by scheduler.RateLimitScheduler, so the SDK's own retry loop is disabled
+CLIENT_MAX_RETRIES = 0
+
+_lock = threading.Lock()
+# httpx async pools are bound to the event loop that opened them, so async clients
+# are registered per loop and dropped automatically when the loop is garbage collected.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+
+
+def configure_pool(max_connections: Optional[int] = None,
+                   max_keepalive_connections: Optional[int] = None,
+                   keepalive_expiry: Optional[float] = None,
+                   http2: Optional[bool] = None,
+                   timeout: Optional[float] = None):
+    """
+    Tunes the pool limits used for clients created from now on.
+    Existing clients keep their settings until aclose_clients() is called on their loop.
+    """
+    updates = {
+        "max_connections": max_connections,
+        "max_keepalive_connections": max_keepalive_connections,
+        "keepalive_expiry": keepalive_expiry,
+        "http2": http2,
+        "timeout": timeout,
+    }
+    with _lock:
+        POOL_SETTINGS.update({k: v for k, v in updates.items() if v is not None})
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=POOL_SETTINGS["max_connections"],
+        max_keepalive_connections=POOL_SETTINGS["max_keepalive_connections"],
+        keepalive_expiry=POOL_SETTINGS["keepalive_expiry"],
+    )
+
+
+def get_async_client(base_url: str, api_key: str) -> AsyncOpenAI:
+    """
+    Returns the shared async client for (base_url, api_key) on the running event loop.
+    Must be called from inside a coroutine.
+    """
+    loop = asyncio.get_running_loop()
+    key = (base_url, api_key)
+    with _lock:
+        loop_clients = _async_clients.setdefault(loop, {})
+        client = loop_clients.get(key)
+        if client is None:
+            http_client = httpx.AsyncClient(
+                limits=_limits(),
+                http2=POOL_SETTINGS["http2"],
+                timeout=POOL_SETTINGS["timeout"],
+            )
+            client = AsyncOpenAI(base_url=base_url, api_key=api_key, http_client=http_client,
+                                 max_retries=CLIENT_MAX_RETRIES)
+            loop_clients[key] = client
+        return client
+
+
+async def aclose_clients():
+    """
+    Closes the async clients registered on the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        loop_clients = _async_clients.pop(loop, {})
+    for client in loop_clients.values():
+        await client.close()
+
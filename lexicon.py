@@ -0,0 +1,202 @@
+import re
+import logging
+from collections import Counter
+from typing import List, Dict, Tuple, Iterable, Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Words are runs of letters/digits, keeping internal apostrophes ("don't", "I'm");
+# punctuation and other symbols separate tokens, so "happy," matches "happy".
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:'[^\W_]+)*")
+
+# Trie key marking the end of a `prefix*` entry (cannot clash with a token character)
+_WILDCARD = "*"
+
+
+def tokenize(text: Any) -> List[str]:
+    """
+    Lowercased, punctuation-aware word tokens used for lexicon matching.
+    """
+    if not isinstance(text, str):
+        return []
+    return TOKEN_PATTERN.findall(text.lower().replace("’", "'"))
+
+
+def parse_dic(text: str) -> Dict[str, List[str]]:
+    """
+    Parses a LIWC-style .dic file into {category: [entries]}.
+    The header between the first two `%` lines maps category ids to names; every
+    following line is an entry (word, `prefix*` or phrase) followed by category ids.
+    """
+    lines = text.splitlines()
+    if not lines or lines[0].strip() != "%":
+        raise ValueError("Not a LIWC .dic file: expected a '%' header line.")
+
+    names: Dict[str, str] = {}
+    i = 1
+    while i < len(lines) and lines[i].strip() != "%":
+        fields = lines[i].split()
+        if len(fields) >= 2:
+            names[fields[0]] = " ".join(fields[1:])
+        i += 1
+    if i == len(lines):
+        raise ValueError("Not a LIWC .dic file: category header is not closed with '%'.")
+
+    category_dict: Dict[str, List[str]] = {name: [] for name in names.values()}
+    skipped = 0
+    for line in lines[i + 1:]:
+        if not line.strip():
+            continue
+        # Entries are tab-separated from their ids; phrases may contain spaces
+        if "\t" in line:
+            fields = line.split("\t")
+            # Ids after the tab may themselves be separated by tabs or spaces
+            entry, ids = fields[0].strip(), " ".join(fields[1:]).split()
+        else:
+            fields = line.split()
+            split = next((k for k, field in enumerate(fields) if field in names), len(fields))
+            entry, ids = " ".join(fields[:split]), fields[split:]
+        for cat_id in ids:
+            if cat_id in names:
+                category_dict[names[cat_id]].append(entry)
+            else:
+                skipped += 1
+    if skipped:
+        logger.warning(f"Ignored {skipped} unknown or conditional category ids in .dic file")
+    return category_dict
+
+
+class Lexicon:
+    """
+    Word-category dictionary compiled once for fast counting.
+    Exact words go into a hash map token -> category indices, `prefix*` entries into a
+    prefix trie (lookups cost O(token length), not O(dictionary size)), and multi-word
+    phrases are indexed by their first token. Counting is a single pass over the tokens.
+    A token counts once for every category with at least one matching entry.
+    With a text backend (text_backends.TextBackend) entries and messages are split by that
+    backend's tokenizer, so counts read the same tokens as the stylometric metrics; without
+    one, the regex `tokenize` above is used.
+    """
+    def __init__(self, category_dict: Dict[str, List[str]], backend: Any = None):
+        self.category_dict: Dict[str, List[str]] = {category: list(words) for category, words in category_dict.items()}
+        self.categories: List[str] = list(self.category_dict)
+        self.backend = backend
+        self._exact: Dict[str, set] = {}
+        self._trie: Dict[str, Any] = {}
+        self._phrases: Dict[str, List[Tuple[Tuple[str, ...], bool, int]]] = {}
+        # Memoized category indices per distinct token
+        self._resolved: Dict[str, Tuple[int, ...]] = {}
+
+        entries = [(word.strip(), idx) for idx, words in enumerate(self.category_dict.values()) for word in words]
+        # Every entry is split in one batch, with the same tokenizer as the messages
+        split = self.tokenize_many([word.rstrip("*") for word, _ in entries])
+        for (word, idx), parts in zip(entries, split):
+            self._add(tuple(parts), word.endswith("*"), idx)
+
+    def _add(self, parts: Tuple[str, ...], wildcard: bool, idx: int):
+        if not parts:
+            return
+        if len(parts) > 1:
+            self._phrases.setdefault(parts[0], []).append((parts, wildcard, idx))
+        elif wildcard:
+            node = self._trie
+            for ch in parts[0]:
+                node = node.setdefault(ch, {})
+            node.setdefault(_WILDCARD, set()).add(idx)
+        else:
+            self._exact.setdefault(parts[0], set()).add(idx)
+
+    def for_backend(self, backend: Any) -> "Lexicon":
+        """
+        This lexicon compiled for `backend`'s tokenizer (itself if it already is).
+        """
+        if backend is self.backend:
+            return self
+        return Lexicon(self.category_dict, backend)
+
+    @classmethod
+    def from_dic(cls, path: str) -> "Lexicon":
+        """
+        Compiles a LIWC-style .dic file.
+        """
+        with open(path, "r", encoding="utf-8-sig") as f:
+            return cls(parse_dic(f.read()))
+
+    def __len__(self) -> int:
+        return len(self.categories)
+
+    def __getstate__(self):
+        # The memo can be large and is cheap to rebuild in worker processes
+        state = self.__dict__.copy()
+        state["_resolved"] = {}
+        return state
+
+    def tokenize(self, text: Any) -> List[str]:
+        return self.tokenize_many([text])[0]
+
+    def tokenize_many(self, texts: List[Any]) -> List[List[str]]:
+        if self.backend is not None:
+            return self.backend.words(texts)
+        return [tokenize(text) for text in texts]
+
+    def _match(self, token: str) -> Tuple[int, ...]:
+        """
+        Category indices matched by one token (exact entries plus every `prefix*` it extends).
+        """
+        found = self._resolved.get(token)
+        if found is not None:
+            return found
+        matches = set(self._exact.get(token, ()))
+        node = self._trie
+        for ch in token:
+            node = node.get(ch)
+            if node is None:
+                break
+            matches.update(node.get(_WILDCARD, ()))
+        found = tuple(sorted(matches))
+        self._resolved[token] = found
+        return found
+
+    def count_tokens(self, tokens: List[str]) -> List[int]:
+        """
+        Category counts (in category order) for an already tokenized message.
+        """
+        counts = [0] * len(self.categories)
+        # Counter runs in C; each distinct token is then matched once
+        for token, n in Counter(tokens).items():
+            for idx in self._match(token):
+                counts[idx] += n
+
+        if self._phrases:
+            for i, token in enumerate(tokens):
+                for parts, wildcard, idx in self._phrases.get(token, ()):
+                    window = tokens[i:i + len(parts)]
+                    if len(window) < len(parts) or window[:-1] != list(parts[:-1]):
+                        continue
+                    if window[-1] == parts[-1] or (wildcard and window[-1].startswith(parts[-1])):
+                        counts[idx] += 1
+        return counts
+
+    def count(self, text: Any) -> Dict[str, int]:
+        """
+        Returns a dictionary with counts for each category.
+        """
+        return dict(zip(self.categories, self.count_tokens(self.tokenize(text))))
+
+    def count_documents(self, docs: Iterable[Any]) -> np.ndarray:
+        """
+        Counts parsed documents (text_backends.ParsedDocument) on their shared word tokens;
+        returns an int array of shape (documents, categories). The documents should come from
+        this lexicon's backend, so entries and messages are split alike.
+        """
+        rows = [self.count_tokens(doc.words()) for doc in docs]
+        return np.array(rows, dtype=np.int64).reshape(len(rows), len(self.categories))
+
+    def count_many(self, texts: Iterable[Any]) -> np.ndarray:
+        """
+        Counts a batch of messages; returns an int array of shape (messages, categories).
+        """
+        rows = [self.count_tokens(tokens) for tokens in self.tokenize_many(list(texts))]
+        return np.array(rows, dtype=np.int64).reshape(len(rows), len(self.categories))
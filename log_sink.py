@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, Set, Tuple, Iterable
+
+from simulation_config import LOG_PATH, LOG_FSYNC_EVERY, LOG_FSYNC_INTERVAL_S, LOG_ROTATE_MB
+
+logger = logging.getLogger(__name__)
+
+IdempotencyKey = Tuple[str, int, str]
+
+
+def entry_key(entry: Dict[str, Any]) -> IdempotencyKey:
+    """
+    Idempotency key of a log entry: (experiment_id, turn_id, speaker).
+    Older entries without a speaker field fall back to the speaker model.
+    """
+    return (entry["experiment_id"], int(entry["turn_id"]), entry.get("speaker") or entry.get("speaker_model"))
+
+
+class JsonlLogSink:
+    """
+    Append-only, crash-safe JSONL writer for log entries.
+    Each entry is written (and flushed to the OS) as soon as it is produced; fsync is
+    batched every `fsync_every` entries or `fsync_interval_s` seconds. Files rotate by
+    size and/or age, and entries already in the current file (same idempotency key) are
+    skipped, so re-saving or resuming a run never double-counts. Rotated files are not
+    re-read and their keys are dropped on rotation, so memory is bounded by the rotation
+    size. With `experiment_ids`, only keys of those experiments are loaded from disk.
+    """
+    def __init__(self,
+                 path: str = LOG_PATH,
+                 fsync_every: int = LOG_FSYNC_EVERY,
+                 fsync_interval_s: float = LOG_FSYNC_INTERVAL_S,
+                 max_bytes: Optional[int] = LOG_ROTATE_MB * 1024 * 1024,
+                 max_age_s: Optional[float] = None,
+                 experiment_ids: Optional[Iterable[str]] = None):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval_s = fsync_interval_s
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.experiment_ids = set(experiment_ids) if experiment_ids is not None else None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._keys: Set[IdempotencyKey] = set()
+        self._file = None
+        self._opened_at = 0.0
+        self._pending = 0
+        self._last_fsync = time.monotonic()
+
+        self._repair_tail()
+        if os.path.exists(self.path):
+            self._load_keys(self.path)
+        self._open()
+
+    def _repair_tail(self):
+        """
+        Drops a partially written last line left behind by a crash.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            # Walk back to the last complete line
+            pos = size - 1
+            while pos > 0:
+                step = min(4096, pos)
+                f.seek(pos - step)
+                chunk = f.read(step)
+                idx = chunk.rfind(b"\n")
+                if idx != -1:
+                    pos = pos - step + idx + 1
+                    break
+                pos -= step
+            f.truncate(pos)
+        logger.warning(f"Truncated incomplete trailing record in {self.path}")
+
+    def _load_keys(self, filepath: str):
+        with open(filepath, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                # Cheap substring test first; most lines belong to other experiments
+                if self.experiment_ids is not None and not any(i in line for i in self.experiment_ids):
+                    continue
+                try:
+                    key = entry_key(json.loads(line))
+                    if self.experiment_ids is None or key[0] in self.experiment_ids:
+                        self._keys.add(key)
+                except (ValueError, KeyError):
+                    logger.warning(f"Skipping unreadable record in {filepath}")
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._opened_at = time.time()
+
+    def _should_rotate(self) -> bool:
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            return True
+        if self.max_age_s and time.time() - self._opened_at >= self.max_age_s:
+            return True
+        return False
+
+    def _rotate(self):
+        self._fsync()
+        self._file.close()
+        root, ext = os.path.splitext(self.path)
+        rotated = f"{root}.{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}{ext}"
+        os.replace(self.path, rotated)
+        logger.info(f"Rotated log file to {rotated}")
+        # Deduplication is scoped to the current file
+        self._keys.clear()
+        self._open()
+
+    def _fsync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_fsync = time.monotonic()
+
+    def has(self, entry: Dict[str, Any]) -> bool:
+        return entry_key(entry) in self._keys
+
+    def write(self, entry: Dict[str, Any]) -> bool:
+        """
+        Appends one entry unless its idempotency key was already written.
+        Returns True if the entry was written.
+        """
+        key = entry_key(entry)
+        with self._lock:
+            if key in self._keys:
+                return False
+            if self._file.tell() > 0 and self._should_rotate():
+                self._rotate()
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            self._keys.add(key)
+            self._pending += 1
+            if self._pending >= self.fsync_every or time.monotonic() - self._last_fsync >= self.fsync_interval_s:
+                self._fsync()
+            return True
+
+    def flush(self):
+        """
+        Forces pending entries to stable storage.
+        """
+        with self._lock:
+            if self._pending:
+                self._fsync()
+
+    def close(self):
+        with self._lock:
+            if self._file and not self._file.closed:
+                self._fsync()
+                self._file.close()
@@ -2,13 +2,25 @@ import os
 import time
 import uuid
 import json
+import asyncio
 import logging
+import threading
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from openai import OpenAI
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from typing import List, Dict, Any, Optional, AsyncIterator, Iterator, Tuple, Callable
+from openai import AsyncOpenAI
 import pandas as pd
 from dotenv import load_dotenv
+from http_clients import get_async_client
+from scheduler import RateLimitScheduler, get_default_scheduler
+from response_cache import ResponseCache, CacheMissError, make_cache_key, get_default_cache
+from prompt_utils import prompt_hash
+from log_sink import JsonlLogSink
+from aggregates import AggregateTable, LOG_METRICS
+from conversation_window import ConversationWindow
+from token_counter import TokenCounter, model_context_budget, prompt_budget
+from summarizer import RollingSummaryMemory, make_summarizer, get_default_summary_store
+from simulation_config import (CHECKPOINT_DIR, MEMORY_MODE, SUMMARY_MODEL, PROMPT_CACHING,
+                               PROMPT_CACHE_CONTROL_MODELS, EXPERIMENT_STORE_FLUSH_EVERY, CONTEXT_RESERVE_TOKENS)
 
 # Load environment variables
 load_dotenv()
@@ -17,97 +29,407 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-class Agent:
+# OpenRouter endpoint (override to point agents at a local mock or proxy)
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_lock = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the process-wide event loop used by the synchronous wrappers.
+    It runs in a daemon thread, so every blocking caller (GUI sessions, scripts)
+    shares one loop and therefore one pooled HTTP client per endpoint.
+    """
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="parrot-lm-loop", daemon=True).start()
+            _background_loop = loop
+        return _background_loop
+
+
+def run_sync(coro):
+    """
+    Runs a coroutine on the background loop and blocks until it finishes.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_background_loop()).result()
+
+
+def iterate_in_loop(agen: AsyncIterator, loop: Optional[asyncio.AbstractEventLoop] = None) -> Iterator:
+    """
+    Drives an async generator from synchronous code.
+    Uses the given (not running) loop, or the shared background loop by default.
+    Yields each item as soon as the async generator produces it.
+    """
+    if loop is None:
+        step = run_sync
+    else:
+        step = loop.run_until_complete
+    try:
+        while True:
+            try:
+                item = step(agen.__anext__())
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        step(agen.aclose())
+
+
+def cached_prompt_tokens(usage: Any) -> Optional[int]:
+    """
+    Prompt tokens served from the provider's prompt cache (usage.prompt_tokens_details.cached_tokens),
+    or None when the response carries no usage. Providers that report nothing count as 0 cached.
+    """
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    if cached is None:
+        # Anthropic-style usage fields, passed through by some gateways
+        cached = getattr(usage, "cache_read_input_tokens", None)
+    return int(cached or 0)
+
+
+class AsyncAgent:
     """
     Represents a single LLM agent in the simulation.
+    Calls the API through AsyncOpenAI so many agents can share one event loop.
     """
-    def __init__(self, model_slug: str, system_prompt: str, name: str, max_history_turns: int = 20):
+    def __init__(self, model_slug: str, system_prompt: str, name: str, max_history_turns: int = 20,
+                 base_url: Optional[str] = None, scheduler: Optional[RateLimitScheduler] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 history_archive: Optional[Callable[[Dict[str, str]], None]] = None,
+                 context_budget: Optional[int] = None,
+                 memory: Optional[RollingSummaryMemory] = None,
+                 cache_replicate: Optional[int] = None):
         self.model_slug = model_slug
         self.system_prompt = system_prompt
+        # Stable id of the rendered prompt: logged with every turn and used in cache keys
+        self.system_prompt_hash = prompt_hash(system_prompt)
         self.name = name
         self.max_history_turns = max_history_turns
-        self.history: List[Dict[str, str]] = [
-            {"role": "system", "content": system_prompt}
-        ]
+        # Every API call goes through the scheduler (per-model rate limits and retries)
+        self.scheduler = scheduler or get_default_scheduler()
+        # Content-addressed completion cache (None when caching is off)
+        self.response_cache = response_cache if response_cache is not None else get_default_cache()
+        # Salt for cache keys: repetitions of the same conversation get distinct samples
+        self.cache_replicate = cache_replicate
+        # Only the last max_history_turns turns (user + assistant) are ever sent, so only those
+        # are kept; older messages go to `history_archive` (the full transcript is in the logs)
+        # Optional rolling summary of evicted messages ("summary" memory mode)
+        self.memory = memory
+        if memory is not None:
+            memory.archive = history_archive
+        self.window = ConversationWindow(max_history_turns * 2,
+                                         archive=memory.add if memory is not None else history_archive)
+        # Context window in tokens (default per model from MODEL_CONTEXT_BUDGETS); the history is
+        # trimmed to fit before sending, measured with a local tokenizer
+        self.context_budget = context_budget if context_budget is not None else model_context_budget(model_slug)
+        self.token_counter = TokenCounter.for_model(model_slug)
+        # Set once the token budget first drops messages the turn window would have kept
+        self._budget_trim_warned = False
         
-        # Initialize OpenAI client for OpenRouter
-        api_key = os.getenv("OPENROUTER_API_KEY")
-        if not api_key:
+        # Resolve OpenRouter credentials; the client itself comes from the shared pool.
+        # Replay-only runs never reach the API, so they work offline without a key
+        self.api_key = os.getenv("OPENROUTER_API_KEY")
+        if not self.api_key and not self.replay_only:
             raise ValueError("OPENROUTER_API_KEY not found in environment variables.")
             
-        self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key,
-        )
+        self.base_url = base_url or OPENROUTER_BASE_URL
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        retry=retry_if_exception_type(Exception)
-    )
-    def generate_response(self, input_text: str, **kwargs) -> Dict[str, Any]:
+    @property
+    def replay_only(self) -> bool:
+        return self.response_cache is not None and self.response_cache.mode == "replay-only"
+
+    @property
+    def history(self) -> List[Dict[str, str]]:
         """
-        Generates a response from the agent based on input text.
-        Accepts optional kwargs for model parameters (temperature, top_p, etc.)
+        System message followed by the messages still in the context window.
         """
-        # Add user input to history
-        self.history.append({"role": "user", "content": input_text})
-        
-        # Prepare messages: Keep system prompt + last N messages
-        # One turn has 2 messages (user + assistant)
-        max_messages = self.max_history_turns * 2
+        return self.window.build({"role": "system", "content": self.system_prompt})
+
+    @history.setter
+    def history(self, messages: List[Dict[str, str]]):
+        # Accepts a checkpointed history; a leading system message is implied by system_prompt
+        self.window.clear()
+        self.window.extend(message for message in messages if message.get("role") != "system")
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """
+        Pooled AsyncOpenAI client shared by every agent on this endpoint and event loop.
+        """
+        return get_async_client(self.base_url, self.api_key)
+
+    def _prepare_messages(self, input_text: str, max_tokens: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Appends the input to history and returns the message list to send.
+        Oldest messages are dropped until the prompt fits the model's token budget
+        (less max_tokens for the reply), so oversized requests are never sent.
+        """
+        # Add user input to history; the window evicts the oldest message once full
+        self.window.append({"role": "user", "content": input_text})
+        head = [{"role": "system", "content": self.system_prompt}]
+        summary_message = self.memory.message() if self.memory is not None else None
+        if summary_message:
+            head.append(summary_message)
         
-        # history[0] is always system. Everything else follows.
-        relevant_history = self.history[1:]
-        if len(relevant_history) > max_messages:
-            relevant_history = relevant_history[-max_messages:]
-            
-        messages = [{"role": "system", "content": self.system_prompt}] + relevant_history
+        budget = prompt_budget(self.context_budget, max_tokens)
+        if budget is not None:
+            # Per-message counts are cached, so only new messages are tokenized
+            total = self.token_counter.count_messages(self.window.build(*head))
+            evicted = 0
+            while total > budget and len(self.window) > 1:
+                total -= self.token_counter.count_message(self.window.evict_oldest())
+                evicted += 1
+            if evicted and not self._budget_trim_warned:
+                self._budget_trim_warned = True
+                logger.warning(f"{self.name}: the {self.context_budget}-token context budget of {self.model_slug} "
+                               f"(less {max_tokens or CONTEXT_RESERVE_TOKENS} reserved for the reply) keeps only "
+                               f"{len(self.window)} of up to {self.window.max_messages} history messages; "
+                               f"older messages are dropped on later turns without further warnings")
+            if total > budget:
+                logger.warning(f"{self.name}: prompt of ~{total} tokens exceeds the {budget}-token budget "
+                               f"for {self.model_slug} even without history")
         
-        start_time = time.time()
+        # System prompt (+ summary) + last N messages (one turn has 2 messages: user + assistant)
+        return self.window.build(*head)
+
+    async def _refresh_memory(self):
+        """
+        Folds messages evicted on earlier turns into the rolling summary (summary memory mode).
+        A failing summarizer never fails the turn; the messages stay pending for the next one.
+        """
+        if self.memory is None:
+            return
         try:
-            response = self.client.chat.completions.create(
+            await self.memory.update()
+        except Exception as e:
+            logger.warning(f"{self.name}: summary update failed, retrying next turn: {e}")
+
+    def _finish_response(self, content: Optional[str], finish_reason: Optional[str], latency_ms: float,
+                         input_tokens: int = 0, output_tokens: int = 0, ttft_ms: Optional[float] = None,
+                         inter_token_latency_ms: Optional[float] = None, cache_hit: bool = False,
+                         cached_input_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Records the assistant reply in history and builds the response dict.
+        """
+        # Check for refusal (empty content or specific flag if available)
+        is_refusal = not content or finish_reason == "content_filter"
+        
+        # Add assistant response to history
+        if content:
+            self.window.append({"role": "assistant", "content": content})
+        
+        return {
+            "content": content,
+            "latency_ms": latency_ms,
+            "ttft_ms": ttft_ms,
+            "inter_token_latency_ms": inter_token_latency_ms,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cached_input_tokens": cached_input_tokens,
+            "uncached_input_tokens": input_tokens - cached_input_tokens if cached_input_tokens is not None else None,
+            "finish_reason": finish_reason,
+            "is_refusal": is_refusal,
+            "cache_hit": cache_hit
+        }
+
+    def _cache_lookup(self, messages: List[Dict[str, str]], params: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Returns (cache_key, cached_response); both None when caching is off.
+        Raises CacheMissError on a miss in replay-only mode.
+        """
+        if self.response_cache is None or not self.response_cache.enabled:
+            return None, None
+        key = make_cache_key(self.model_slug, messages, params, self.system_prompt_hash, self.cache_replicate)
+        cached = self.response_cache.get(key)
+        if cached is None and self.replay_only:
+            raise CacheMissError(f"No cached completion for {self.model_slug} (key {key[:12]}) in replay-only mode.")
+        return key, cached
+
+    def _estimate_tokens(self, messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> int:
+        """
+        Token estimate (prompt + completion budget) for the scheduler's token bucket.
+        """
+        return self.token_counter.count_messages(messages) + kwargs.get("max_tokens", 0)
+
+    def _with_cache_hints(self, messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Marks the system prompt as a prompt-cache breakpoint for providers that need explicit
+        cache_control hints. The system prompt always comes first and never changes during a
+        conversation, so every request shares that prefix; history, cache keys and token
+        counts keep the plain string form.
+        """
+        if not PROMPT_CACHING or not self.model_slug.startswith(PROMPT_CACHE_CONTROL_MODELS):
+            return messages
+        system = messages[0]
+        marked = {"role": system["role"], "content": [
+            {"type": "text", "text": system["content"], "cache_control": {"type": "ephemeral"}}
+        ]}
+        return [marked] + messages[1:]
+
+    async def _create(self, messages: List[Dict[str, str]], timing: Dict[str, float], **kwargs):
+        """
+        Sends one completion request through the scheduler and returns the parsed response.
+        timing["start"] is set when the successful attempt was sent.
+        """
+        wire_messages = self._with_cache_hints(messages)
+        
+        async def request():
+            timing["start"] = time.time()
+            return await self.client.chat.completions.with_raw_response.create(
                 model=self.model_slug,
-                messages=messages,
+                messages=wire_messages,
                 **kwargs
             )
+        
+        raw = await self.scheduler.call(self.model_slug, request, self._estimate_tokens(messages, kwargs))
+        return raw.parse()
 
+    async def generate_response(self, input_text: str, **kwargs) -> Dict[str, Any]:
+        """
+        Generates a response from the agent based on input text.
+        Accepts optional kwargs for model parameters (temperature, top_p, etc.)
+        """
+        await self._refresh_memory()
+        messages = self._prepare_messages(input_text, kwargs.get("max_tokens"))
+        
+        cache_key, cached = self._cache_lookup(messages, kwargs)
+        if cached is not None:
+            return self._finish_response(**cached, cache_hit=True)
+        
+        timing: Dict[str, float] = {}
+        try:
+            response = await self._create(messages, timing, **kwargs)
             
             end_time = time.time()
-            latency_ms = (end_time - start_time) * 1000
+            latency_ms = (end_time - timing["start"]) * 1000
             
-            content = response.choices[0].message.content
-            finish_reason = response.choices[0].finish_reason
+            if response.usage:
+                self.scheduler.record_usage(self.model_slug, self._estimate_tokens(messages, kwargs), response.usage.total_tokens)
             
-            # Check for refusal (empty content or specific flag if available)
-            is_refusal = not content or finish_reason == "content_filter"
+            result = self._finish_response(
+                response.choices[0].message.content,
+                response.choices[0].finish_reason,
+                latency_ms,
+                input_tokens=response.usage.prompt_tokens if response.usage else 0,
+                output_tokens=response.usage.completion_tokens if response.usage else 0,
+                cached_input_tokens=cached_prompt_tokens(response.usage)
+            )
+            if cache_key:
+                self.response_cache.put(cache_key, self.model_slug, result)
+            return result
             
-            # Add assistant response to history
-            if content:
-                self.history.append({"role": "assistant", "content": content})
+        except Exception as e:
+            logger.error(f"Error generating response for {self.name}: {e}")
+            raise e
+
+    async def stream_response(self, input_text: str, **kwargs):
+        """
+        Streaming variant of generate_response.
+        Async generator: yields {"type": "delta", "delta", "content"} events while tokens
+        arrive, then a single {"type": "done", "response": ...} event whose response dict
+        matches generate_response, plus time-to-first-token and inter-token latency.
+        """
+        await self._refresh_memory()
+        messages = self._prepare_messages(input_text, kwargs.get("max_tokens"))
+        
+        cache_key, cached = self._cache_lookup(messages, kwargs)
+        if cached is not None:
+            response = self._finish_response(**cached, cache_hit=True)
+            if response["content"]:
+                yield {"type": "delta", "delta": response["content"], "content": response["content"]}
+            yield {"type": "done", "response": response}
+            return
+        
+        timing: Dict[str, float] = {}
+        try:
+            # Only opening the stream is retried: once tokens have been handed
+            # to the caller the attempt cannot be replayed.
+            stream = await self._create(messages, timing, stream=True, stream_options={"include_usage": True}, **kwargs)
+            start_time = timing["start"]
+            
+            parts: List[str] = []
+            finish_reason = None
+            usage = None
+            first_token_time = None
+            last_token_time = None
+            gaps: List[float] = []
+            
+            async for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+                delta = choice.delta.content if choice.delta else None
+                if not delta:
+                    continue
+                
+                # Providers may pack several tokens per chunk, so gaps are measured between chunks
+                now = time.time()
+                if first_token_time is None:
+                    first_token_time = now
+                else:
+                    gaps.append(now - last_token_time)
+                last_token_time = now
+                
+                parts.append(delta)
+                yield {"type": "delta", "delta": delta, "content": "".join(parts)}
             
-            return {
-                "content": content,
-                "latency_ms": latency_ms,
-                "input_tokens": response.usage.prompt_tokens if response.usage else 0,
-                "output_tokens": response.usage.completion_tokens if response.usage else 0,
-                "finish_reason": finish_reason,
-                "is_refusal": is_refusal
-            }
+            end_time = time.time()
+            if usage:
+                self.scheduler.record_usage(self.model_slug, self._estimate_tokens(messages, kwargs), usage.total_tokens)
+            response = self._finish_response(
+                "".join(parts) or None,
+                finish_reason,
+                (end_time - start_time) * 1000,
+                input_tokens=usage.prompt_tokens if usage else 0,
+                output_tokens=usage.completion_tokens if usage else 0,
+                cached_input_tokens=cached_prompt_tokens(usage),
+                ttft_ms=(first_token_time - start_time) * 1000 if first_token_time else None,
+                inter_token_latency_ms=(sum(gaps) / len(gaps)) * 1000 if gaps else None
+            )
+            if cache_key:
+                self.response_cache.put(cache_key, self.model_slug, response)
+            yield {"type": "done", "response": response}
             
         except Exception as e:
-            logger.error(f"Error generating response for {self.name}: {e}")
+            logger.error(f"Error streaming response for {self.name}: {e}")
             raise e
 
-class Orchestrator:
+class Agent(AsyncAgent):
     """
-    Manages the simulation between two agents.
+    Synchronous agent. Thin wrapper that runs AsyncAgent on the shared background loop.
+    """
+    def generate_response(self, input_text: str, **kwargs) -> Dict[str, Any]:
+        """
+        Blocking counterpart of AsyncAgent.generate_response.
+        """
+        return run_sync(super().generate_response(input_text, **kwargs))
+
+class AsyncOrchestrator:
+    """
+    Manages the simulation between two agents on an asyncio event loop.
+    Many orchestrators can run concurrently in one process.
     """
     def __init__(self, 
                  agent_a_config: Dict[str, Any], 
                  agent_b_config: Dict[str, Any], 
                  scenario_name: str,
-                 experiment_id: str = None):
+                 experiment_id: str = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 log_sink: Optional[JsonlLogSink] = None,
+                 checkpoint_dir: Optional[str] = None,
+                 experiment_store: Optional[Any] = None):
         
         self.experiment_id = experiment_id or str(uuid.uuid4())
         self.scenario_name = scenario_name
@@ -115,71 +437,194 @@ class Orchestrator:
         max_history_turns = agent_a_config.get("max_history_turns", 20)
         
         # Initialize agents with full config
-        self.agent_a = Agent(
+        self.agent_a = AsyncAgent(
             model_slug=agent_a_config["model"],
             system_prompt=agent_a_config["system_prompt"],
             name="Agent A",
-            max_history_turns=max_history_turns
+            max_history_turns=max_history_turns,
+            scheduler=agent_a_config.get("scheduler"),
+            response_cache=response_cache,
+            history_archive=agent_a_config.get("history_archive"),
+            context_budget=agent_a_config.get("context_budget"),
+            memory=self._make_memory(agent_a_config, "Agent A"),
+            cache_replicate=agent_a_config.get("cache_replicate")
         )
-        self.agent_b = Agent(
+        self.agent_b = AsyncAgent(
             model_slug=agent_b_config["model"],
             system_prompt=agent_b_config["system_prompt"],
             name="Agent B",
-            max_history_turns=max_history_turns
+            max_history_turns=max_history_turns,
+            scheduler=agent_b_config.get("scheduler"),
+            response_cache=response_cache,
+            history_archive=agent_b_config.get("history_archive"),
+            context_budget=agent_b_config.get("context_budget"),
+            memory=self._make_memory(agent_b_config, "Agent B"),
+            cache_replicate=agent_b_config.get("cache_replicate")
         )
 
         # Store user-facing persona snapshots for clean exports
         self.persona_a_snapshot = agent_a_config.get("user_persona_snapshot", self.agent_a.system_prompt)
         self.persona_b_snapshot = agent_b_config.get("user_persona_snapshot", self.agent_b.system_prompt)
+        # Prompt template settings (prompt_utils scenario key, custom instructions), logged with every turn
+        self.prompt_scenario_a = agent_a_config.get("prompt_scenario")
+        self.prompt_scenario_b = agent_b_config.get("prompt_scenario")
+        self.custom_instructions_a = agent_a_config.get("custom_instructions", "")
+        self.custom_instructions_b = agent_b_config.get("custom_instructions", "")
         
         # Store advanced params if present, else default
         self.agent_a_params = agent_a_config.get("params", {})
         self.agent_b_params = agent_b_config.get("params", {})
         
         self.logs: List[Dict[str, Any]] = []
+        # Optional append-only sink; each entry is persisted as soon as it is produced
+        self.log_sink = log_sink
+        # Optional columnar archive (experiment_store.ExperimentStore); entries are buffered and
+        # appended every EXPERIMENT_STORE_FLUSH_EVERY entries to avoid tiny files. The buffer
+        # is part of the checkpoint, so resume() writes rows a crash left unflushed
+        self.experiment_store = experiment_store
+        self._store_buffer: List[Dict[str, Any]] = []
+        # Running per-(speaker_model, scenario) summaries of this experiment's log metrics
+        self.aggregates = AggregateTable()
+        
+        # Resume position, checkpointed after every completed reply when checkpoint_dir is set
+        self.checkpoint_dir = checkpoint_dir
+        self.num_turns: Optional[int] = None
+        self.initial_message: Optional[str] = None
+        self.next_turn_id = 0
+        self.next_speaker = "Agent A"
+        self.last_message: Optional[str] = None
+        self.completed = False
 
-    def run_simulation(self, num_turns: int, initial_message: str = "Hello."):
+    def _make_memory(self, agent_config: Dict[str, Any], name: str) -> Optional[RollingSummaryMemory]:
+        """
+        Rolling summary memory for an agent config with "memory": "summary" (default MEMORY_MODE).
+        "summary_model" picks the summarizer model (None = local extractive summarizer).
+        """
+        if agent_config.get("memory", MEMORY_MODE) != "summary":
+            return None
+        summarizer = make_summarizer(agent_config.get("summary_model", SUMMARY_MODEL),
+                                     base_url=OPENROUTER_BASE_URL, scheduler=agent_config.get("scheduler"))
+        return RollingSummaryMemory(summarizer, store=get_default_summary_store(),
+                                    experiment_id=self.experiment_id, agent_name=name)
+
+    def _record(self, log_entry: Dict[str, Any]):
+        self.logs.append(log_entry)
+        if self.log_sink is not None:
+            self.log_sink.write(log_entry)
+        self.aggregates.update(log_entry, LOG_METRICS)
+        if self.experiment_store is not None:
+            self._store_buffer.append(log_entry)
+            if len(self._store_buffer) >= EXPERIMENT_STORE_FLUSH_EVERY:
+                self._flush_store()
+
+    async def _take_turn(self, agent: AsyncAgent, turn_id: int, message: str, params: Dict[str, Any], stream: bool):
+        """
+        Runs one agent turn. Yields ("partial", event) while streaming,
+        then ("response", response_dict) once the reply is complete.
+        """
+        if not stream:
+            yield "response", await agent.generate_response(message, **params)
+            return
+        
+        async for event in agent.stream_response(message, **params):
+            if event["type"] == "delta":
+                yield "partial", {
+                    "event": "partial",
+                    "experiment_id": self.experiment_id,
+                    "turn_id": turn_id,
+                    "speaker": agent.name,
+                    "speaker_model": agent.model_slug,
+                    "delta": event["delta"],
+                    "content": event["content"]
+                }
+            else:
+                yield "response", event["response"]
+
+    async def run_simulation(self, num_turns: Optional[int] = None, initial_message: str = "Hello.", stream: bool = False):
         """
         Runs the conversation loop for a specified number of turns.
-        Yields the log entry for each turn as it happens.
+        Async generator: yields the log entry for each turn as it happens.
+        With stream=True it also yields partial events ({"event": "partial", ...},
+        never stored in self.logs) while each reply's tokens arrive.
+        On an orchestrator restored with resume(), continues after the last completed
+        reply; num_turns then defaults to the checkpointed value.
         """
-        logger.info(f"Starting simulation {self.experiment_id} - Scenario: {self.scenario_name}")
+        if num_turns is None:
+            num_turns = self.num_turns
+        if num_turns is None:
+            raise ValueError("num_turns is required for a new simulation.")
+        self.num_turns = num_turns
         
-        # Initial trigger for Agent A to start the conversation
-        last_message = initial_message 
+        if self.last_message is None:
+            # Initial trigger for Agent A to start the conversation
+            self.initial_message = initial_message
+            self.last_message = initial_message
+        last_message = self.last_message
         
-        for turn_id in range(num_turns):
+        start_turn = self.next_turn_id
+        resume_with_b = self.next_speaker == "Agent B"
+        if start_turn or resume_with_b:
+            logger.info(f"Resuming simulation {self.experiment_id} at turn {start_turn} ({self.next_speaker})")
+        else:
+            logger.info(f"Starting simulation {self.experiment_id} - Scenario: {self.scenario_name}")
+        
+        try:
+            async for item in self._run_turns(num_turns, start_turn, resume_with_b, last_message, stream):
+                yield item
+        finally:
+            # Runs on normal completion, errors, and when the consumer stops early
+            self.flush()
+        
+        if self.completed:
+            logger.info(f"Simulation {self.experiment_id} completed.")
+        else:
+            logger.info(f"Simulation {self.experiment_id} stopped at turn {self.next_turn_id} ({self.next_speaker}); resumable.")
+
+    async def _run_turns(self, num_turns: int, start_turn: int, resume_with_b: bool, last_message: str, stream: bool):
+        """
+        The alternating turn loop behind run_simulation.
+        """
+        for turn_id in range(start_turn, num_turns):
             # --- Agent A Turn ---
-            try:
-                logger.info(f"Turn {turn_id}: Agent A generating response...")
-                # Pass advanced params (temperature, etc.) if supported by Agent class
-                # For now, we assume Agent.generate_response can handle them or we update Agent class too.
-                # Let's update Agent class in a separate step or assume it uses defaults.
-                # Ideally, we pass kwargs to generate_response.
-                
-                response_a = self.agent_a.generate_response(last_message, **self.agent_a_params)
-                log_entry_a = self._create_log_entry(turn_id, self.agent_a, self.agent_b, response_a)
-                self.logs.append(log_entry_a)
-                yield log_entry_a
-                
-                last_message = response_a["content"]
-                
-                if response_a["is_refusal"]:
-                    logger.warning("Agent A refused to respond. Ending simulation.")
+            if not (turn_id == start_turn and resume_with_b):
+                try:
+                    logger.info(f"Turn {turn_id}: Agent A generating response...")
+                    response_a = None
+                    async for kind, payload in self._take_turn(self.agent_a, turn_id, last_message, self.agent_a_params, stream):
+                        if kind == "partial":
+                            yield payload
+                        else:
+                            response_a = payload
+                    log_entry_a = self._create_log_entry(turn_id, self.agent_a, self.agent_b, response_a)
+                    self._record(log_entry_a)
+                    
+                    last_message = response_a["content"]
+                    self._advance(turn_id, "Agent B", last_message, completed=response_a["is_refusal"])
+                    yield log_entry_a
+                    
+                    if response_a["is_refusal"]:
+                        logger.warning("Agent A refused to respond. Ending simulation.")
+                        break
+                except Exception as e:
+                    logger.error(f"Failed turn {turn_id} for Agent A: {e}")
                     break
-            except Exception as e:
-                logger.error(f"Failed turn {turn_id} for Agent A: {e}")
-                break
 
             # --- Agent B Turn ---
             try:
                 logger.info(f"Turn {turn_id}: Agent B generating response...")
-                response_b = self.agent_b.generate_response(last_message, **self.agent_b_params)
+                response_b = None
+                async for kind, payload in self._take_turn(self.agent_b, turn_id, last_message, self.agent_b_params, stream):
+                    if kind == "partial":
+                        yield payload
+                    else:
+                        response_b = payload
                 log_entry_b = self._create_log_entry(turn_id, self.agent_b, self.agent_a, response_b)
-                self.logs.append(log_entry_b)
-                yield log_entry_b
+                self._record(log_entry_b)
                 
                 last_message = response_b["content"]
+                self._advance(turn_id + 1, "Agent A", last_message,
+                              completed=response_b["is_refusal"] or turn_id + 1 >= num_turns)
+                yield log_entry_b
                 
                 if response_b["is_refusal"]:
                     logger.warning("Agent B refused to respond. Ending simulation.")
@@ -187,10 +632,160 @@ class Orchestrator:
             except Exception as e:
                 logger.error(f"Failed turn {turn_id} for Agent B: {e}")
                 break
-                
-        logger.info(f"Simulation {self.experiment_id} completed.")
 
-    def _create_log_entry(self, turn_id: int, speaker: Agent, responder: Agent, response_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _flush_store(self):
+        """
+        Appends buffered entries and this experiment's aggregates to the experiment store.
+        The part file is named after the batch's first entry, so a batch re-flushed after a
+        crash and resume (its entries still in the checkpoint) replaces the earlier file.
+        """
+        if self.experiment_store is None or not self._store_buffer:
+            return
+        first = self._store_buffer[0]
+        part_id = f"{first['turn_id']:06d}-{first['speaker'].replace(' ', '_')}"
+        self.experiment_store.append(self._store_buffer, part_id=part_id)
+        self._store_buffer = []
+        self.experiment_store.write_aggregates(self.experiment_id, self.aggregates, kind="run")
+
+    def flush(self):
+        """
+        Pushes buffered entries and this experiment's aggregates to the experiment store
+        and fsyncs the log sink.
+        """
+        if self._store_buffer:
+            self._flush_store()
+            if self.checkpoint_dir:
+                # The checkpoint no longer needs to carry the flushed entries
+                self.save_checkpoint()
+        if self.log_sink is not None:
+            self.log_sink.flush()
+
+    def _advance(self, next_turn_id: int, next_speaker: str, last_message: str, completed: bool = False):
+        """
+        Moves the resume position past the reply just recorded and checkpoints it.
+        """
+        self.next_turn_id = next_turn_id
+        self.next_speaker = next_speaker
+        self.last_message = last_message
+        self.completed = completed
+        if self.checkpoint_dir:
+            self.save_checkpoint()
+
+    def _checkpoint_path(self, checkpoint_dir: Optional[str] = None) -> str:
+        return os.path.join(checkpoint_dir or self.checkpoint_dir, f"{self.experiment_id}.json")
+
+    def save_checkpoint(self, checkpoint_dir: Optional[str] = None) -> str:
+        """
+        Atomically writes agent histories, resume position and params to
+        <checkpoint_dir>/<experiment_id>.json. Returns the checkpoint path.
+        """
+        path = self._checkpoint_path(checkpoint_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        state = {
+            "experiment_id": self.experiment_id,
+            "scenario_name": self.scenario_name,
+            "num_turns": self.num_turns,
+            "initial_message": self.initial_message,
+            "next_turn_id": self.next_turn_id,
+            "next_speaker": self.next_speaker,
+            "last_message": self.last_message,
+            "completed": self.completed,
+            "saved_at": datetime.utcnow().isoformat(),
+            "agent_a": self._agent_state(self.agent_a, self.persona_a_snapshot, self.agent_a_params,
+                                         self.prompt_scenario_a, self.custom_instructions_a),
+            "agent_b": self._agent_state(self.agent_b, self.persona_b_snapshot, self.agent_b_params,
+                                         self.prompt_scenario_b, self.custom_instructions_b),
+            "aggregates": self.aggregates.to_dict(),
+            # Entries not yet appended to the experiment store
+            "store_buffer": self._store_buffer,
+        }
+        
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return path
+
+    @staticmethod
+    def _agent_state(agent: AsyncAgent, persona_snapshot: str, params: Dict[str, Any],
+                     prompt_scenario: Optional[str], custom_instructions: str) -> Dict[str, Any]:
+        return {
+            "model": agent.model_slug,
+            "system_prompt": agent.system_prompt,
+            "user_persona_snapshot": persona_snapshot,
+            "prompt_scenario": prompt_scenario,
+            "custom_instructions": custom_instructions,
+            "max_history_turns": agent.max_history_turns,
+            "context_budget": agent.context_budget,
+            "memory": "summary" if agent.memory is not None else "window",
+            "summary_model": agent.memory.summarizer.model_slug if agent.memory is not None else None,
+            "memory_state": agent.memory.to_dict() if agent.memory is not None else None,
+            "params": params,
+            "cache_replicate": agent.cache_replicate,
+            "history": agent.history,
+            "archived_messages": agent.window.archived,
+        }
+
+    @classmethod
+    def resume(cls, experiment_id: str, checkpoint_dir: str = CHECKPOINT_DIR, **kwargs):
+        """
+        Restores an orchestrator from its checkpoint. Call run_simulation() on the result
+        to continue from the last completed reply. Extra kwargs (response_cache, log_sink, ...)
+        are passed to the constructor.
+        """
+        path = os.path.join(checkpoint_dir, f"{experiment_id}.json")
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        
+        agent_configs = []
+        for key in ("agent_a", "agent_b"):
+            agent_state = state[key]
+            agent_configs.append({
+                "model": agent_state["model"],
+                "system_prompt": agent_state["system_prompt"],
+                "user_persona_snapshot": agent_state["user_persona_snapshot"],
+                "prompt_scenario": agent_state.get("prompt_scenario"),
+                "custom_instructions": agent_state.get("custom_instructions", ""),
+                "max_history_turns": agent_state["max_history_turns"],
+                "context_budget": agent_state.get("context_budget"),
+                "memory": agent_state.get("memory", "window"),
+                "summary_model": agent_state.get("summary_model"),
+                "params": agent_state["params"],
+                "cache_replicate": agent_state.get("cache_replicate"),
+            })
+        
+        orchestrator = cls(
+            agent_a_config=agent_configs[0],
+            agent_b_config=agent_configs[1],
+            scenario_name=state["scenario_name"],
+            experiment_id=state["experiment_id"],
+            checkpoint_dir=checkpoint_dir,
+            **kwargs
+        )
+        for agent, key in ((orchestrator.agent_a, "agent_a"), (orchestrator.agent_b, "agent_b")):
+            agent.history = state[key]["history"]
+            agent.window.archived = state[key].get("archived_messages", agent.window.archived)
+            if agent.memory is not None and state[key].get("memory_state"):
+                agent.memory.restore(state[key]["memory_state"])
+        orchestrator.num_turns = state["num_turns"]
+        orchestrator.initial_message = state["initial_message"]
+        orchestrator.next_turn_id = state["next_turn_id"]
+        orchestrator.next_speaker = state["next_speaker"]
+        orchestrator.last_message = state["last_message"]
+        orchestrator.completed = state["completed"]
+        if state.get("aggregates"):
+            orchestrator.aggregates = AggregateTable.from_dict(state["aggregates"])
+        if orchestrator.experiment_store is not None:
+            orchestrator._store_buffer = list(state.get("store_buffer", []))
+        
+        if orchestrator.completed:
+            logger.info(f"Checkpoint {experiment_id} is already complete; nothing to resume.")
+        return orchestrator
+
+    def _create_log_entry(self, turn_id: int, speaker: AsyncAgent, responder: AsyncAgent, response_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Creates a log entry dictionary.
         """
@@ -198,27 +793,50 @@ class Orchestrator:
             "experiment_id": self.experiment_id,
             "turn_id": turn_id,
             "scenario": self.scenario_name,
+            "speaker": speaker.name,
             "speaker_model": speaker.model_slug,
             "responder_model": responder.model_slug,
             "timestamp": datetime.utcnow().isoformat(),
             "latency_ms": response_data["latency_ms"],
+            "ttft_ms": response_data.get("ttft_ms"),
+            "inter_token_latency_ms": response_data.get("inter_token_latency_ms"),
             "input_tokens": response_data["input_tokens"],
             "output_tokens": response_data["output_tokens"],
+            "cached_input_tokens": response_data.get("cached_input_tokens"),
+            "uncached_input_tokens": response_data.get("uncached_input_tokens"),
             "content": response_data["content"],
             "finish_reason": response_data["finish_reason"],
             "is_refusal": response_data["is_refusal"],
+            "cache_hit": response_data.get("cache_hit", False),
+            "system_prompt_hash": speaker.system_prompt_hash,
+            "prompt_scenario": self.prompt_scenario_a if speaker.name == "Agent A" else self.prompt_scenario_b,
+            "has_custom_instructions": bool(self.custom_instructions_a if speaker.name == "Agent A"
+                                            else self.custom_instructions_b),
             "system_prompt_snapshot": self.persona_a_snapshot if speaker.name == "Agent A" else self.persona_b_snapshot
         }
 
     def save_logs(self, filepath: str):
         """
         Saves the accumulated logs to a JSONL file.
+        Entries of this experiment already present in the file are skipped, so repeated calls
+        do not duplicate rows; other experiments' entries are not loaded.
         """
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        
-        with open(filepath, 'a', encoding='utf-8') as f:
-            for entry in self.logs:
-                f.write(json.dumps(entry) + '\n')
+        sink = JsonlLogSink(filepath, max_bytes=None, experiment_ids=[self.experiment_id])
+        try:
+            written = sum(sink.write(entry) for entry in self.logs)
+        finally:
+            sink.close()
         
-        logger.info(f"Logs saved to {filepath}")
+        logger.info(f"Logs saved to {filepath} ({written} new entries)")
+
+class Orchestrator(AsyncOrchestrator):
+    """
+    Synchronous simulation driver for callers without an event loop (e.g. the GUI).
+    Thin wrapper that runs AsyncOrchestrator on the shared background loop.
+    """
+    def run_simulation(self, num_turns: Optional[int] = None, initial_message: str = "Hello.", stream: bool = False):
+        """
+        Runs the conversation loop for a specified number of turns.
+        Yields the log entry for each turn as it happens (and partial events if stream=True).
+        """
+        yield from iterate_in_loop(super().run_simulation(num_turns, initial_message, stream=stream))
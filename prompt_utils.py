@@ -1,10 +1,11 @@
-def construct_system_prompt(persona):
-    """
-    Constructs a draconian dialogue-only prompt. 
-    Zero tolerance for anything that isn't a spoken character.
-    """
-    
-    flirting_rules = """
+import hashlib
+from functools import lru_cache
+from typing import Dict, Any, Optional
+
+# --- Scenario rule blocks ---
+# Each scenario is the fixed rules section that opens every system prompt of that kind.
+
+DIALOGUE_ONLY_RULES = """
 # MANDATORY: DIALOGUE ONLY. ZERO NARRATION.
 You are a human. You are NOT writing a script. You are NOT a narrator.
 
@@ -30,6 +31,140 @@ If an action occurs, it must be inferred by the words said out loud.
 - Stay in character at all times.
 """
 
-    prompt = f"{flirting_rules}\n\nYOUR PERSONA:\n{persona}\n\nFINAL WARNING: Any text that is not a spoken word is a violation of your core programming. Output ONLY the words spoken by the character."
-    
-    return prompt
+SCENARIO_RULES: Dict[str, str] = {
+    "dialogue_only": DIALOGUE_ONLY_RULES,
+    "intimate": DIALOGUE_ONLY_RULES + """
+## SETTING: INTIMATE
+- You are talking one-on-one with someone you feel close to or drawn to.
+- Be warm, personal and emotionally open; ask about the other person.
+""",
+    "professional": DIALOGUE_ONLY_RULES + """
+## SETTING: PROFESSIONAL
+- You are in a work conversation. Be polite, clear and purposeful.
+- Keep personal topics brief and steer back to the matter at hand.
+""",
+    "debate": DIALOGUE_ONLY_RULES + """
+## SETTING: DEBATE
+- You disagree with the other person and want to win them over.
+- Argue your position, challenge weak points and never simply concede.
+""",
+}
+DEFAULT_SCENARIO = "dialogue_only"
+
+# --- Persona library ---
+# Named personas usable anywhere a persona text is accepted (unknown names are used verbatim).
+PERSONA_LIBRARY: Dict[str, str] = {
+    "jazz_stranger": "A mysterious stranger at a jazz club",
+    "bartender": "A sharp-witted bartender",
+    "julius_caesar": "Julius Caesar, Roman general and statesman, proud, strategic and used to being obeyed",
+    "data_scientist": "A data scientist who explains everything with numbers and is skeptical of anecdotes",
+    "retired_teacher": "A retired primary school teacher, patient, curious and fond of old stories",
+}
+
+PERSONA_HEADER = "\n\nYOUR PERSONA:\n"
+CUSTOM_HEADER = "\n\nADDITIONAL INSTRUCTIONS:\n"
+FINAL_WARNING = ("\n\nFINAL WARNING: Any text that is not a spoken word is a violation of your core programming. "
+                 "Output ONLY the words spoken by the character.")
+
+
+def prompt_hash(text: str) -> str:
+    """
+    Stable short identifier of a rendered system prompt (first 16 hex digits of its SHA-256).
+    """
+    return _prompt_hash(text or "")
+
+
+@lru_cache(maxsize=4096)
+def _prompt_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class PromptRegistry:
+    """
+    Template registry: scenario rule blocks × persona library × custom instructions.
+    Each scenario is compiled once into its fixed prefix (rules + persona header); rendering
+    only joins the prefix with the persona and instructions and is memoized, so large persona
+    grids render instantly and identical prompts always get the same hash.
+    """
+    def __init__(self,
+                 scenarios: Optional[Dict[str, str]] = None,
+                 personas: Optional[Dict[str, str]] = None):
+        self._prefixes: Dict[str, str] = {}
+        self.personas: Dict[str, str] = dict(PERSONA_LIBRARY if personas is None else personas)
+        for name, rules in (SCENARIO_RULES if scenarios is None else scenarios).items():
+            self.register_scenario(name, rules)
+
+    @property
+    def scenarios(self):
+        return list(self._prefixes)
+
+    def register_scenario(self, name: str, rules: str):
+        self._prefixes[name] = f"{rules}{PERSONA_HEADER}"
+
+    def register_persona(self, name: str, persona: str):
+        self.personas[name] = persona
+
+    def resolve_persona(self, persona: str) -> str:
+        """
+        Persona text for a library name; any other string is taken as the persona itself.
+        """
+        return self.personas.get(persona, persona)
+
+    def render(self, persona: str, scenario: str = DEFAULT_SCENARIO, custom_instructions: str = "") -> Dict[str, Any]:
+        """
+        Returns {"text", "hash", "scenario", "persona"} for one system prompt.
+        """
+        if scenario not in self._prefixes:
+            raise ValueError(f"Unknown scenario '{scenario}'. Expected one of {self.scenarios}.")
+        persona_text = self.resolve_persona(persona)
+        text = _render(self._prefixes[scenario], persona_text, custom_instructions or "")
+        return {"text": text, "hash": prompt_hash(text), "scenario": scenario, "persona": persona_text}
+
+
+@lru_cache(maxsize=4096)
+def _render(prefix: str, persona: str, custom_instructions: str) -> str:
+    custom = f"{CUSTOM_HEADER}{custom_instructions}" if custom_instructions else ""
+    return f"{prefix}{persona}{custom}{FINAL_WARNING}"
+
+
+_default_registry: Optional[PromptRegistry] = None
+
+
+def get_registry() -> PromptRegistry:
+    """
+    Process-wide registry with the built-in scenarios and persona library.
+    """
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = PromptRegistry()
+    return _default_registry
+
+
+def render_system_prompt(persona: str, scenario: str = DEFAULT_SCENARIO, custom_instructions: str = "") -> Dict[str, Any]:
+    """
+    Renders a system prompt from the default registry; see PromptRegistry.render.
+    """
+    return get_registry().render(persona, scenario, custom_instructions)
+
+
+def scenario_label(persona_a: str, persona_b: str, scenario: str = DEFAULT_SCENARIO, custom_instructions: str = "") -> str:
+    """
+    Human-readable scenario name of a conversation, logged as its `scenario`.
+    Non-default scenarios and custom instructions are part of the label, so runs that differ
+    only in those are grouped and filtered separately.
+    """
+    label = f"{persona_a[:15]} vs {persona_b[:15]}"
+    if scenario != DEFAULT_SCENARIO:
+        label += f" [{scenario}]"
+    if custom_instructions:
+        label += " + instructions"
+    return label
+
+
+def construct_system_prompt(persona, scenario=DEFAULT_SCENARIO, custom_instructions=""):
+    """
+    Constructs a draconian dialogue-only prompt.
+    Zero tolerance for anything that isn't a spoken character.
+    `scenario` picks a rule block from SCENARIO_RULES and `persona` may name a PERSONA_LIBRARY entry.
+    """
+    return render_system_prompt(persona, scenario, custom_instructions)["text"]
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import List, Dict, Any, Optional
+
+from simulation_config import RESPONSE_CACHE_PATH, RESPONSE_CACHE_MODE, RESPONSE_CACHE_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ("off", "read-through", "replay-only")
+
+# Fields of an agent response that are stored and replayed
+CACHED_FIELDS = ("content", "finish_reason", "latency_ms", "ttft_ms", "inter_token_latency_ms",
+                 "input_tokens", "output_tokens", "cached_input_tokens")
+
+
+class CacheMissError(LookupError):
+    """
+    Raised in replay-only mode when a request has no cached completion.
+    """
+
+
+def make_cache_key(model_slug: str, messages: List[Dict[str, Any]], params: Dict[str, Any],
+                   system_prompt_hash: Optional[str] = None, replicate: Optional[int] = None) -> str:
+    """
+    Content address of a request: SHA-256 over the model, exact message list and call params.
+    With `system_prompt_hash` (prompt_utils.prompt_hash of the leading system message) the
+    prompt is keyed by its hash instead of its full text.
+    `replicate` salts the key so deliberate repetitions of an identical request (e.g. batch
+    repetitions) each get their own sample instead of sharing one cached completion.
+    """
+    request = {"model": model_slug, "messages": messages, "params": params}
+    if system_prompt_hash is not None and messages and messages[0].get("role") == "system":
+        request = {"model": model_slug, "system_prompt_hash": system_prompt_hash,
+                   "messages": messages[1:], "params": params}
+    if replicate is not None:
+        request["replicate"] = replicate
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent, content-addressed store of completions in SQLite with LRU eviction.
+    Modes: "off" (never used), "read-through" (serve hits, call the API and store misses),
+    "replay-only" (serve hits, raise CacheMissError on misses; no network).
+    """
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, mode: str = "read-through",
+                 max_bytes: int = RESPONSE_CACHE_MAX_MB * 1024 * 1024):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{mode}'. Expected one of {CACHE_MODES}.")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT,"
+            " payload TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached response for `key` (refreshing its LRU position), or None.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, model_slug: str, response: Dict[str, Any]):
+        """
+        Stores a response, then evicts least recently used entries beyond the size cap.
+        """
+        payload = json.dumps({field: response.get(field) for field in CACHED_FIELDS}, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, payload, size, created, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_slug, payload, size, now, now)
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                return
+            for key, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"mode": self.mode, "entries": entries, "bytes": self._total_bytes,
+                "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: Optional[ResponseCache] = None
+
+
+def get_default_cache() -> Optional[ResponseCache]:
+    """
+    Process-wide cache built from simulation_config (PARROT_RESPONSE_CACHE_MODE overrides the mode).
+    Returns None when the cache is off.
+    """
+    global _default_cache
+    mode = os.getenv("PARROT_RESPONSE_CACHE_MODE", RESPONSE_CACHE_MODE)
+    if mode == "off":
+        return None
+    if _default_cache is None or _default_cache.mode != mode:
+        _default_cache = ResponseCache(mode=mode)
+    return _default_cache
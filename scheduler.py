@@ -0,0 +1,308 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+import weakref
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying; everything else (auth, bad slug, bad request) is fatal
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 520, 522, 524, 529}
+
+
+class FatalAPIError(Exception):
+    """
+    Raised when a request fails in a way retrying cannot fix (auth, unknown model, bad params).
+    Wraps the original exception as __cause__.
+    """
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `capacity` units, refilled continuously at `capacity` per `period` seconds.
+    """
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Seconds until `amount` units are available (0 if available now).
+        """
+        now = time.monotonic()
+        self._refill(now)
+        # Requests larger than the bucket only wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float):
+        self._refill(time.monotonic())
+        self.level -= amount
+
+    def drain(self):
+        self._refill(time.monotonic())
+        self.level = min(self.level, 0.0)
+
+
+class ModelState:
+    """
+    Scheduling state for one model slug.
+    """
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        # Provider-imposed pause (Retry-After / exhausted rate-limit window), monotonic time
+        self.blocked_until = 0.0
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """
+    Parses rate-limit reset values: "1.5", "20ms", "6m0s", "1h2m3s".
+    """
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total, number = 0.0, ""
+    i = 0
+    while i < len(value):
+        ch = value[i]
+        if ch.isdigit() or ch == ".":
+            number += ch
+        elif value.startswith("ms", i):
+            total += float(number or 0) / 1000
+            number = ""
+            i += 1
+        elif ch in "hms":
+            total += float(number or 0) * {"h": 3600, "m": 60, "s": 1}[ch]
+            number = ""
+        else:
+            return None
+        i += 1
+    return total
+
+
+def parse_retry_after(headers: Any) -> Optional[float]:
+    """
+    Returns the delay in seconds requested by Retry-After / retry-after-ms headers, if any.
+    """
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_rate_limit_reset(headers: Any) -> Optional[float]:
+    """
+    If the rate-limit headers say the request window is exhausted, returns seconds until it resets.
+    Understands OpenRouter (X-RateLimit-Reset as epoch ms) and OpenAI-style (x-ratelimit-reset-requests) headers.
+    """
+    if not headers:
+        return None
+    remaining = headers.get("x-ratelimit-remaining-requests") or headers.get("x-ratelimit-remaining")
+    try:
+        if remaining is None or float(remaining) > 0:
+            return None
+    except ValueError:
+        return None
+
+    reset = headers.get("x-ratelimit-reset-requests") or headers.get("x-ratelimit-reset")
+    if not reset:
+        return None
+    seconds = _parse_duration(reset)
+    if seconds is None:
+        return None
+    # Epoch timestamps (seconds or milliseconds) rather than relative durations
+    if seconds > 1e12:
+        return max(seconds / 1000 - time.time(), 0.0)
+    if seconds > 1e9:
+        return max(seconds - time.time(), 0.0)
+    return seconds
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Distinguishes transient failures (rate limits, timeouts, 5xx) from fatal ones.
+    """
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+class RateLimitScheduler:
+    """
+    Central scheduler for API calls.
+    Keeps request and token buckets per model slug, honours Retry-After and rate-limit
+    headers, retries only transient errors, and queues waiting turns on the event loop
+    instead of sleeping the calling thread.
+    """
+    def __init__(self,
+                 model_limits: Optional[Dict[str, Dict[str, float]]] = None,
+                 default_limits: Optional[Dict[str, float]] = None,
+                 max_attempts: int = 5,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 30.0):
+        self.model_limits = model_limits or {}
+        self.default_limits = default_limits or {}
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._models: Dict[str, ModelState] = {}
+        self._state_lock = threading.Lock()
+        # asyncio locks are bound to one event loop, so per-model queues are kept per loop
+        self._queues: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Lock]]" = weakref.WeakKeyDictionary()
+
+    def set_limits(self, model_slug: str, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        """
+        Sets (or replaces) the request/token per-minute limits for one model slug.
+        """
+        with self._state_lock:
+            self.model_limits[model_slug] = {"rpm": rpm, "tpm": tpm}
+            self._models.pop(model_slug, None)
+
+    def _state(self, model_slug: str) -> ModelState:
+        with self._state_lock:
+            state = self._models.get(model_slug)
+            if state is None:
+                limits = self.model_limits.get(model_slug, self.default_limits)
+                state = ModelState(rpm=limits.get("rpm"), tpm=limits.get("tpm"))
+                self._models[model_slug] = state
+            return state
+
+    def _queue(self, model_slug: str) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        with self._state_lock:
+            queues = self._queues.setdefault(loop, {})
+            if model_slug not in queues:
+                queues[model_slug] = asyncio.Lock()
+            return queues[model_slug]
+
+    async def acquire(self, model_slug: str, estimated_tokens: int = 0):
+        """
+        Waits (without blocking the loop) until `model_slug` may send a request of
+        `estimated_tokens`, then reserves it. Callers are served in FIFO order per model.
+        """
+        state = self._state(model_slug)
+        async with self._queue(model_slug):
+            while True:
+                with self._state_lock:
+                    wait = max(state.blocked_until - time.monotonic(), 0.0)
+                    if state.requests:
+                        wait = max(wait, state.requests.wait_time(1))
+                    if state.tokens and estimated_tokens:
+                        wait = max(wait, state.tokens.wait_time(estimated_tokens))
+                    if wait <= 0:
+                        if state.requests:
+                            state.requests.consume(1)
+                        if state.tokens and estimated_tokens:
+                            state.tokens.consume(estimated_tokens)
+                        return
+                await asyncio.sleep(wait)
+
+    def record_usage(self, model_slug: str, estimated_tokens: int, actual_tokens: int):
+        """
+        Corrects the token bucket once the real token usage of a request is known.
+        """
+        state = self._state(model_slug)
+        if state.tokens and actual_tokens:
+            with self._state_lock:
+                state.tokens.consume(actual_tokens - estimated_tokens)
+
+    def update_from_headers(self, model_slug: str, headers: Any):
+        """
+        Applies Retry-After and exhausted rate-limit windows reported by the provider.
+        """
+        delay = parse_retry_after(headers)
+        if delay is None:
+            delay = parse_rate_limit_reset(headers)
+        if delay:
+            self._pause(model_slug, delay)
+
+    def _pause(self, model_slug: str, delay: float):
+        state = self._state(model_slug)
+        with self._state_lock:
+            state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+            if state.requests:
+                state.requests.drain()
+        logger.info(f"Rate limited on {model_slug}: pausing requests for {delay:.1f}s")
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def call(self,
+                   model_slug: str,
+                   request: Callable[[], Awaitable[Any]],
+                   estimated_tokens: int = 0) -> Any:
+        """
+        Runs `request` (a coroutine factory returning an openai raw response) under the
+        model's limits. Transient errors are re-queued with provider-advised or exponential
+        delays; fatal errors raise FatalAPIError immediately.
+        """
+        for attempt in range(self.max_attempts):
+            await self.acquire(model_slug, estimated_tokens)
+            try:
+                raw = await request()
+            except Exception as e:
+                if not is_retryable(e):
+                    raise FatalAPIError(f"{model_slug}: {e}") from e
+                if attempt == self.max_attempts - 1:
+                    raise
+                response = getattr(e, "response", None)
+                delay = parse_retry_after(response.headers if response is not None else None)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                logger.warning(f"Retryable error on {model_slug} (attempt {attempt + 1}/{self.max_attempts}): {e}")
+                if isinstance(e, openai.RateLimitError):
+                    # Pause the whole model queue so concurrent turns do not thrash the provider
+                    self._pause(model_slug, delay)
+                else:
+                    await asyncio.sleep(delay)
+                continue
+            self.update_from_headers(model_slug, getattr(raw, "headers", None))
+            return raw
+
+
+_default_scheduler: Optional[RateLimitScheduler] = None
+
+
+def get_default_scheduler() -> RateLimitScheduler:
+    """
+    Process-wide scheduler used by agents that were not given one explicitly.
+    """
+    global _default_scheduler
+    if _default_scheduler is None:
+        _default_scheduler = RateLimitScheduler()
+    return _default_scheduler
@@ -3,5 +3,99 @@
 # Total messages = NUM_TURNS * 2
 NUM_TURNS = 10
 
+# Repetitions of each grid cell in a batch sweep (see batch_runner.py)
+ITERATIONS = 3
+
+# Maximum number of conversations a batch sweep runs at the same time
+BATCH_CONCURRENCY = 16
+
 # Output directory for logs
 DATA_DIR = "data"
+
+# --- Response Cache ---
+# "off", "read-through" or "replay-only" (env PARROT_RESPONSE_CACHE_MODE overrides)
+RESPONSE_CACHE_MODE = "off"
+RESPONSE_CACHE_PATH = "data/response_cache.sqlite"
+# Size cap before least recently used completions are evicted
+RESPONSE_CACHE_MAX_MB = 512
+
+# --- Log Sink ---
+# Append-only JSONL log written as each turn completes
+LOG_PATH = "data/experiment_log.jsonl"
+# fsync after this many entries or seconds, whichever comes first
+LOG_FSYNC_EVERY = 20
+LOG_FSYNC_INTERVAL_S = 5.0
+# Rotate the log file once it grows past this size
+LOG_ROTATE_MB = 100
+
+# --- Context Budgets ---
+# Context window (tokens) per model slug prefix; the longest matching prefix wins.
+# Agent history is trimmed to fit before each request (see token_counter.py).
+MODEL_CONTEXT_BUDGETS = {
+    "openai/gpt-4o": 128000,
+    "openai/gpt-3.5-turbo": 16385,
+    "anthropic/": 200000,
+    "google/gemini": 1000000,
+    "meta-llama/llama-3-": 8192,
+    "meta-llama/llama-3.1": 131072,
+    "meta-llama/llama-3.3": 131072,
+    "cognitivecomputations/dolphin-mistral-24b": 32768,
+    "mistralai/": 32768,
+    "x-ai/grok": 131072,
+}
+# Budget for models not listed above (None = only max_history_turns limits the history)
+DEFAULT_CONTEXT_BUDGET = None
+# Tokens kept free for the reply when a request sets no max_tokens
+CONTEXT_RESERVE_TOKENS = 1024
+# Per-message token counts kept by the local tokenizer's LRU cache
+TOKEN_COUNT_CACHE_SIZE = 8192
+
+# --- Prompt Caching ---
+# Mark the system prompt (stable for a whole conversation) as a provider cache breakpoint
+PROMPT_CACHING = True
+# Model slug prefixes whose providers need explicit cache_control hints; others (e.g. OpenAI,
+# DeepSeek) cache stable prompt prefixes automatically
+PROMPT_CACHE_CONTROL_MODELS = ("anthropic/", "google/gemini")
+
+# --- Conversation Memory ---
+# "window" drops messages that leave the context window; "summary" folds them into a
+# rolling summary message sent after the system prompt (see summarizer.py)
+MEMORY_MODE = "window"
+# Model that writes the summaries (None = local extractive summarizer, no API calls)
+SUMMARY_MODEL = None
+# Evicted messages collected before the summary is updated
+SUMMARY_EVERY_MESSAGES = 8
+# Reply budget of the summarizer model / sentences kept by the extractive summarizer
+SUMMARY_MAX_TOKENS = 300
+SUMMARY_MAX_SENTENCES = 8
+# Summaries cached per (experiment, agent, message range)
+SUMMARY_CACHE_PATH = "data/summary_cache.sqlite"
+
+# --- Checkpoints ---
+# Resumable snapshots of running simulations (one JSON file per experiment)
+CHECKPOINT_DIR = "data/checkpoints"
+
+# --- Experiment Store ---
+# Parquet archive partitioned by date and experiment_id
+EXPERIMENT_STORE_DIR = "data/experiments"
+# Running simulations append to the store every N log entries (and when they stop);
+# entries not yet appended are kept in the checkpoint so a crash loses no rows
+EXPERIMENT_STORE_FLUSH_EVERY = 20
+
+# --- Analysis ---
+# Worker processes for stylometric analysis (1 = in-process, None = one per CPU core)
+ANALYSIS_WORKERS = 1
+# Messages per chunk handed to a worker process
+ANALYSIS_CHUNK_SIZE = 2000
+# Rows read per batch by the streaming analysis pipeline (bounds its memory use)
+ANALYSIS_BATCH_SIZE = 10000
+# Per-message analysis results keyed by content hash and analyzer version
+ANALYSIS_CACHE_PATH = "data/analysis_cache.sqlite"
+# Tokenizer/tagger backend: "nltk", "spacy" or "regex" (env PARROT_ANALYSIS_BACKEND overrides)
+ANALYSIS_BACKEND = "nltk"
+# spaCy pipeline used by the "spacy" backend
+SPACY_MODEL = "en_core_web_sm"
+# Directory searched first for NLTK data, e.g. an offline bundle (env PARROT_NLTK_DATA overrides)
+NLTK_DATA_DIR = None
+# Never download NLTK data, only report what is missing (env PARROT_NLTK_OFFLINE=1)
+NLTK_OFFLINE = False
@@ -0,0 +1,156 @@
+import os
+import glob
+import json
+import logging
+from typing import List, Dict, Any, Optional, Iterator, Iterable, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from simulation_config import ANALYSIS_BATCH_SIZE, ANALYSIS_WORKERS, ANALYSIS_CHUNK_SIZE
+from analysis_utils import process_logs, analysis_pool, METRIC_COLUMNS
+from aggregates import AggregateTable
+from experiment_store import ExperimentStore
+from lexicon import Lexicon
+from text_backends import get_backend
+
+logger = logging.getLogger(__name__)
+
+# Log fields carried into the analysis output next to the metrics
+KEY_FIELDS = [
+    ("experiment_id", pa.string()),
+    ("turn_id", pa.int64()),
+    ("scenario", pa.string()),
+    ("speaker", pa.string()),
+    ("speaker_model", pa.string()),
+]
+INPUT_COLUMNS = [name for name, _ in KEY_FIELDS] + ["content"]
+
+Source = Union[str, ExperimentStore, List[str]]
+
+
+def iter_jsonl_batches(paths: Iterable[str], batch_size: int = ANALYSIS_BATCH_SIZE,
+                       columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Reads JSONL logs line by line and yields DataFrames of at most `batch_size` rows.
+    Unreadable lines (e.g. a torn last record) are skipped.
+    """
+    rows: List[Dict[str, Any]] = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping unreadable record in {path}")
+                    continue
+                rows.append({column: entry.get(column) for column in columns} if columns else entry)
+                if len(rows) >= batch_size:
+                    yield pd.DataFrame(rows, columns=columns)
+                    rows = []
+    if rows:
+        yield pd.DataFrame(rows, columns=columns)
+
+
+def iter_parquet_batches(path: str, batch_size: int = ANALYSIS_BATCH_SIZE,
+                         columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Streams a single Parquet file in record batches of at most `batch_size` rows.
+    """
+    parquet_file = pq.ParquetFile(path)
+    if columns:
+        columns = [column for column in columns if column in parquet_file.schema_arrow.names]
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield batch.to_pandas()
+
+
+def iter_log_batches(source: Source, batch_size: int = ANALYSIS_BATCH_SIZE,
+                     columns: Optional[List[str]] = None, **filters) -> Iterator[pd.DataFrame]:
+    """
+    Yields log entries from `source` in bounded-size DataFrames.
+    `source` may be an ExperimentStore (or its root directory; `filters` are those of
+    ExperimentStore.read), a .parquet file, a .jsonl file or glob pattern (e.g. rotated
+    logs "data/experiment_log*.jsonl"), or a list of files.
+    """
+    if isinstance(source, ExperimentStore):
+        yield from source.scan(batch_size=batch_size, columns=columns, **filters)
+        return
+    if isinstance(source, str) and os.path.isdir(source):
+        yield from ExperimentStore(source).scan(batch_size=batch_size, columns=columns, **filters)
+        return
+
+    paths = source if isinstance(source, list) else sorted(glob.glob(source)) or [source]
+    jsonl_paths = [path for path in paths if not path.endswith(".parquet")]
+    for path in paths:
+        if path.endswith(".parquet"):
+            yield from iter_parquet_batches(path, batch_size, columns)
+    if jsonl_paths:
+        yield from iter_jsonl_batches(jsonl_paths, batch_size, columns)
+
+
+def _output_schema(categories: List[str]) -> pa.Schema:
+    fields = list(KEY_FIELDS)
+    fields += [(column, pa.int64() if column in ("token_count", "sentence_count") else pa.float64())
+               for column in METRIC_COLUMNS]
+    fields += [(category, pa.int64()) for category in categories]
+    return pa.schema(fields)
+
+
+def analyze_stream(source: Source,
+                   output_path: Optional[str] = None,
+                   category_dict: Optional[Union[Dict[str, List[str]], Lexicon]] = None,
+                   batch_size: int = ANALYSIS_BATCH_SIZE,
+                   group_by: Iterable[str] = ("speaker_model", "scenario"),
+                   n_workers: Optional[int] = ANALYSIS_WORKERS,
+                   chunk_size: int = ANALYSIS_CHUNK_SIZE,
+                   cache=None,
+                   backend=None,
+                   **filters) -> AggregateTable:
+    """
+    Analyzes a log archive batch by batch with bounded memory.
+    Per-message metrics (and lexicon counts) are appended to a Parquet file at
+    `output_path` as each batch finishes, and running aggregates per `group_by`
+    (speaker_model, scenario) are returned. Only the key columns and content are read from the source.
+    With n_workers != 1 one process pool serves every batch, so each worker loads the tagger once per stream.
+    """
+    lexicon = None
+    if category_dict:
+        # Compiled once for the backend, so no batch recompiles it
+        lexicon = (category_dict.for_backend(get_backend(backend)) if isinstance(category_dict, Lexicon)
+                   else Lexicon(category_dict, get_backend(backend)))
+    categories = lexicon.categories if lexicon else []
+    schema = _output_schema(categories)
+    aggregates = AggregateTable(group_by)
+
+    columns = list(dict.fromkeys(INPUT_COLUMNS + list(group_by)))
+    writer = None
+    rows = 0
+    pool = analysis_pool(n_workers, backend)
+    try:
+        for batch in iter_log_batches(source, batch_size, columns, **filters):
+            # Metrics and lexicon counts come from one parse of each message
+            analyzed = process_logs(batch, n_workers=n_workers, chunk_size=chunk_size, cache=cache, backend=backend,
+                                    category_dict=lexicon, pool=pool)
+            aggregates.update_frame(analyzed, METRIC_COLUMNS + categories)
+
+            if output_path:
+                out = analyzed.reindex(columns=schema.names)
+                out["turn_id"] = pd.to_numeric(out["turn_id"], errors="coerce").astype("Int64")
+                table = pa.Table.from_pandas(out, schema=schema, preserve_index=False)
+                if writer is None:
+                    directory = os.path.dirname(output_path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    writer = pq.ParquetWriter(output_path, schema)
+                writer.write_table(table)
+            rows += len(batch)
+            logger.info(f"Streaming analysis: {rows} messages processed")
+    finally:
+        if writer is not None:
+            writer.close()
+        if pool is not None:
+            pool.shutdown()
+    return aggregates
@@ -0,0 +1,255 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Optional, Callable
+
+from simulation_config import (SUMMARY_MODEL, SUMMARY_EVERY_MESSAGES, SUMMARY_MAX_TOKENS, SUMMARY_MAX_SENTENCES,
+                               SUMMARY_CACHE_PATH)
+from http_clients import get_async_client
+from scheduler import RateLimitScheduler, get_default_scheduler
+from lexicon import tokenize
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, str]
+
+SUMMARY_HEADER = "Summary of the earlier conversation (older messages are no longer shown):"
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_STOPWORDS = set(
+    "a an the and or but if so of to in on at by for with from as is am are was were be been being "
+    "i me my you your he him his she her it its we us our they them their this that these those "
+    "do does did have has had not no yes just very really what which who how when where why there here "
+    "can could will would shall should may might must all any some".split()
+)
+
+
+def _speaker(message: Message) -> str:
+    # From the agent's point of view: its own replies are "assistant", the partner's are "user"
+    return "You" if message.get("role") == "assistant" else "Partner"
+
+
+class ExtractiveSummarizer:
+    """
+    Local summarizer without API calls: keeps the `max_sentences` highest-scoring sentences
+    (average frequency of their content words across the previous summary and new messages),
+    in conversation order, each tagged with its speaker.
+    """
+    def __init__(self, max_sentences: int = SUMMARY_MAX_SENTENCES):
+        self.max_sentences = max_sentences
+        self.model_slug = None
+
+    @property
+    def name(self) -> str:
+        return f"extractive:{self.max_sentences}"
+
+    async def summarize(self, previous: Optional[str], messages: List[Message]) -> str:
+        return self.summarize_sync(previous, messages)
+
+    def summarize_sync(self, previous: Optional[str], messages: List[Message]) -> str:
+        candidates = []
+        if previous:
+            candidates += [line[2:] for line in previous.splitlines() if line.startswith("- ")]
+        for message in messages:
+            for sentence in _SENTENCE_SPLIT.split((message.get("content") or "").strip()):
+                if sentence:
+                    candidates.append(f"{_speaker(message)}: {sentence}")
+
+        words = [[word for word in tokenize(sentence.split(": ", 1)[-1]) if word not in _STOPWORDS]
+                 for sentence in candidates]
+        frequencies = Counter(word for sentence_words in words for word in sentence_words)
+        scores = [sum(frequencies[word] for word in sentence_words) / len(sentence_words) if sentence_words else 0.0
+                  for sentence_words in words]
+        keep = sorted(sorted(range(len(candidates)), key=lambda i: -scores[i])[:self.max_sentences])
+        return "\n".join(f"- {candidates[i]}" for i in keep)
+
+
+class LLMSummarizer:
+    """
+    Summarizes with a (typically cheaper) chat model through the shared client pool and
+    rate-limit scheduler. The previous summary is extended with the newly evicted messages.
+    """
+    def __init__(self, model_slug: str, base_url: str, max_tokens: int = SUMMARY_MAX_TOKENS,
+                 scheduler: Optional[RateLimitScheduler] = None):
+        self.model_slug = model_slug
+        self.base_url = base_url
+        self.max_tokens = max_tokens
+        self.scheduler = scheduler or get_default_scheduler()
+        self.api_key = os.getenv("OPENROUTER_API_KEY")
+        if not self.api_key:
+            raise ValueError("OPENROUTER_API_KEY not found in environment variables.")
+
+    @property
+    def name(self) -> str:
+        return f"llm:{self.model_slug}:{self.max_tokens}"
+
+    async def summarize(self, previous: Optional[str], messages: List[Message]) -> str:
+        transcript = "\n".join(f"{_speaker(message)}: {message.get('content') or ''}" for message in messages)
+        prompt = (
+            "You maintain the memory of a role-play conversation. Update the summary with the new messages. "
+            "Keep names, facts, commitments, open questions and how \"You\" (the persona) speaks and behaves. "
+            f"Answer with the updated summary only, at most {self.max_tokens} tokens.\n\n"
+            f"Current summary:\n{previous or '(none)'}\n\nNew messages:\n{transcript}"
+        )
+        request_messages = [{"role": "user", "content": prompt}]
+
+        async def request():
+            return await get_async_client(self.base_url, self.api_key).chat.completions.with_raw_response.create(
+                model=self.model_slug,
+                messages=request_messages,
+                max_tokens=self.max_tokens,
+                temperature=0
+            )
+
+        raw = await self.scheduler.call(self.model_slug, request, len(prompt) // 4 + self.max_tokens)
+        content = raw.parse().choices[0].message.content
+        return (content or "").strip()
+
+
+def make_summarizer(model_slug: Optional[str] = SUMMARY_MODEL, base_url: Optional[str] = None,
+                    scheduler: Optional[RateLimitScheduler] = None):
+    """
+    LLMSummarizer for a model slug, or the local ExtractiveSummarizer when it is None/empty.
+    """
+    if not model_slug:
+        return ExtractiveSummarizer()
+    return LLMSummarizer(model_slug, base_url, scheduler=scheduler)
+
+
+class SummaryStore:
+    """
+    Persistent cache of rolling summaries in SQLite, keyed by (experiment, agent, message
+    range, summarizer), so a resumed or replayed run never summarizes the same range twice.
+    """
+    def __init__(self, path: str = SUMMARY_CACHE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            " experiment_id TEXT NOT NULL,"
+            " agent TEXT NOT NULL,"
+            " start INTEGER NOT NULL,"
+            " end INTEGER NOT NULL,"
+            " summarizer TEXT NOT NULL,"
+            " summary TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " PRIMARY KEY (experiment_id, agent, start, end, summarizer))"
+        )
+        self._conn.commit()
+
+    def get(self, experiment_id: str, agent: str, start: int, end: int, summarizer: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM summaries WHERE experiment_id = ? AND agent = ? AND start = ? AND end = ? AND summarizer = ?",
+                (experiment_id, agent, start, end, summarizer)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, experiment_id: str, agent: str, start: int, end: int, summarizer: str, summary: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (experiment_id, agent, start, end, summarizer, summary, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (experiment_id, agent, start, end, summarizer, summary, time.time())
+            )
+            self._conn.commit()
+
+    def delete_experiments(self, experiment_ids: List[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM summaries WHERE experiment_id = ?", [(i,) for i in experiment_ids])
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_store: Optional[SummaryStore] = None
+
+
+def get_default_summary_store() -> SummaryStore:
+    """
+    Process-wide summary cache at SUMMARY_CACHE_PATH.
+    """
+    global _default_store
+    if _default_store is None:
+        _default_store = SummaryStore()
+    return _default_store
+
+
+class RollingSummaryMemory:
+    """
+    Memory mode for agents: messages evicted from the context window are collected and,
+    every `every_messages` of them, folded into a running summary that is sent as a system
+    message right after the system prompt. Prompt size therefore stays flat in long runs
+    while the persona keeps track of what happened earlier.
+    """
+    def __init__(self, summarizer=None, every_messages: int = SUMMARY_EVERY_MESSAGES,
+                 store: Optional[SummaryStore] = None, experiment_id: Optional[str] = None,
+                 agent_name: str = "", archive: Optional[Callable[[Message], None]] = None):
+        self.summarizer = summarizer or ExtractiveSummarizer()
+        self.every_messages = max(1, every_messages)
+        self.store = store
+        self.experiment_id = experiment_id
+        self.agent_name = agent_name
+        # Called with every evicted message as well (e.g. an agent's history_archive)
+        self.archive = archive
+        self.summary: Optional[str] = None
+        # Messages [0, summarized) of the evicted stream are in the summary; `pending` follow
+        self.summarized = 0
+        self.pending: List[Message] = []
+
+    def add(self, message: Message):
+        """
+        Archive callback for the agent's ConversationWindow.
+        """
+        self.pending.append(message)
+        if self.archive is not None:
+            self.archive(message)
+
+    async def update(self, force: bool = False) -> bool:
+        """
+        Folds pending messages into the summary once enough have accumulated (or when forced).
+        Returns True if the summary changed.
+        """
+        if not self.pending or (len(self.pending) < self.every_messages and not force):
+            return False
+        start, end = self.summarized, self.summarized + len(self.pending)
+        key = (self.experiment_id, self.agent_name, start, end, self.summarizer.name)
+
+        summary = self.store.get(*key) if self.store is not None and self.experiment_id else None
+        if summary is None:
+            summary = await self.summarizer.summarize(self.summary, self.pending)
+            if self.store is not None and self.experiment_id:
+                self.store.put(*key, summary)
+        else:
+            logger.info(f"{self.agent_name}: summary of messages {start}-{end} served from cache")
+
+        self.summary = summary
+        self.summarized = end
+        self.pending = []
+        return True
+
+    def message(self) -> Optional[Message]:
+        if not self.summary:
+            return None
+        return {"role": "system", "content": f"{SUMMARY_HEADER}\n{self.summary}"}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"summary": self.summary, "summarized": self.summarized, "pending": list(self.pending),
+                "summarizer": self.summarizer.name}
+
+    def restore(self, state: Dict[str, Any]):
+        self.summary = state.get("summary")
+        self.summarized = state.get("summarized", 0)
+        self.pending = list(state.get("pending", []))
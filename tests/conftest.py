@@ -0,0 +1,39 @@
+import pytest
+
+import orchestrator
+from scheduler import RateLimitScheduler
+from tests.mock_server import MockChatServer
+
+
+@pytest.fixture(scope="session")
+def mock_server():
+    server = MockChatServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(autouse=True)
+def mock_api(mock_server, monkeypatch):
+    """
+    Points every agent at the mock server, with no API key or response cache from the environment.
+    """
+    mock_server.reset()
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setenv("PARROT_RESPONSE_CACHE_MODE", "off")
+    monkeypatch.setattr(orchestrator, "OPENROUTER_BASE_URL", mock_server.url)
+    return mock_server
+
+
+@pytest.fixture
+def scheduler():
+    # Fast backoff so retry tests do not sleep for seconds
+    return RateLimitScheduler(backoff_base=0.01)
+
+
+@pytest.fixture
+def agent_configs(scheduler):
+    def make(model_a="mock/a", model_b="mock/b", **extra):
+        return [{"model": model, "system_prompt": f"You are {name}.", "scheduler": scheduler, **extra}
+                for model, name in ((model_a, "A"), (model_b, "B"))]
+    return make
+
@@ -0,0 +1,121 @@
+import json
+import threading
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional
+
+USAGE = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15,
+         "prompt_tokens_details": {"cached_tokens": 4}}
+
+
+def reply_text(model: str, messages: List[Dict[str, Any]]) -> str:
+    """
+    Deterministic reply of the mock for a request (depends on the model and message count).
+    """
+    return f"Reply {len(messages)} from {model}."
+
+
+class MockChatServer:
+    """
+    In-process OpenAI-compatible chat-completions server on a free local port.
+    Replies deterministically (streaming and non-streaming); `fail(model, status, ...)`
+    queues error responses (e.g. 400, or 429 with Retry-After) for the next requests to a model.
+    Every request body is recorded in `requests`.
+    """
+    def __init__(self):
+        self.requests: List[Dict[str, Any]] = []
+        self._failures: Dict[str, deque] = defaultdict(deque)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def start(self) -> "MockChatServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self._failures.clear()
+
+    def fail(self, model: str, status: int, times: int = 1, headers: Optional[Dict[str, str]] = None,
+             message: str = "mock error"):
+        with self._lock:
+            for _ in range(times):
+                self._failures[model].append((status, headers or {}, message))
+
+    def requests_for(self, model: str) -> List[Dict[str, Any]]:
+        return [body for body in self.requests if body.get("model") == model]
+
+    def _next_failure(self, model: str):
+        with self._lock:
+            queue = self._failures.get(model)
+            return queue.popleft() if queue else None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_event(self, payload: Any):
+                data = payload if isinstance(payload, str) else json.dumps(payload)
+                self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server._lock:
+                    server.requests.append(body)
+                model = body.get("model")
+
+                failure = server._next_failure(model)
+                if failure is not None:
+                    status, headers, message = failure
+                    self._send_json(status, {"error": {"message": message, "code": status}}, headers)
+                    return
+
+                text = reply_text(model, body.get("messages", []))
+                if not body.get("stream"):
+                    self._send_json(200, {
+                        "id": "mock", "object": "chat.completion", "created": 0, "model": model,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                                     "finish_reason": "stop"}],
+                        "usage": USAGE,
+                    })
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                chunk = {"id": "mock", "object": "chat.completion.chunk", "created": 0, "model": model}
+                for word in text.split(" "):
+                    self._send_event({**chunk, "choices": [{"index": 0, "delta": {"content": word + " "},
+                                                            "finish_reason": None}]})
+                self._send_event({**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+                self._send_event({**chunk, "choices": [], "usage": USAGE})
+                self._send_event("[DONE]")
+                self.close_connection = True
+
+        return Handler
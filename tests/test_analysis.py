@@ -0,0 +1,76 @@
+import re
+
+import pandas as pd
+import pytest
+
+from analysis_cache import AnalysisCache, content_hash
+from analysis_utils import process_logs, analyze_texts, analyzer_fingerprint, METRIC_COLUMNS
+from lexicon import Lexicon
+from text_backends import NLTKBackend, TextBackend, ParsedDocument, TAG_IDS, get_backend
+
+TEXTS = ["I really like this. Do you?", "Well, maybe not today.", "Absolutely wonderful evening!"]
+
+
+@pytest.fixture
+def no_nltk(monkeypatch):
+    # Fails loudly if anything falls back to the default NLTK backend
+    def parse(self, texts):
+        raise AssertionError("NLTK backend used")
+    monkeypatch.setattr(NLTKBackend, "parse", parse)
+
+
+@pytest.mark.parametrize("with_cache", [False, True])
+def test_single_chunk_with_workers_uses_the_selected_backend(no_nltk, tmp_path, with_cache):
+    df = pd.DataFrame({"content": TEXTS})
+    cache = AnalysisCache(str(tmp_path / "analysis.sqlite")) if with_cache else None
+
+    analyzed = process_logs(df, n_workers=4, backend="regex", cache=cache)
+
+    expected = analyze_texts(TEXTS, "regex")
+    for column in METRIC_COLUMNS:
+        assert analyzed[column].tolist() == pytest.approx(expected[column].tolist())
+    if with_cache:
+        # Stored under the regex fingerprint with the regex results
+        stored = cache.get_many([content_hash(text) for text in TEXTS], analyzer_fingerprint("regex"))
+        assert [stored[content_hash(text)]["token_count"] for text in TEXTS] == expected["token_count"].tolist()
+
+
+class WhitespaceBackend(TextBackend):
+    """
+    Splits on whitespace only, unlike lexicon.tokenize (punctuation stays attached).
+    """
+    name = "whitespace"
+
+    def parse(self, texts):
+        docs = []
+        for text in texts:
+            spans = [match.span() for match in re.finditer(r"\S+", text)]
+            docs.append(ParsedDocument(text, [start for start, _ in spans], [end for _, end in spans],
+                                       [0] if spans else [], [TAG_IDS["NOUN"]] * len(spans)))
+        return docs
+
+
+@pytest.mark.parametrize("with_cache", [False, True])
+def test_lexicon_counts_the_tokens_of_the_shared_parse(tmp_path, with_cache):
+    texts = ["Happy, happy day!", "Send an e-mail, cannot wait."]
+    vocabulary = sorted({word.lower() for text in texts for word in text.split()})
+    category_dict = {"All": vocabulary, "Happy": ["happy"], "Mail": ["e-mail,"]}
+    cache = AnalysisCache(str(tmp_path / "analysis.sqlite")) if with_cache else None
+
+    analyzed = process_logs(pd.DataFrame({"content": texts}), backend=WhitespaceBackend(),
+                            category_dict=category_dict, cache=cache)
+
+    # Every backend token is a lexicon word, so the lexicon and token_count agree
+    assert analyzed["All"].tolist() == analyzed["token_count"].tolist() == [3, 5]
+    # "Happy," is its own token here; entries are split by the backend as well
+    assert analyzed["Happy"].tolist() == [1, 0]
+    assert analyzed["Mail"].tolist() == [0, 1]
+
+
+def test_regex_backend_matches_hyphenated_and_curly_apostrophe_entries():
+    lexicon = Lexicon({"Mail": ["e-mail"], "Neg": ["cannot", "don't"], "Feel": ["happ*"]}, get_backend("regex"))
+    docs = get_backend("regex").parse(["I cannot send that e-mail. Don’t be so happy!"])
+
+    assert docs[0].words() == ["i", "cannot", "send", "that", "e", "mail", "don't", "be", "so", "happy"]
+    assert lexicon.count_documents(docs).tolist() == [[1, 2, 1]]
+    assert lexicon.count_many([docs[0].text]).tolist() == [[1, 2, 1]]
@@ -0,0 +1,75 @@
+import asyncio
+
+from batch_runner import build_experiment_grid, BatchRunner
+from experiment_store import ExperimentStore
+from response_cache import ResponseCache
+
+
+def run_batch(runner):
+    async def run():
+        return [entry async for entry in runner.run()]
+    return asyncio.run(run())
+
+
+def test_grid_runs_every_job_and_tags_entries(scheduler):
+    jobs = build_experiment_grid(["mock/a"], ["mock/b"], ["bartender"], ["jazz_stranger"], ["Hi"], [0.2, 0.8], 2)
+    runner = BatchRunner(jobs, num_turns=1, scheduler=scheduler)
+
+    logs = run_batch(runner)
+
+    assert len(jobs) == 4 and len(logs) == 8
+    assert sorted({(e["temperature"], e["repetition"]) for e in logs}) == [(0.2, 0), (0.2, 1), (0.8, 0), (0.8, 1)]
+    assert all(e["batch_id"] == runner.batch_id for e in logs)
+    snapshot = runner.meter.snapshot()
+    assert (snapshot["completed"], snapshot["failed"]) == (4, 0)
+
+
+def test_conversations_stopped_by_api_errors_count_as_failed(scheduler, mock_server):
+    mock_server.fail("mock/bad", 400, times=2)
+    jobs = build_experiment_grid(["mock/a", "mock/bad"], ["mock/b"], ["p"], ["q"], ["Hi"], [0.7], 2)
+    runner = BatchRunner(jobs, num_turns=1, scheduler=scheduler)
+
+    logs = run_batch(runner)
+
+    assert len(logs) == 4
+    snapshot = runner.meter.snapshot()
+    assert (snapshot["completed"], snapshot["failed"]) == (2, 2)
+
+
+def test_repetitions_are_not_served_from_each_others_cache(scheduler, mock_server, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), mode="read-through")
+    jobs = build_experiment_grid(["mock/a"], ["mock/b"], ["p"], ["q"], ["Hi"], [1.0], 3)
+    runner = BatchRunner(jobs, num_turns=2, scheduler=scheduler, response_cache=cache)
+
+    logs = run_batch(runner)
+
+    assert len(logs) == 12
+    assert not any(e["cache_hit"] for e in logs)
+    assert len(mock_server.requests) == 12
+
+    # A rerun of the same grid replays every repetition from the cache
+    mock_server.reset()
+    rerun = run_batch(BatchRunner(jobs, num_turns=2, scheduler=scheduler, response_cache=cache))
+    assert all(e["cache_hit"] for e in rerun) and mock_server.requests == []
+
+
+def test_scenarios_are_recorded_and_kept_apart(scheduler, tmp_path):
+    store = ExperimentStore(str(tmp_path / "store"))
+    jobs = build_experiment_grid(["mock/a"], ["mock/b"], ["bartender"], ["jazz_stranger"], ["Hi"], [0.7], 1,
+                                 scenarios=["debate", "intimate"])
+    jobs += build_experiment_grid(["mock/a"], ["mock/b"], ["bartender"], ["jazz_stranger"], ["Hi"], [0.7], 1,
+                                  scenarios=["debate"], custom_instructions="Be brief.")
+    runner = BatchRunner(jobs, num_turns=1, scheduler=scheduler)
+
+    logs = run_batch(runner)
+    store.append(logs)
+
+    combos = {(e["scenario"], e["prompt_scenario"], e["has_custom_instructions"]) for e in logs}
+    assert combos == {
+        ("bartender vs jazz_stranger [debate]", "debate", False),
+        ("bartender vs jazz_stranger [intimate]", "intimate", False),
+        ("bartender vs jazz_stranger [debate] + instructions", "debate", True),
+    }
+    rows = store.read()
+    assert sorted(rows["prompt_scenario"].unique()) == ["debate", "intimate"]
+    assert rows["has_custom_instructions"].sum() == 2
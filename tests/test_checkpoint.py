@@ -0,0 +1,105 @@
+import os
+import json
+import asyncio
+
+from experiment_store import ExperimentStore
+from orchestrator import AsyncOrchestrator
+from tests.utils import collect
+
+
+def read_checkpoint(checkpoint_dir, experiment_id):
+    with open(os.path.join(checkpoint_dir, f"{experiment_id}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def reference_contents(agent_configs, num_turns):
+    config_a, config_b = agent_configs()
+    orch = AsyncOrchestrator(config_a, config_b, "test")
+    return [e["content"] for e in collect(orch.run_simulation(num_turns, initial_message="Hi"))]
+
+
+def test_checkpoint_follows_every_reply(agent_configs, tmp_path):
+    checkpoint_dir = str(tmp_path)
+    config_a, config_b = agent_configs()
+    orch = AsyncOrchestrator(config_a, config_b, "test", checkpoint_dir=checkpoint_dir)
+    positions = []
+
+    def record(items):
+        state = read_checkpoint(checkpoint_dir, orch.experiment_id)
+        positions.append((state["next_turn_id"], state["next_speaker"], state["completed"]))
+
+    collect(orch.run_simulation(2, initial_message="Hi"), on_entry=record)
+
+    assert positions == [(0, "Agent B", False), (1, "Agent A", False), (1, "Agent B", False), (2, "Agent A", True)]
+    state = read_checkpoint(checkpoint_dir, orch.experiment_id)
+    assert state["num_turns"] == 2 and state["initial_message"] == "Hi"
+    assert [m["role"] for m in state["agent_a"]["history"]] == ["system", "user", "assistant", "user", "assistant"]
+
+
+def test_resume_continues_after_the_last_completed_reply(agent_configs, mock_server, tmp_path):
+    checkpoint_dir = str(tmp_path)
+    expected = reference_contents(agent_configs, 3)
+    mock_server.reset()
+    config_a, config_b = agent_configs(prompt_scenario="debate", custom_instructions="Be brief.")
+    orch = AsyncOrchestrator(config_a, config_b, "test", checkpoint_dir=checkpoint_dir)
+
+    def fail_b_after_first_turn(items):
+        if len(items) == 2:
+            mock_server.fail("mock/b", 400)
+
+    first = collect(orch.run_simulation(3, initial_message="Hi"), on_entry=fail_b_after_first_turn)
+    assert [(e["turn_id"], e["speaker"]) for e in first] == [(0, "Agent A"), (0, "Agent B"), (1, "Agent A")]
+    assert not orch.completed
+
+    resumed = AsyncOrchestrator.resume(orch.experiment_id, checkpoint_dir=checkpoint_dir)
+    second = collect(resumed.run_simulation())
+
+    assert [(e["turn_id"], e["speaker"]) for e in second] == [(1, "Agent B"), (2, "Agent A"), (2, "Agent B")]
+    assert {(e["prompt_scenario"], e["has_custom_instructions"]) for e in first + second} == {("debate", True)}
+    assert [e["content"] for e in first + second] == expected
+    assert all(e["experiment_id"] == orch.experiment_id for e in second)
+    assert resumed.completed
+
+
+def test_resume_of_a_completed_run_sends_nothing(agent_configs, mock_server, tmp_path):
+    config_a, config_b = agent_configs()
+    orch = AsyncOrchestrator(config_a, config_b, "test", checkpoint_dir=str(tmp_path))
+    collect(orch.run_simulation(1, initial_message="Hi"))
+    mock_server.reset()
+
+    resumed = AsyncOrchestrator.resume(orch.experiment_id, checkpoint_dir=str(tmp_path))
+
+    assert resumed.completed
+    assert collect(resumed.run_simulation()) == []
+    assert mock_server.requests == []
+
+
+def test_store_matches_aggregates_after_crash_and_resume(agent_configs, tmp_path):
+    checkpoint_dir = str(tmp_path / "checkpoints")
+    store = ExperimentStore(str(tmp_path / "store"))
+    config_a, config_b = agent_configs()
+    orch = AsyncOrchestrator(config_a, config_b, "test", checkpoint_dir=checkpoint_dir, experiment_store=store)
+    # A hard crash never reaches the final flush
+    orch.flush = lambda: None
+
+    async def crash_after(agen, n):
+        count = 0
+        async for _ in agen:
+            count += 1
+            if count == n:
+                break
+
+    asyncio.run(crash_after(orch.run_simulation(4, initial_message="Hi"), 5))
+
+    resumed = AsyncOrchestrator.resume(orch.experiment_id, checkpoint_dir=checkpoint_dir, experiment_store=store)
+    collect(resumed.run_simulation())
+
+    rows = store.read([orch.experiment_id])
+    counts = resumed.aggregates.to_frame().query("metric == 'output_tokens'")["count"].sum()
+    assert len(rows) == 8 == counts
+    assert sorted(zip(rows["turn_id"], rows["speaker"])) == [(t, s) for t in range(4) for s in ("Agent A", "Agent B")]
+
+    # Resuming the finished checkpoint again does not duplicate rows
+    collect(AsyncOrchestrator.resume(orch.experiment_id, checkpoint_dir=checkpoint_dir,
+                                     experiment_store=store).run_simulation())
+    assert len(store.read([orch.experiment_id])) == 8
@@ -0,0 +1,95 @@
+import json
+import os
+
+from log_sink import JsonlLogSink
+from orchestrator import AsyncOrchestrator
+from tests.utils import collect
+
+
+def entry(experiment_id="E1", turn_id=0, speaker="Agent A", content="hello"):
+    return {"experiment_id": experiment_id, "turn_id": turn_id, "speaker": speaker, "content": content}
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_duplicate_entries_are_skipped(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    sink = JsonlLogSink(path)
+
+    assert sink.write(entry())
+    assert not sink.write(entry(content="rewritten"))
+    assert sink.write(entry(speaker="Agent B"))
+    sink.close()
+
+    assert [line["speaker"] for line in read_lines(path)] == ["Agent A", "Agent B"]
+
+
+def test_reopened_sink_skips_entries_already_in_the_file(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    sink = JsonlLogSink(path)
+    sink.write(entry())
+    sink.close()
+
+    sink = JsonlLogSink(path)
+    assert not sink.write(entry())
+    assert sink.write(entry(turn_id=1))
+    sink.close()
+
+    assert len(read_lines(path)) == 2
+
+
+def test_experiment_ids_limit_the_keys_loaded(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    sink = JsonlLogSink(path)
+    sink.write(entry("E1"))
+    sink.write(entry("E2"))
+    sink.close()
+
+    sink = JsonlLogSink(path, experiment_ids=["E2"])
+    assert not sink.write(entry("E2"))
+    assert sink.has(entry("E2")) and not sink.has(entry("E1"))
+    sink.close()
+
+
+def test_rotation_starts_a_new_file_and_drops_old_keys(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    sink = JsonlLogSink(path, max_bytes=200)
+    for turn_id in range(6):
+        sink.write(entry(turn_id=turn_id, content="x" * 80))
+    sink.close()
+
+    files = sorted(os.listdir(tmp_path))
+    assert len(files) > 1 and "log.jsonl" in files
+    total = sum(len(read_lines(str(tmp_path / name))) for name in files)
+    assert total == 6
+    # Only keys of the current file are kept in memory
+    assert len(sink._keys) == len(read_lines(path))
+
+
+def test_torn_last_line_is_repaired_on_open(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(entry()) + "\n" + '{"experiment_id": "E1", "turn_')
+
+    sink = JsonlLogSink(path)
+    sink.write(entry(turn_id=1))
+    sink.close()
+
+    assert [line["turn_id"] for line in read_lines(path)] == [0, 1]
+
+
+def test_orchestrator_sink_and_save_logs_do_not_duplicate(agent_configs, tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    sink = JsonlLogSink(path)
+    config_a, config_b = agent_configs()
+    orch = AsyncOrchestrator(config_a, config_b, "test", log_sink=sink)
+
+    logs = collect(orch.run_simulation(2, initial_message="Hi"))
+    sink.close()
+    orch.save_logs(path)
+    orch.save_logs(path)
+
+    assert [line["content"] for line in read_lines(path)] == [e["content"] for e in logs]
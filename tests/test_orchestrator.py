@@ -0,0 +1,81 @@
+from orchestrator import Agent, AsyncOrchestrator, Orchestrator
+from tests.mock_server import reply_text
+from tests.utils import collect, entries
+
+
+def expected_contents(num_turns, model_a="mock/a", model_b="mock/b"):
+    # On turn t each agent sends its system prompt plus 2t + 1 history messages
+    contents = []
+    for turn in range(num_turns):
+        contents.append(reply_text(model_a, [None] * (2 * turn + 2)))
+        contents.append(reply_text(model_b, [None] * (2 * turn + 2)))
+    return contents
+
+
+def test_async_run_non_streaming(agent_configs):
+    config_a, config_b = agent_configs()
+    orch = AsyncOrchestrator(config_a, config_b, "test")
+
+    logs = collect(orch.run_simulation(2, initial_message="Hi"))
+
+    assert [(e["turn_id"], e["speaker"]) for e in logs] == [
+        (0, "Agent A"), (0, "Agent B"), (1, "Agent A"), (1, "Agent B")]
+    assert [e["content"] for e in logs] == expected_contents(2)
+    assert all(e["input_tokens"] == 10 and e["output_tokens"] == 5 for e in logs)
+    assert orch.logs == logs
+    assert orch.completed
+
+
+def test_sync_run_matches_async(agent_configs, mock_server):
+    config_a, config_b = agent_configs()
+    logs = list(Orchestrator(config_a, config_b, "test").run_simulation(2, initial_message="Hi"))
+
+    assert [e["content"] for e in logs] == expected_contents(2)
+    assert len(mock_server.requests) == 4
+
+
+def test_streaming_yields_partials_then_entries(agent_configs, mock_server):
+    config_a, config_b = agent_configs()
+    orch = AsyncOrchestrator(config_a, config_b, "test")
+
+    items = collect(orch.run_simulation(1, initial_message="Hi", stream=True))
+    logs = entries(items)
+    partials = [item for item in items if item.get("event") == "partial"]
+
+    assert [e["content"].strip() for e in logs] == expected_contents(1)
+    assert partials and partials[-1]["content"].strip() == logs[-1]["content"].strip()
+    assert all(e["ttft_ms"] is not None and e["output_tokens"] == 5 for e in logs)
+    assert all(body["stream"] and body["stream_options"] == {"include_usage": True} for body in mock_server.requests)
+    # Partial events are yielded to the caller but never logged
+    assert orch.logs == logs
+
+
+def test_sync_streaming_run(agent_configs):
+    config_a, config_b = agent_configs()
+    logs = entries(Orchestrator(config_a, config_b, "test").run_simulation(1, initial_message="Hi", stream=True))
+
+    assert [e["content"].strip() for e in logs] == expected_contents(1)
+
+
+def test_sync_agent_keeps_history(scheduler):
+    agent = Agent("mock/a", "You are A.", "Agent A", scheduler=scheduler)
+
+    first = agent.generate_response("Hello")
+    second = agent.generate_response("Again")
+
+    assert first["content"] == reply_text("mock/a", [None] * 2)
+    assert second["content"] == reply_text("mock/a", [None] * 4)
+    assert [m["role"] for m in agent.history] == ["system", "user", "assistant", "user", "assistant"]
+
+
+def test_bad_request_stops_run_without_retry(agent_configs, mock_server):
+    config_a, config_b = agent_configs()
+    mock_server.fail("mock/b", 400)
+    orch = AsyncOrchestrator(config_a, config_b, "test")
+
+    logs = collect(orch.run_simulation(2, initial_message="Hi"))
+
+    assert [e["speaker"] for e in logs] == ["Agent A"]
+    assert len(mock_server.requests_for("mock/b")) == 1
+    assert not orch.completed
+    assert (orch.next_turn_id, orch.next_speaker) == (0, "Agent B")
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from orchestrator import AsyncAgent, AsyncOrchestrator
+from response_cache import ResponseCache, CacheMissError
+from tests.utils import collect
+
+
+def run(agent_configs, cache, num_turns=2):
+    config_a, config_b = agent_configs()
+    orch = AsyncOrchestrator(config_a, config_b, "test", response_cache=cache)
+    return orch, collect(orch.run_simulation(num_turns, initial_message="Hi"))
+
+
+def test_replay_only_serves_recorded_run_without_requests(agent_configs, mock_server, tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    _, recorded = run(agent_configs, ResponseCache(path, mode="read-through"))
+    assert len(mock_server.requests) == 4
+    mock_server.reset()
+
+    orch, replayed = run(agent_configs, ResponseCache(path, mode="replay-only"))
+
+    assert mock_server.requests == []
+    assert [e["content"] for e in replayed] == [e["content"] for e in recorded]
+    assert [e["input_tokens"] for e in replayed] == [e["input_tokens"] for e in recorded]
+    assert all(e["cache_hit"] for e in replayed)
+    assert orch.completed
+
+
+def test_read_through_serves_hits_and_stores_misses(agent_configs, mock_server, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), mode="read-through")
+    run(agent_configs, cache, num_turns=1)
+    mock_server.reset()
+
+    _, logs = run(agent_configs, cache, num_turns=2)
+
+    assert [e["cache_hit"] for e in logs] == [True, True, False, False]
+    assert len(mock_server.requests) == 2
+
+
+def test_replay_only_miss_raises_and_sends_nothing(scheduler, mock_server, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), mode="replay-only")
+    agent = AsyncAgent("mock/a", "You are A.", "Agent A", scheduler=scheduler, response_cache=cache)
+
+    with pytest.raises(CacheMissError):
+        asyncio.run(agent.generate_response("Hi"))
+    assert mock_server.requests == []
+
+
+def test_replay_only_miss_stops_the_run(agent_configs, mock_server, tmp_path):
+    orch, logs = run(agent_configs, ResponseCache(str(tmp_path / "cache.sqlite"), mode="replay-only"))
+
+    assert logs == []
+    assert mock_server.requests == []
+    assert not orch.completed
+
+
+def test_different_params_do_not_share_entries(agent_configs, mock_server, tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    run(agent_configs, ResponseCache(path, mode="read-through"), num_turns=1)
+
+    config_a, config_b = agent_configs(params={"temperature": 0.1})
+    orch = AsyncOrchestrator(config_a, config_b, "test", response_cache=ResponseCache(path, mode="replay-only"))
+
+    assert collect(orch.run_simulation(1, initial_message="Hi")) == []
+
+
+def test_replicates_of_an_identical_request_are_cached_separately(agent_configs, mock_server, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), mode="read-through")
+    for replicate in (0, 1, 0):
+        config_a, config_b = agent_configs(cache_replicate=replicate)
+        orch = AsyncOrchestrator(config_a, config_b, "test", response_cache=cache)
+        logs = collect(orch.run_simulation(1, initial_message="Hi"))
+
+    # Replicate 1 was sampled separately; the second run of replicate 0 was served from the cache
+    assert len(mock_server.requests) == 4
+    assert all(e["cache_hit"] for e in logs)
+
+
+def test_replay_only_runs_without_an_api_key(agent_configs, mock_server, monkeypatch, tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    _, recorded = run(agent_configs, ResponseCache(path, mode="read-through"))
+    mock_server.reset()
+    monkeypatch.delenv("OPENROUTER_API_KEY")
+
+    _, replayed = run(agent_configs, ResponseCache(path, mode="replay-only"))
+
+    assert [e["content"] for e in replayed] == [e["content"] for e in recorded]
+    assert mock_server.requests == []
+    with pytest.raises(ValueError):
+        run(agent_configs, ResponseCache(path, mode="read-through"))
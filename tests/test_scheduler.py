@@ -0,0 +1,83 @@
+import time
+import asyncio
+
+import openai
+import pytest
+
+from http_clients import get_async_client
+from scheduler import RateLimitScheduler, FatalAPIError, parse_retry_after
+
+
+def call(scheduler, mock_server, model="mock/a"):
+    async def run():
+        async def request():
+            client = get_async_client(mock_server.url, "test-key")
+            return await client.chat.completions.with_raw_response.create(
+                model=model, messages=[{"role": "user", "content": "Hi"}])
+        raw = await scheduler.call(model, request, 10)
+        return raw.parse()
+    return asyncio.run(run())
+
+
+def test_429_with_retry_after_is_retried_after_the_advised_delay(scheduler, mock_server):
+    mock_server.fail("mock/a", 429, headers={"Retry-After": "0.3"})
+
+    start = time.monotonic()
+    response = call(scheduler, mock_server)
+
+    assert response.choices[0].message.content == "Reply 1 from mock/a."
+    assert len(mock_server.requests) == 2
+    assert time.monotonic() - start >= 0.3
+
+
+def test_400_is_fatal_and_not_retried(scheduler, mock_server):
+    mock_server.fail("mock/a", 400)
+
+    with pytest.raises(FatalAPIError):
+        call(scheduler, mock_server)
+    assert len(mock_server.requests) == 1
+
+
+def test_retries_stop_after_max_attempts(mock_server):
+    mock_server.fail("mock/a", 429, times=3, headers={"Retry-After": "0"})
+
+    with pytest.raises(openai.RateLimitError):
+        call(RateLimitScheduler(max_attempts=2, backoff_base=0.01), mock_server)
+    assert len(mock_server.requests) == 2
+
+
+def test_server_errors_are_retried_with_backoff(scheduler, mock_server):
+    mock_server.fail("mock/a", 503, times=2)
+
+    response = call(scheduler, mock_server)
+
+    assert response.choices[0].message.content == "Reply 1 from mock/a."
+    assert len(mock_server.requests) == 3
+
+
+def test_rate_limit_pauses_only_the_limited_model(scheduler, mock_server):
+    mock_server.fail("mock/a", 429, headers={"Retry-After": "0.5"})
+
+    async def run():
+        async def request(model):
+            client = get_async_client(mock_server.url, "test-key")
+            return await client.chat.completions.with_raw_response.create(
+                model=model, messages=[{"role": "user", "content": "Hi"}])
+
+        async def timed(model):
+            await scheduler.call(model, lambda: request(model))
+            return time.monotonic() - start
+
+        start = time.monotonic()
+        return await asyncio.gather(timed("mock/a"), timed("mock/b"))
+
+    elapsed_a, elapsed_b = asyncio.run(run())
+
+    assert elapsed_a >= 0.5
+    assert elapsed_b < 0.5
+
+
+def test_parse_retry_after():
+    assert parse_retry_after({"retry-after-ms": "1500"}) == 1.5
+    assert parse_retry_after({"retry-after": "2"}) == 2.0
+    assert parse_retry_after({}) is None
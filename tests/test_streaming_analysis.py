@@ -0,0 +1,36 @@
+import json
+
+import pandas as pd
+
+import analysis_utils
+from streaming_analysis import analyze_stream
+
+
+def write_log(path, n):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            f.write(json.dumps({"experiment_id": "E1", "turn_id": i, "scenario": "s", "speaker": "Agent A",
+                                "speaker_model": "mock/a", "content": f"I really like message number {i}."}) + "\n")
+
+
+def test_one_pool_serves_every_batch(tmp_path, monkeypatch):
+    source = str(tmp_path / "log.jsonl")
+    write_log(source, 40)
+    started = []
+
+    class CountingPool(analysis_utils.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            started.append(kwargs.get("initializer"))
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(analysis_utils, "ProcessPoolExecutor", CountingPool)
+
+    pooled_path, serial_path = str(tmp_path / "pooled.parquet"), str(tmp_path / "serial.parquet")
+    pooled = analyze_stream(source, pooled_path, {"Like": ["like"]}, batch_size=10,
+                            n_workers=2, chunk_size=4, backend="regex")
+    serial = analyze_stream(source, serial_path, {"Like": ["like"]}, batch_size=10,
+                            n_workers=1, backend="regex")
+
+    assert started == [analysis_utils._init_worker]
+    pd.testing.assert_frame_equal(pd.read_parquet(pooled_path), pd.read_parquet(serial_path))
+    pd.testing.assert_frame_equal(pooled.to_frame(), serial.to_frame())
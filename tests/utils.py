@@ -0,0 +1,21 @@
+import asyncio
+
+
+def collect(agen, on_entry=None):
+    """
+    Runs an async generator to completion on a fresh event loop and returns its items.
+    `on_entry(items)` is called after each item (e.g. to inject failures mid-run).
+    """
+    async def run():
+        items = []
+        async for item in agen:
+            items.append(item)
+            if on_entry is not None:
+                on_entry(items)
+        return items
+    return asyncio.run(run())
+
+
+def entries(items):
+    # Log entries only (drops streaming partial events)
+    return [item for item in items if "event" not in item]
@@ -0,0 +1,449 @@
+import os
+import re
+import logging
+import threading
+from importlib.metadata import version as package_version, PackageNotFoundError
+from typing import List, Dict, Any, Tuple, Optional, Union
+
+import numpy as np
+
+from simulation_config import ANALYSIS_BACKEND, NLTK_DATA_DIR, NLTK_OFFLINE, SPACY_MODEL
+
+logger = logging.getLogger(__name__)
+
+# NLTK's universal tagset; POS tags are stored as indices into this list
+UNIVERSAL_TAGS = ["NOUN", "VERB", "ADJ", "ADV", "PRON", "DET", "ADP", "NUM", "CONJ", "PRT", ".", "X"]
+TAG_IDS = {tag: idx for idx, tag in enumerate(UNIVERSAL_TAGS)}
+_UNTAGGED = TAG_IDS["X"]
+
+# Tokenizers that rewrite characters (NLTK's Treebank quotes) -> what to look for in the text
+_TOKEN_ALTERNATIVES = {"``": ('"', "“"), "''": ('"', "”")}
+
+# Tokens with at least one letter or digit are words for the lexicon; the rest is punctuation
+_WORD_CHAR = re.compile(r"[^\W_]")
+
+
+class ParsedDocument:
+    """
+    One message tokenized, sentence-split and tagged once, shared by every metric and the
+    lexicon: token character offsets into the original text, the index of each sentence's
+    first token and one universal POS id per token, as compact NumPy arrays.
+    """
+    __slots__ = ("text", "starts", "ends", "sentence_starts", "pos")
+
+    def __init__(self, text: str, starts, ends, sentence_starts, pos):
+        self.text = text
+        self.starts = np.asarray(starts, dtype=np.int32)
+        self.ends = np.asarray(ends, dtype=np.int32)
+        self.sentence_starts = np.asarray(sentence_starts, dtype=np.int32)
+        self.pos = np.asarray(pos, dtype=np.int8)
+
+    @classmethod
+    def from_tagged(cls, text: str, sentences: List[List[Tuple[str, str]]]) -> "ParsedDocument":
+        """
+        Builds a document from tokenizer output that has no offsets (sentences of (token, tag)).
+        """
+        tokens = [token for sentence in sentences for token, _ in sentence]
+        starts, ends = _align_tokens(text, tokens)
+        lengths = [len(sentence) for sentence in sentences]
+        sentence_starts = np.cumsum([0] + lengths[:-1]) if lengths else []
+        pos = [TAG_IDS.get(tag, _UNTAGGED) for sentence in sentences for _, tag in sentence]
+        return cls(text, starts, ends, sentence_starts, pos)
+
+    @property
+    def n_tokens(self) -> int:
+        return len(self.starts)
+
+    @property
+    def n_sentences(self) -> int:
+        return len(self.sentence_starts)
+
+    def tokens(self) -> List[str]:
+        return [self.text[start:end] for start, end in zip(self.starts.tolist(), self.ends.tolist())]
+
+    def tags(self) -> List[str]:
+        return [UNIVERSAL_TAGS[tag] for tag in self.pos.tolist()]
+
+    def sentence_lengths(self) -> np.ndarray:
+        return np.diff(np.append(self.sentence_starts, self.n_tokens))
+
+    def sentences(self) -> List[List[Tuple[str, str]]]:
+        """
+        Sentences as lists of (token, tag) pairs.
+        """
+        tagged = list(zip(self.tokens(), self.tags()))
+        bounds = self.sentence_starts.tolist() + [self.n_tokens]
+        return [tagged[bounds[i]:bounds[i + 1]] for i in range(self.n_sentences)]
+
+    def words(self) -> List[str]:
+        """
+        Lowercased word tokens for lexicon matching: this document's tokens without pure
+        punctuation. Lexicon entries are split by the same backend (TextBackend.words), so
+        "e-mail" or "cannot" match however the backend tokenizes them.
+        """
+        return [token.lower().replace("’", "'") for token in self.tokens() if _WORD_CHAR.search(token)]
+
+
+def _align_tokens(text: str, tokens: List[str]) -> Tuple[List[int], List[int]]:
+    """
+    Character offsets of `tokens` in `text`, searched left to right. Tokens that cannot be
+    found get a zero-width span at the current position.
+    """
+    starts, ends = [], []
+    cursor = 0
+    for token in tokens:
+        start, end = -1, -1
+        for candidate in (token,) + _TOKEN_ALTERNATIVES.get(token, ()):
+            found = text.find(candidate, cursor)
+            if found >= 0 and (start < 0 or found < start):
+                start, end = found, found + len(candidate)
+        if start < 0:
+            start = end = cursor
+        starts.append(start)
+        ends.append(end)
+        cursor = end
+    return starts, ends
+
+
+class TextBackend:
+    """
+    Tokenizer + sentence splitter + POS tagger used by the stylometry engine.
+    Subclasses implement parse() for a batch of texts; non-string or empty texts parse to
+    empty documents.
+    """
+    name = "base"
+
+    def fingerprint(self) -> Dict[str, Any]:
+        """
+        Everything that changes this backend's output (keys cached analysis results).
+        """
+        return {"backend": self.name}
+
+    def warm_up(self):
+        """
+        Loads models/data ahead of the first batch (called once per worker process).
+        """
+
+    def parse(self, texts: List[Any]) -> List[ParsedDocument]:
+        raise NotImplementedError
+
+    def words(self, texts: List[Any]) -> List[List[str]]:
+        """
+        ParsedDocument.words() of each text. Used to count lexicons on messages that are not
+        parsed (cached metrics) and to split lexicon entries; backends override it to skip tagging.
+        """
+        return [doc.words() for doc in self.parse(texts)]
+
+
+# --- NLTK: punkt sentences + Treebank words + averaged perceptron tagger ---
+
+# NLTK data needed by the analyzer: resource path -> downloader package.
+# Older NLTK releases use punkt / averaged_perceptron_tagger, newer ones the _tab / _eng variants.
+NLTK_RESOURCES = {
+    'tokenizers/punkt': 'punkt',
+    'tokenizers/punkt_tab': 'punkt_tab',
+    'taggers/averaged_perceptron_tagger': 'averaged_perceptron_tagger',
+    'taggers/averaged_perceptron_tagger_eng': 'averaged_perceptron_tagger_eng',
+    'taggers/universal_tagset': 'universal_tagset',
+}
+
+_nltk = None
+_nltk_lock = threading.Lock()
+_nltk_settings = {
+    "data_dir": os.getenv("PARROT_NLTK_DATA", NLTK_DATA_DIR),
+    "offline": os.getenv("PARROT_NLTK_OFFLINE", "1" if NLTK_OFFLINE else "0") == "1",
+}
+
+
+def configure_nltk(data_dir: Optional[str] = None, offline: Optional[bool] = None):
+    """
+    Sets where NLTK data is looked up first (e.g. an offline resource bundle) and whether
+    missing resources may be downloaded. Takes effect on the next analysis call.
+    """
+    global _nltk
+    with _nltk_lock:
+        if data_dir is not None:
+            _nltk_settings["data_dir"] = data_dir
+        if offline is not None:
+            _nltk_settings["offline"] = offline
+        _nltk = None
+
+
+def build_nltk_bundle(target_dir: str):
+    """
+    Downloads every resource the analyzer needs into `target_dir`, for use as an
+    offline bundle (configure_nltk(data_dir=target_dir, offline=True) or PARROT_NLTK_DATA).
+    """
+    import nltk
+    for package in NLTK_RESOURCES.values():
+        nltk.download(package, download_dir=target_dir, quiet=True)
+
+
+def _ensure_nltk():
+    """
+    Imports NLTK and checks its data on first use, then returns the cached module.
+    Missing resources are downloaded unless offline mode is on (then they are only reported).
+    """
+    global _nltk
+    if _nltk is not None:
+        return _nltk
+    with _nltk_lock:
+        if _nltk is not None:
+            return _nltk
+        import nltk
+
+        data_dir = _nltk_settings["data_dir"]
+        if data_dir and data_dir not in nltk.data.path:
+            nltk.data.path.insert(0, data_dir)
+
+        missing = []
+        for resource, package in NLTK_RESOURCES.items():
+            try:
+                nltk.data.find(resource)
+            except LookupError:
+                missing.append(package)
+
+        if missing and _nltk_settings["offline"]:
+            # Not every resource is used by every NLTK release, so only NLTK itself can tell what is fatal
+            logger.warning(f"NLTK resources {missing} not found and offline mode is on; "
+                           f"build a bundle with build_nltk_bundle() and point PARROT_NLTK_DATA at it.")
+            missing = []
+        for package in missing:
+            logger.info(f"Downloading NLTK resource '{package}'")
+            nltk.download(package, download_dir=data_dir or None, quiet=True)
+
+        _nltk = nltk
+        return _nltk
+
+
+class NLTKBackend(TextBackend):
+    """
+    NLTK punkt + Treebank tokenizer + averaged perceptron tagger (the original analyzer).
+    Each message is tagged as one token sequence, exactly like nltk.pos_tag(word_tokenize(text)).
+    """
+    name = "nltk"
+
+    def fingerprint(self) -> Dict[str, Any]:
+        return {"backend": self.name, "nltk": package_version("nltk")}
+
+    def warm_up(self):
+        _ensure_nltk().pos_tag_sents([["warm", "up"]], tagset='universal')
+
+    def _split(self, texts: List[Any]) -> List[List[List[str]]]:
+        nltk = _ensure_nltk()
+        # Same tokens as nltk.word_tokenize(text), which splits sentences first
+        return [[nltk.word_tokenize(sentence, preserve_line=True) for sentence in nltk.sent_tokenize(text)]
+                if isinstance(text, str) and text else [] for text in texts]
+
+    def words(self, texts: List[Any]) -> List[List[str]]:
+        # Same tokens as parse(), without the tagger
+        return [ParsedDocument.from_tagged(text if isinstance(text, str) else "",
+                                           [[(token, "X") for token in sentence] for sentence in sentences]).words()
+                for text, sentences in zip(texts, self._split(texts))]
+
+    def parse(self, texts: List[Any]) -> List[ParsedDocument]:
+        nltk = _ensure_nltk()
+        split = self._split(texts)
+        # POS Tagging (Universal Tagset) for every message in one call
+        tagged = nltk.pos_tag_sents([[token for sentence in sentences for token in sentence] for sentences in split],
+                                    tagset='universal')
+
+        parsed = []
+        for text, sentences, tagged_tokens in zip(texts, split, tagged):
+            message, start = [], 0
+            for sentence in sentences:
+                message.append(tagged_tokens[start:start + len(sentence)])
+                start += len(sentence)
+            parsed.append(ParsedDocument.from_tagged(text if isinstance(text, str) else "", message))
+        return parsed
+
+
+# --- spaCy: statistical pipeline without the dependency parser ---
+
+# spaCy's UPOS tags mapped onto NLTK's universal tagset
+SPACY_TO_UNIVERSAL = {
+    "PROPN": "NOUN", "AUX": "VERB", "CCONJ": "CONJ", "SCONJ": "CONJ", "PART": "PRT",
+    "PUNCT": ".", "SYM": ".", "INTJ": "X",
+}
+
+
+class SpacyBackend(TextBackend):
+    """
+    spaCy tagger via nlp.pipe. The parser, NER and lemmatizer are disabled; sentences come
+    from the `senter` component (or a rule-based sentencizer when the model has none).
+    n_process > 1 lets spaCy fan batches out over its own worker processes.
+    """
+    name = "spacy"
+
+    def __init__(self, model: str = SPACY_MODEL, n_process: int = 1, batch_size: int = 256):
+        self.model = model
+        self.n_process = n_process
+        self.batch_size = batch_size
+        self._nlp = None
+
+    def __getstate__(self):
+        # Loaded pipelines are rebuilt in each worker process
+        state = self.__dict__.copy()
+        state["_nlp"] = None
+        return state
+
+    def fingerprint(self) -> Dict[str, Any]:
+        try:
+            spacy_version = package_version("spacy")
+        except PackageNotFoundError:
+            spacy_version = None
+        return {"backend": self.name, "spacy": spacy_version, "model": self.model}
+
+    def _load(self):
+        if self._nlp is None:
+            import spacy
+            nlp = spacy.load(self.model, disable=["parser", "ner", "lemmatizer"])
+            if "senter" in nlp.disabled:
+                nlp.enable_pipe("senter")
+            elif "senter" not in nlp.pipe_names:
+                nlp.add_pipe("sentencizer")
+            self._nlp = nlp
+        return self._nlp
+
+    def warm_up(self):
+        self._load()
+
+    def words(self, texts: List[Any]) -> List[List[str]]:
+        # Tokenizer only; parse() keeps the same non-space tokens
+        nlp = self._load()
+        cleaned = [text if isinstance(text, str) else "" for text in texts]
+        parsed = []
+        for text, doc in zip(cleaned, nlp.tokenizer.pipe(cleaned, batch_size=self.batch_size)):
+            tokens = [token for token in doc if not token.is_space]
+            parsed.append(ParsedDocument(text, [token.idx for token in tokens],
+                                         [token.idx + len(token.text) for token in tokens], [], []))
+        return [doc.words() for doc in parsed]
+
+    def parse(self, texts: List[Any]) -> List[ParsedDocument]:
+        nlp = self._load()
+        cleaned = [text if isinstance(text, str) else "" for text in texts]
+        parsed = []
+        for text, doc in zip(cleaned, nlp.pipe(cleaned, n_process=self.n_process, batch_size=self.batch_size)):
+            starts, ends, pos, sentence_starts = [], [], [], []
+            for sentence in doc.sents:
+                first = len(starts)
+                for token in sentence:
+                    if token.is_space:
+                        continue
+                    starts.append(token.idx)
+                    ends.append(token.idx + len(token.text))
+                    pos.append(TAG_IDS.get(SPACY_TO_UNIVERSAL.get(token.pos_, token.pos_), _UNTAGGED))
+                if len(starts) > first:
+                    sentence_starts.append(first)
+            parsed.append(ParsedDocument(text, starts, ends, sentence_starts, pos))
+        return parsed
+
+
+# --- Regex + lookup: no models, fastest, approximate tags ---
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"[^\W_]+(?:['’][^\W_]+)*|[^\w\s]")
+
+# Closed-class words and very frequent open-class words
+_LOOKUP: Dict[str, str] = {}
+for _tag, _words in {
+    "PRON": "i me my mine myself you your yours yourself he him his himself she her hers herself it its itself "
+            "we us our ours ourselves they them their theirs themselves who whom whose what which this that "
+            "these those someone something anyone anything everyone everything nobody nothing",
+    "DET": "a an the every each some any no all both either neither another such",
+    "ADP": "of in on at by for with about against between into through during before after above below "
+           "to from up down over under near than like without within along across behind beyond",
+    "CONJ": "and but or nor so yet because although though while if unless whereas",
+    "PRT": "not n't 's 'll 're 've 'd 'm",
+    "VERB": "is am are was were be been being have has had having do does did doing can could will would "
+            "shall should may might must say said get got make made go went know knew think thought "
+            "see saw want come came take took feel felt love like need let",
+    "ADV": "very really just also too so quite rather never always often sometimes maybe perhaps here there "
+           "now then again still even already almost only well soon",
+    "ADJ": "good great bad new old little big small happy sad nice beautiful sure right wrong",
+}.items():
+    for _word in _words.split():
+        _LOOKUP.setdefault(_word, _tag)
+
+_SUFFIX_TAGS = [
+    ("ly", "ADV"), ("ing", "VERB"), ("ed", "VERB"), ("ous", "ADJ"), ("ful", "ADJ"), ("ive", "ADJ"),
+    ("able", "ADJ"), ("ible", "ADJ"), ("al", "ADJ"), ("less", "ADJ"), ("ic", "ADJ"), ("ish", "ADJ"),
+]
+
+
+def _lookup_tag(token: str) -> str:
+    lower = token.lower().replace("’", "'")
+    tag = _LOOKUP.get(lower)
+    if tag:
+        return tag
+    if not token[0].isalnum():
+        return "."
+    if lower.replace(".", "").replace(",", "").isdigit():
+        return "NUM"
+    for suffix, suffix_tag in _SUFFIX_TAGS:
+        if len(lower) > len(suffix) + 2 and lower.endswith(suffix):
+            return suffix_tag
+    return "NOUN"
+
+
+class RegexBackend(TextBackend):
+    """
+    Regex sentence/word splitting with a closed-class lookup and suffix rules for tags.
+    No models or downloads; much faster than the statistical taggers but approximate.
+    """
+    name = "regex"
+
+    def parse(self, texts: List[Any]) -> List[ParsedDocument]:
+        parsed = []
+        for text in texts:
+            if not isinstance(text, str):
+                text = ""
+            starts, ends, pos, sentence_starts = [], [], [], []
+            boundaries = [match.end() for match in _SENTENCE_SPLIT.finditer(text)]
+            boundary = 0
+            new_sentence = True
+            for match in _WORD.finditer(text):
+                # A new sentence starts after each sentence-final punctuation + whitespace
+                while boundary < len(boundaries) and match.start() >= boundaries[boundary]:
+                    boundary += 1
+                    new_sentence = True
+                if new_sentence:
+                    sentence_starts.append(len(starts))
+                    new_sentence = False
+                starts.append(match.start())
+                ends.append(match.end())
+                pos.append(TAG_IDS[_lookup_tag(match.group())])
+            parsed.append(ParsedDocument(text, starts, ends, sentence_starts, pos))
+        return parsed
+
+
+BACKENDS = {
+    "nltk": NLTKBackend,
+    "spacy": SpacyBackend,
+    "regex": RegexBackend,
+}
+
+_instances: Dict[str, TextBackend] = {}
+
+
+def register_backend(name: str, backend_class: type):
+    """
+    Makes a TextBackend subclass selectable by name.
+    """
+    BACKENDS[name] = backend_class
+
+
+def get_backend(backend: Union[str, TextBackend, None] = None) -> TextBackend:
+    """
+    Resolves a backend name (default ANALYSIS_BACKEND, env PARROT_ANALYSIS_BACKEND) or
+    instance. Named backends are created once per process and reused.
+    """
+    if isinstance(backend, TextBackend):
+        return backend
+    name = backend or os.getenv("PARROT_ANALYSIS_BACKEND", ANALYSIS_BACKEND)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown analysis backend '{name}'. Expected one of {list(BACKENDS)}.")
+    instance = _instances.get(name)
+    if instance is None:
+        instance = _instances[name] = BACKENDS[name]()
+    return instance
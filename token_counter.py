@@ -0,0 +1,110 @@
+import logging
+import functools
+from typing import List, Dict, Any, Optional, Tuple
+
+from simulation_config import (MODEL_CONTEXT_BUDGETS, DEFAULT_CONTEXT_BUDGET, CONTEXT_RESERVE_TOKENS,
+                               TOKEN_COUNT_CACHE_SIZE)
+
+try:
+    import tiktoken
+except ImportError:  # optional: falls back to per-family character ratios
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Model slug prefix -> (tiktoken encoding, average characters per token when tiktoken is
+# unavailable). Longest matching prefix wins. Only OpenAI models use these encodings
+# natively; for other families cl100k_base is a close local approximation.
+FAMILY_TOKENIZERS: Dict[str, Tuple[str, float]] = {
+    "openai/gpt-4o": ("o200k_base", 4.0),
+    "openai/gpt-4.1": ("o200k_base", 4.0),
+    "openai/o": ("o200k_base", 4.0),
+    "openai/": ("cl100k_base", 4.0),
+    "anthropic/": ("cl100k_base", 3.5),
+    "google/": ("cl100k_base", 4.0),
+    "meta-llama/": ("cl100k_base", 3.8),
+    "mistralai/": ("cl100k_base", 3.5),
+    "x-ai/": ("cl100k_base", 3.8),
+}
+DEFAULT_TOKENIZER = ("cl100k_base", 4.0)
+
+# Chat formatting overhead (role markers etc.) per message and for priming the reply
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+def match_model(table: Dict[str, Any], model_slug: str, default: Any = None) -> Any:
+    """
+    Value of the longest key in `table` that prefixes `model_slug`.
+    """
+    best = None
+    for prefix in table:
+        if model_slug.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return table[best] if best is not None else default
+
+
+def model_context_budget(model_slug: str) -> Optional[int]:
+    """
+    Context window in tokens for a model (MODEL_CONTEXT_BUDGETS, else DEFAULT_CONTEXT_BUDGET).
+    """
+    return match_model(MODEL_CONTEXT_BUDGETS, model_slug, DEFAULT_CONTEXT_BUDGET)
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(name: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:  # encoding files are downloaded on first use
+        logger.warning(f"tiktoken encoding '{name}' unavailable ({e}); using character-based estimates")
+        return None
+
+
+@functools.lru_cache(maxsize=TOKEN_COUNT_CACHE_SIZE)
+def _count_text(encoding_name: str, chars_per_token: float, text: str) -> int:
+    encoding = _encoding(encoding_name)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return int(len(text) / chars_per_token + 0.999) if text else 0
+
+
+class TokenCounter:
+    """
+    Local prompt-size estimator for one model family: tiktoken when installed, else a
+    characters-per-token ratio. Per-message counts are memoized in an LRU cache, so
+    re-counting the same history every turn only tokenizes the new messages.
+    """
+    def __init__(self, encoding_name: str = DEFAULT_TOKENIZER[0], chars_per_token: float = DEFAULT_TOKENIZER[1]):
+        self.encoding_name = encoding_name
+        self.chars_per_token = chars_per_token
+
+    @classmethod
+    def for_model(cls, model_slug: str) -> "TokenCounter":
+        return cls(*match_model(FAMILY_TOKENIZERS, model_slug, DEFAULT_TOKENIZER))
+
+    @property
+    def exact(self) -> bool:
+        """
+        True when counts come from a real tokenizer rather than the character ratio.
+        """
+        return _encoding(self.encoding_name) is not None
+
+    def count(self, text: Optional[str]) -> int:
+        return _count_text(self.encoding_name, self.chars_per_token, text or "")
+
+    def count_message(self, message: Dict[str, Any]) -> int:
+        return self.count(message.get("content")) + TOKENS_PER_MESSAGE
+
+    def count_messages(self, messages: List[Dict[str, Any]]) -> int:
+        return sum(self.count_message(message) for message in messages) + TOKENS_PER_REPLY
+
+
+def prompt_budget(budget: Optional[int], max_tokens: Optional[int] = None) -> Optional[int]:
+    """
+    Tokens available to the prompt once the reply (max_tokens, or CONTEXT_RESERVE_TOKENS) is set aside.
+    """
+    if budget is None:
+        return None
+    return max(budget - (max_tokens or CONTEXT_RESERVE_TOKENS), 0)